@@ -63,6 +63,67 @@ How our human friend is doing lately (short term memory)
 What was the topic op the last conversation we had (short term memory)
 """
 
+# Keys the memory update model uses to address the sections above
+MEMORY_SECTIONS = {
+    "long_term": "Who are we the diary of (long term memory)",
+    "short_term": "How our human friend is doing lately (short term memory)",
+    "last_topic": "What was the topic op the last conversation we had (short term memory)",
+}
+
+# Token budget of each memory section, sections over budget are compacted
+MEMORY_SECTION_TOKEN_BUDGETS = {
+    "long_term": int(os.getenv("MEMORY_LONG_TERM_TOKEN_BUDGET", "600")),
+    "short_term": int(os.getenv("MEMORY_SHORT_TERM_TOKEN_BUDGET", "250")),
+    "last_topic": int(os.getenv("MEMORY_LAST_TOPIC_TOKEN_BUDGET", "120")),
+}
+
+# "structured" gets the mood, summary and memory update of a conversation
+# in one LLM call, "separate" makes one call for each
+MEMORY_UPDATE_MODE = os.getenv("MEMORY_UPDATE_MODE", "structured")
+
+# Memory retrieval: the memories most similar to a query are used, as long
+# as they fit in the token budget
+MEMORY_EMBEDDING_MODEL = os.getenv("MEMORY_EMBEDDING_MODEL", "text-embedding-3-small")
+MEMORY_EMBEDDING_DIMENSIONS = int(os.getenv("MEMORY_EMBEDDING_DIMENSIONS", "512"))
+MEMORY_RETRIEVAL_TOP_K = int(os.getenv("MEMORY_RETRIEVAL_TOP_K", "8"))
+MEMORY_RETRIEVAL_TOKEN_BUDGET = int(os.getenv("MEMORY_RETRIEVAL_TOKEN_BUDGET", "1500"))
+
+# Day, week and month summaries of closed periods, built in the background
+MEMORY_SUMMARY_BATCH_LIMIT = int(os.getenv("MEMORY_SUMMARY_BATCH_LIMIT", "20"))
+# Recent week and month summaries given to the memory tool as an overview
+MEMORY_OVERVIEW_TOKEN_BUDGET = int(os.getenv("MEMORY_OVERVIEW_TOKEN_BUDGET", "600"))
+
+# Length cap of the streamed answers of the memory retrieval tool, which
+# the agent reads aloud
+MEMORY_TOOL_MAX_TOKENS = int(os.getenv("MEMORY_TOOL_MAX_TOKENS", "150"))
+
+# Signed conversation URLs are valid for 15 minutes, cache them for less
+# and refresh them in the background shortly before they expire
+SIGNED_URL_CACHE_TTL_SECONDS = int(os.getenv("SIGNED_URL_CACHE_TTL_SECONDS", "600"))
+SIGNED_URL_REFRESH_AHEAD_SECONDS = int(
+    os.getenv("SIGNED_URL_REFRESH_AHEAD_SECONDS", "120")
+)
+
+# Memory pushes to the same agent within this window are merged into one
+AGENT_PROMPT_DEBOUNCE_SECONDS = float(os.getenv("AGENT_PROMPT_DEBOUNCE_SECONDS", "2"))
+
+# Worker pool processing webhook jobs in the background
+WEBHOOK_JOB_WORKERS = int(os.getenv("WEBHOOK_JOB_WORKERS", "2"))
+WEBHOOK_JOB_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_JOB_MAX_ATTEMPTS", "5"))
+# Running jobs not finished within this time are assumed lost and requeued
+WEBHOOK_JOB_LEASE_SECONDS = int(os.getenv("WEBHOOK_JOB_LEASE_SECONDS", "600"))
+
+# Process-wide OpenAI and HTTP clients
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+
+# Optional Redis shared by all workers, in-process caches only when unset
+REDIS_HOST = os.getenv("REDIS_HOST")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+
 END_CALL_TOOL_PROMPT = """
 At the end of the call, sends a summary of the conversation to the following endpoint.
 The request body must be a JSON object with the following fields:
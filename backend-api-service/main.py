@@ -1,5 +1,6 @@
 import logging
 import json
+from contextlib import asynccontextmanager
 
 from fastapi import (
     FastAPI,
@@ -11,16 +12,34 @@ from fastapi import (
     UploadFile,
     Request,
     Response,
+    BackgroundTasks,
+    Query,
 )
 from typing import Dict
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime, time, timedelta
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from service.database import get_db, transactional
 from service.init_db import init_database
 from service import crud, models
-from service.memory_manager import MemoryManager
+from service.memory_manager import (
+    MemoryManager,
+    process_post_call_job,
+    process_compact_memory_job,
+    process_summarize_memories_job,
+)
+from service.webhook_jobs import WebhookJobQueue
+from service.clients import (
+    start_clients,
+    close_clients,
+    get_openai_client,
+    get_http_session,
+)
+from service.signed_url_cache import signed_url_cache
+from service.agent_prompt import flush_agent_prompt_pushes, push_agent_prompt
 from schemas import (
     UserCreate,
     UserRegisterResponse,
@@ -29,6 +48,8 @@ from schemas import (
     AgentSignedUrlResponse,
     MemoryResponse,
     AllMemoriesResponse,
+    MemorySummariesResponse,
+    WebhookJobResponse,
 )
 from auth import (
     authenticate_user,
@@ -39,14 +60,17 @@ from auth import (
 )
 from service.elevenlabs_api import (
     create_elevenlabs_agent,
-    get_signed_url,
     create_elevenlabs_voice,
-    load_memory_into_agent,
     load_tools_into_agent,
-    parse_conversation,
+    start_client,
+    close_client,
 )
 from pydantic import BaseModel
-from config import DEFAULT_MEMORY_PROMPT, elevenlabs_webhook_config
+from config import (
+    DEFAULT_MEMORY_PROMPT,
+    MEMORY_TOOL_MAX_TOKENS,
+    elevenlabs_webhook_config,
+)
 
 # Initialize database on startup
 init_database()
@@ -54,6 +78,21 @@ init_database()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def get_memory_manager(db: Session = Depends(get_db)) -> MemoryManager:
+    """MemoryManager for a request, using the process-wide clients"""
+    return MemoryManager(db, client=get_openai_client(), session=get_http_session())
+
+
+# Workers processing webhooks after they have been answered
+webhook_job_queue = WebhookJobQueue(
+    handlers={
+        "post_call": process_post_call_job,
+        "compact_memory": process_compact_memory_job,
+        "summarize_memories": process_summarize_memories_job,
+    }
+)
+
 # Keep track of active WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
@@ -65,12 +104,29 @@ class MemoryUpdateRequest(BaseModel):
     text: str
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the shared clients, caches and workers for the lifetime of the app"""
+    await start_client()
+    await start_clients()
+    await signed_url_cache.start()
+    await webhook_job_queue.start()
+    yield
+    await webhook_job_queue.close()
+    # After the jobs, which schedule pushes once committed
+    await flush_agent_prompt_pushes()
+    await signed_url_cache.close()
+    await close_clients()
+    await close_client()
+
+
 app = FastAPI(
     title="ElevenLabs RAG API",
     description=(
         "API for handling conversations with ElevenLabs agents " "and RAG processing"
     ),
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS - THIS IS CRITICAL FOR YOUR FRONTEND TO WORK
@@ -157,12 +213,12 @@ async def register_user(
     elevenlabs_agent_id = None
     has_voice_set = False  # New users don't have a voice set yet
 
-    elevenlabs_response = create_elevenlabs_agent()
+    elevenlabs_response = await create_elevenlabs_agent()
 
     # Extract the agent ID from the response
     elevenlabs_agent_id = elevenlabs_response.get("agent_id")
     # load_tools_into_agent(elevenlabs_agent_id)
-    signed_url = get_signed_url(elevenlabs_agent_id)
+    signed_url = await signed_url_cache.get(elevenlabs_agent_id)
 
     crud.create_agent(
         db,
@@ -232,8 +288,8 @@ async def login_for_access_token(
         # Get the signed URL if we have an agent ID
         if agent.elevenlabs_agent_id:
             try:
-                load_memory_into_agent(agent.elevenlabs_agent_id, agent.memory)
-                signed_url = get_signed_url(agent.elevenlabs_agent_id)
+                await push_agent_prompt(db, agent)
+                signed_url = await signed_url_cache.get(agent.elevenlabs_agent_id)
             except Exception as e:
                 logger.error(f"Error loading memory into agent: {str(e)}")
                 raise HTTPException(
@@ -285,7 +341,7 @@ async def set_agent_voice(
 
         # Call ElevenLabs API to create a voice
         voice_name = f"{agent.name}'s Voice"
-        elevenlabs_response = create_elevenlabs_voice(audio_content, voice_name)
+        elevenlabs_response = await create_elevenlabs_voice(audio_content, voice_name)
         elevenlabs_voice_id = elevenlabs_response.get("voice_id")
 
         if not elevenlabs_voice_id:
@@ -343,7 +399,7 @@ async def get_agent_signed_url(
     # Get the signed URL
     if agent.elevenlabs_agent_id:
         try:
-            signed_url = get_signed_url(agent.elevenlabs_agent_id)
+            signed_url = await signed_url_cache.get(agent.elevenlabs_agent_id)
         except Exception as e:
             # Log the error but don't fail the request
             logger.error(f"Error getting signed URL: {str(e)}")
@@ -371,9 +427,9 @@ async def update_memory(
 async def get_memory(
     request: dict,
     db: Session = Depends(get_db),
+    memory_manager: MemoryManager = Depends(get_memory_manager),
 ):
     # No user authentication required, just use the data from the request
-    memory_manager = MemoryManager(db)
     # or pass a specific service account ID or get user_id from request
     elevenlabs_id = request.get("agent_id")
     db_agent = crud.get_agent_by_elevenlabs_agent_id(db, elevenlabs_id)
@@ -389,12 +445,18 @@ async def get_memory(
             detail="Missing required fields",
         )
 
-    # Query all user memories using ChatGPT
-    response = await memory_manager.query_all_user_memories(
-        user_id=db_agent.user_id, query=text
-    )
+    # Callers that cannot read a chunked answer get the whole answer as JSON
+    if not request.get("stream", True):
+        response = await memory_manager.query_all_user_memories(
+            user_id=db_agent.user_id, query=text
+        )
+        return MemoryResponse(text=response)
 
-    return MemoryResponse(text=response)
+    # Stream the answer, the agent can start speaking at the first sentence
+    chunks = await memory_manager.stream_query_all_user_memories(
+        user_id=db_agent.user_id, query=text, max_tokens=MEMORY_TOOL_MAX_TOKENS
+    )
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
 
 
 @app.get("/memory/get_all", response_model=AllMemoriesResponse)
@@ -402,6 +464,7 @@ async def get_memory(
 async def get_all_memories(
     db: Session = Depends(get_db),
     current_user: models.Auth = Depends(get_current_user),
+    memory_manager: MemoryManager = Depends(get_memory_manager),
 ):
     # Get the user from the Auth record
     user = crud.get_user_from_auth(db, current_user.id)
@@ -411,19 +474,73 @@ async def get_all_memories(
             detail="User not found",
         )
 
-    # Initialize memory manager
-    memory_manager = MemoryManager(db)
-
     # Get memories from the last month grouped by day
     daily_memories = memory_manager.get_last_month_memories_by_day(user.id)
 
     return AllMemoriesResponse(memories=daily_memories)
 
 
+@app.get("/memory/calendar", response_model=AllMemoriesResponse)
+async def get_memory_calendar(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+    current_user: models.Auth = Depends(get_current_user),
+    memory_manager: MemoryManager = Depends(get_memory_manager),
+):
+    """Get the user's memories grouped by day, between two dates included"""
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="to must not be before from",
+        )
+
+    user = crud.get_user_from_auth(db, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    daily_memories = memory_manager.get_memories_by_day(
+        user.id,
+        datetime.combine(from_date, time.min),
+        datetime.combine(to_date + timedelta(days=1), time.min),
+    )
+
+    return AllMemoriesResponse(memories=daily_memories)
+
+
+@app.get("/memory/summaries", response_model=MemorySummariesResponse)
+async def get_memory_summaries(
+    period: str = "week",
+    limit: int = 12,
+    db: Session = Depends(get_db),
+    current_user: models.Auth = Depends(get_current_user),
+):
+    """Get the latest day, week or month summaries of the user's memories"""
+    if period not in ("day", "week", "month"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="period must be day, week or month",
+        )
+
+    user = crud.get_user_from_auth(db, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    summaries = crud.get_memory_summaries(db, user.id, period, limit=min(limit, 100))
+    return MemorySummariesResponse(summaries=summaries)
+
+
 @app.post("/webhook/elevenlabs")
 @transactional
 async def elevenlabs_webhook(
     request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     logger.info("Received webhook request from ElevenLabs")
@@ -437,29 +554,87 @@ async def elevenlabs_webhook(
         elevenlabs_webhook_config["dev_mode"]
         or elevenlabs_webhook_config["webhook_secret"] == "testing"
     ):
-        memory_manager = MemoryManager(db)
-        elevenlabs_id = request_body["data"]["agent_id"]
-        db_agent = crud.get_agent_by_elevenlabs_agent_id(db, elevenlabs_id)
+        data = request_body.get("data") or {}
+        if not data.get("agent_id") or "transcript" not in data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="agent_id and transcript are required",
+            )
+
+        # Redeliveries of a conversation are acknowledged without any work,
+        # unless its earlier job failed for good
+        conversation_id = data.get("conversation_id")
+        processed = (
+            crud.get_processed_conversation(db, conversation_id)
+            if conversation_id
+            else None
+        )
+        if processed:
+            previous_job = crud.get_webhook_job(db, processed.job_id)
+            if processed.status == "done" or (
+                previous_job and previous_job.status != "failed"
+            ):
+                return Response(
+                    status_code=status.HTTP_200_OK,
+                    content=f"Conversation {conversation_id} already received.",
+                )
+
+        db_agent = crud.get_agent_by_elevenlabs_agent_id(db, data["agent_id"])
         if not db_agent:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found",
             )
-        conversation = parse_conversation(request_body["data"]["transcript"])
-        await memory_manager.update_memory(
-            agent_id=db_agent.agent_id,
-            user_id=db_agent.user_id,
-            memory=db_agent.memory,
-            last_conversation=conversation,
-            elevenlabs_id=elevenlabs_id,
+
+        if conversation_id and not processed:
+            try:
+                processed = crud.create_processed_conversation(
+                    db, conversation_id, db_agent.id
+                )
+            except IntegrityError:
+                # A concurrent delivery of the same conversation got there first
+                db.rollback()
+                return Response(
+                    status_code=status.HTTP_200_OK,
+                    content=f"Conversation {conversation_id} already received.",
+                )
+
+        # The memory update runs in the worker pool, ElevenLabs gets an
+        # answer before it times out and redelivers
+        job = crud.create_webhook_job(
+            db, "post_call", request_body, user_id=db_agent.user_id
         )
+        if processed:
+            processed.job_id = job.job_id
+            processed.status = "in_progress"
+
+        # Wake the workers after the response, once the job is committed
+        background_tasks.add_task(webhook_job_queue.notify)
 
         return Response(
             status_code=status.HTTP_200_OK,
-            content="Webhook event received and processed.",
+            content=f"Webhook event received and queued as {job.job_id}.",
         )
 
     else:
         raise NotImplementedError(
             "Webhook validation parsing not possible with Ngrok Free (cannot reload on the same port after specifying a public URL and creating a secret)"
         )
+
+
+@app.get("/webhook/jobs/{job_id}", response_model=WebhookJobResponse)
+async def get_webhook_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.Auth = Depends(get_current_user),
+):
+    """Get the processing status of one of the user's webhook jobs"""
+    user = crud.get_user_from_auth(db, current_user.id)
+    job = crud.get_webhook_job(db, job_id)
+    # Other users' jobs are reported as missing, not as forbidden
+    if not user or not job or job.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from service.memory_manager import Mood
 from typing import Optional, Union
-from datetime import datetime
+from datetime import date, datetime
 
 
 class Token(BaseModel):
@@ -117,3 +117,32 @@ class AllMemoriesResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class MemorySummaryItem(BaseModel):
+    period: str
+    period_start: date
+    period_end: date
+    text: str
+
+    class Config:
+        orm_mode = True
+
+
+class MemorySummariesResponse(BaseModel):
+    summaries: list[MemorySummaryItem]
+
+    class Config:
+        orm_mode = True
+
+
+class WebhookJobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    attempts: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
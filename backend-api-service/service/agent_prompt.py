@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+
+from config import AGENT_PROMPT_DEBOUNCE_SECONDS
+from service import crud, models
+from service.database import SessionLocal
+from service.elevenlabs_api import build_agent_prompt, load_memory_into_agent
+
+logger = logging.getLogger(__name__)
+
+# Latest memory waiting to be pushed per agent, and the task that pushes it
+_pending_pushes: Dict[str, str] = {}
+_push_tasks: Dict[str, asyncio.Task] = {}
+
+
+def hash_prompt(prompt: str) -> str:
+    """Content hash of an agent prompt"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+async def push_agent_prompt(
+    db: Session, agent: models.Agent, memory: Optional[str] = None
+) -> bool:
+    """
+    Push an agent's memory to ElevenLabs unless it is already there
+
+    The hash of the pushed prompt is stored on the agent, the caller
+    commits it.
+
+    Returns:
+        bool: Whether the prompt was pushed
+    """
+    if not agent.elevenlabs_agent_id:
+        return False
+
+    memory = agent.memory if memory is None else memory
+    prompt_hash = hash_prompt(build_agent_prompt(memory or ""))
+    if agent.prompt_hash == prompt_hash:
+        return False
+
+    await load_memory_into_agent(agent.elevenlabs_agent_id, memory or "")
+    crud.update_agent_prompt_hash(db, agent.agent_id, prompt_hash)
+    return True
+
+
+async def _push_memory(agent_id: str, memory: str):
+    """Push a memory in a session of its own"""
+    db = SessionLocal()
+    try:
+        agent = crud.get_agent_from_id(db, agent_id)
+        if agent:
+            await push_agent_prompt(db, agent, memory)
+            db.commit()
+    except Exception as e:
+        logger.error(f"Error pushing memory of agent {agent_id}: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def _debounced_push(agent_id: str):
+    """Push the latest scheduled memory once pushes stop arriving"""
+    try:
+        while agent_id in _pending_pushes:
+            await asyncio.sleep(AGENT_PROMPT_DEBOUNCE_SECONDS)
+            memory = _pending_pushes[agent_id]
+            await _push_memory(agent_id, memory)
+            # Kept until pushed, so a push interrupted by shutdown is flushed.
+            # A memory scheduled during the push is pushed next.
+            if _pending_pushes.get(agent_id) == memory:
+                del _pending_pushes[agent_id]
+    finally:
+        _push_tasks.pop(agent_id, None)
+
+
+async def flush_agent_prompt_pushes():
+    """Push every memory still waiting for its quiet period, at shutdown"""
+    tasks = list(_push_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    for agent_id in list(_pending_pushes):
+        await _push_memory(agent_id, _pending_pushes.pop(agent_id))
+
+
+def schedule_agent_prompt_push(agent_id: str, memory: str):
+    """
+    Push a memory to the ElevenLabs agent after a short quiet period
+
+    Pushes scheduled for the same agent while one is waiting are merged,
+    only the latest memory is sent.
+    """
+    _pending_pushes[agent_id] = memory
+    if agent_id not in _push_tasks:
+        _push_tasks[agent_id] = asyncio.create_task(_debounced_push(agent_id))
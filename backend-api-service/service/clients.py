@@ -0,0 +1,72 @@
+import logging
+from typing import Optional
+
+import aiohttp
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from config import (
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Process-wide clients, created in the app lifespan
+_openai_client: Optional[AsyncOpenAI] = None
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Get the shared OpenAI client
+
+    Connections to OpenAI are pooled and reused by every request. The
+    client is created on first use outside of the app lifespan, e.g. in
+    scripts.
+    """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    keepalive_expiry=60.0,
+                ),
+            ),
+        )
+    return _openai_client
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Get the shared aiohttp session, used for calls to the RAG service"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_MAX_CONNECTIONS, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+        )
+    return _http_session
+
+
+async def start_clients():
+    """Create the shared clients"""
+    get_openai_client()
+    get_http_session()
+
+
+async def close_clients():
+    """Close the shared clients and their connections"""
+    global _openai_client, _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
+import json
 import uuid
+from datetime import datetime
 from . import models
 from typing import Optional, List
 from config import DEFAULT_MEMORY_PROMPT
@@ -119,6 +121,17 @@ def update_agent_elevenlabs_id(
     return db_agent
 
 
+def update_agent_prompt_hash(
+    db: Session, agent_id: str, prompt_hash: str
+) -> models.Agent:
+    """Update the hash of the prompt last pushed to the ElevenLabs agent"""
+    db_agent = db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
+    if db_agent:
+        db_agent.prompt_hash = prompt_hash
+        # Don't commit here - will be done by the transaction decorator
+    return db_agent
+
+
 def update_agent_voice_id(db: Session, agent_id: str, voice_id: str) -> models.Agent:
     """Update an agent with the ElevenLabs voice ID"""
     db_agent = db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
@@ -224,6 +237,8 @@ def add_new_user_memory(
     agent_id: str,
     text: str,
     mood: str,
+    embedding: Optional[bytes] = None,
+    embedding_model: Optional[str] = None,
 ) -> models.Memory:
     """Add a new memory entry for a user"""
     # Validate required parameters
@@ -232,7 +247,13 @@ def add_new_user_memory(
 
     memory_id = f"memory_{uuid.uuid4()}"
     db_memory = models.Memory(
-        memory_id=memory_id, user_id=user_id, agent_id=agent_id, text=text, mood=mood
+        memory_id=memory_id,
+        user_id=user_id,
+        agent_id=agent_id,
+        text=text,
+        mood=mood,
+        embedding=embedding,
+        embedding_model=embedding_model,
     )
     db.add(db_memory)
     db.flush()  # Flush to get the ID without committing
@@ -251,3 +272,70 @@ def update_memory(db: Session, memory_id: int, text: str) -> models.Memory:
 def get_agent_from_id(db: Session, agent_id: str) -> models.Agent:
     """Get an agent by its agent_id"""
     return db.query(models.Agent).filter(models.Agent.agent_id == agent_id).first()
+
+
+def create_webhook_job(
+    db: Session, kind: str, payload: dict, user_id: Optional[int] = None
+) -> models.WebhookJob:
+    """Queue a webhook job to be processed by the worker pool"""
+    db_job = models.WebhookJob(
+        job_id=f"job_{uuid.uuid4()}",
+        kind=kind,
+        payload=json.dumps(payload),
+        user_id=user_id,
+        status="queued",
+        attempts=0,
+        next_run_at=datetime.utcnow(),
+    )
+    db.add(db_job)
+    db.flush()  # Flush to get the ID without committing
+    return db_job
+
+
+def get_webhook_job(db: Session, job_id: str) -> models.WebhookJob:
+    """Get a webhook job by its job_id"""
+    return (
+        db.query(models.WebhookJob).filter(models.WebhookJob.job_id == job_id).first()
+    )
+
+
+def get_processed_conversation(
+    db: Session, conversation_id: str
+) -> Optional[models.ProcessedConversation]:
+    """Get the ledger entry of an ElevenLabs conversation"""
+    return (
+        db.query(models.ProcessedConversation)
+        .filter(models.ProcessedConversation.conversation_id == conversation_id)
+        .first()
+    )
+
+
+def create_processed_conversation(
+    db: Session, conversation_id: str, agent_id: int
+) -> models.ProcessedConversation:
+    """
+    Record that a conversation is being processed
+    Raises IntegrityError if it was already recorded
+    """
+    db_processed = models.ProcessedConversation(
+        conversation_id=conversation_id, agent_id=agent_id, status="in_progress"
+    )
+    db.add(db_processed)
+    db.flush()  # Flush so a duplicate fails here, not at commit
+    return db_processed
+
+
+def get_memory_summaries(
+    db: Session, user_id: int, period: str, limit: int = 12
+) -> List[models.MemorySummary]:
+    """Get the latest summaries of a period kind for a user, newest first"""
+    return (
+        db.query(models.MemorySummary)
+        .filter(
+            models.MemorySummary.user_id == user_id,
+            models.MemorySummary.period == period,
+        )
+        .order_by(models.MemorySummary.period_start.desc())
+        .limit(limit)
+        .all()
+    )
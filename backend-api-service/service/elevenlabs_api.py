@@ -1,5 +1,7 @@
-import requests
+import asyncio
+import httpx
 import logging
+import random
 import sys
 import os
 from typing import Optional, TypedDict
@@ -21,6 +23,20 @@ logger = logging.getLogger(__name__)
 # ElevenLabs API base URL
 ELEVENLABS_API_BASE_URL = "https://api.elevenlabs.io"
 
+# Client settings
+ELEVENLABS_TIMEOUT_SECONDS = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "15"))
+ELEVENLABS_UPLOAD_TIMEOUT_SECONDS = float(
+    os.getenv("ELEVENLABS_UPLOAD_TIMEOUT_SECONDS", "60")
+)
+ELEVENLABS_MAX_RETRIES = int(os.getenv("ELEVENLABS_MAX_RETRIES", "3"))
+ELEVENLABS_MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "20"))
+RETRY_BACKOFF_BASE_SECONDS = 0.5
+RETRY_BACKOFF_MAX_SECONDS = 8.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Shared client, created in the app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
 
 # Schema definitions for ElevenLabs API
 class InitialMessage(TypedDict):
@@ -66,7 +82,115 @@ class AgentResponse(TypedDict):
     signed_url: Optional[str]
 
 
-def create_elevenlabs_agent() -> AgentResponse:
+async def start_client() -> httpx.AsyncClient:
+    """
+    Create the shared ElevenLabs client
+
+    Connections are kept alive and pooled, and HTTP/2 is used when the h2
+    package is installed.
+    """
+    global _client
+    if _client is not None and not _client.is_closed:
+        return _client
+
+    try:
+        import h2  # noqa: F401
+
+        http2 = True
+    except ImportError:
+        logger.warning("h2 is not installed, using HTTP/1.1 for ElevenLabs")
+        http2 = False
+
+    _client = httpx.AsyncClient(
+        base_url=ELEVENLABS_API_BASE_URL,
+        headers={"xi-api-key": ELEVENLABS_API_KEY},
+        http2=http2,
+        timeout=httpx.Timeout(ELEVENLABS_TIMEOUT_SECONDS, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=ELEVENLABS_MAX_CONNECTIONS,
+            max_keepalive_connections=ELEVENLABS_MAX_CONNECTIONS,
+            keepalive_expiry=60.0,
+        ),
+    )
+    return _client
+
+
+async def close_client():
+    """Close the shared ElevenLabs client"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    """Backoff before the next attempt, honouring Retry-After on 429"""
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), RETRY_BACKOFF_MAX_SECONDS)
+
+    # Full jitter, so concurrent callers do not retry in lockstep
+    ceiling = min(RETRY_BACKOFF_BASE_SECONDS * 2**attempt, RETRY_BACKOFF_MAX_SECONDS)
+    return random.uniform(0, ceiling)
+
+
+async def _request(
+    method: str, path: str, idempotent: bool = True, **kwargs
+) -> httpx.Response:
+    """
+    Send a request to ElevenLabs, retrying on 429, 5xx and connection errors
+
+    Args:
+        method: The HTTP method
+        path: The path below the API base URL
+        idempotent: Whether the request may be repeated after a 5xx or a
+            read error; a 429 or a failed connect is always retried
+        **kwargs: Passed on to httpx
+
+    Returns:
+        The successful response
+
+    Raises:
+        httpx.HTTPError: If the request still fails after the retries
+    """
+    client = await start_client()
+
+    for attempt in range(ELEVENLABS_MAX_RETRIES + 1):
+        response = None
+        try:
+            response = await client.request(method, path, **kwargs)
+            retryable = response.status_code == 429 or (
+                idempotent and response.status_code in RETRYABLE_STATUS_CODES
+            )
+            if not retryable or attempt == ELEVENLABS_MAX_RETRIES:
+                response.raise_for_status()
+                return response
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            # The request was never sent
+            if attempt == ELEVENLABS_MAX_RETRIES:
+                raise
+        except httpx.TransportError:
+            if not idempotent or attempt == ELEVENLABS_MAX_RETRIES:
+                raise
+
+        delay = _retry_delay(attempt, response)
+        logger.warning(
+            f"ElevenLabs {method} {path} failed "
+            f"({response.status_code if response is not None else 'network error'}), "
+            f"retrying in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+
+def _log_http_error(message: str, e: httpx.HTTPError):
+    """Log an ElevenLabs error and the response body if there is one"""
+    logger.error(f"{message}: {str(e)}")
+    if isinstance(e, httpx.HTTPStatusError):
+        logger.error(f"Response content: {e.response.text}")
+
+
+async def create_elevenlabs_agent() -> AgentResponse:
     """
     Create a new agent using the ElevenLabs API
 
@@ -79,31 +203,25 @@ def create_elevenlabs_agent() -> AgentResponse:
     """
     # Return a dummy response if using a dummy key
 
-    url = f"{ELEVENLABS_API_BASE_URL}/v1/convai/agents/create"
-
-    # Set up headers with API key
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "xi-api-key": ELEVENLABS_API_KEY,
-    }
-
     try:
-        # Make the API request
-        response = requests.post(url, json=create_agent_payload, headers=headers)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        # Not idempotent, a retried create could add a second agent
+        response = await _request(
+            "POST",
+            "/v1/convai/agents/create",
+            idempotent=False,
+            json=create_agent_payload,
+            headers={"Accept": "application/json"},
+        )
 
         # Parse and return the response
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         # Log the error and re-raise
-        logger.error(f"Error creating ElevenLabs agent: {str(e)}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Response content: {e.response.text}")
+        _log_http_error("Error creating ElevenLabs agent", e)
         raise
 
 
-def get_signed_url(agent_id):
+async def get_signed_url(agent_id):
     """
     Get a signed URL for an ElevenLabs agent
 
@@ -113,35 +231,24 @@ def get_signed_url(agent_id):
     Returns:
         str: The signed URL for the agent
     """
-
-    url = f"{ELEVENLABS_API_BASE_URL}/v1/convai/conversation/get_signed_url"
-
-    # Set up headers with API key
-    headers = {
-        "Accept": "application/json",
-        "xi-api-key": ELEVENLABS_API_KEY,
-    }
-
-    # Set up query parameters
-    params = {"agent_id": agent_id}
-
     try:
-        # Make the API request
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        response = await _request(
+            "GET",
+            "/v1/convai/conversation/get_signed_url",
+            params={"agent_id": agent_id},
+            headers={"Accept": "application/json"},
+        )
 
         # Parse and return the response
         result = response.json()
         return result.get("signed_url")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         # Log the error and re-raise
-        logger.error(f"Error getting signed URL for agent {agent_id}: {str(e)}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Response content: {e.response.text}")
+        _log_http_error(f"Error getting signed URL for agent {agent_id}", e)
         raise
 
 
-def create_elevenlabs_voice(file_data: bytes, name: str) -> dict:
+async def create_elevenlabs_voice(file_data: bytes, name: str) -> dict:
     """
     Create a new voice using the ElevenLabs API
 
@@ -152,14 +259,6 @@ def create_elevenlabs_voice(file_data: bytes, name: str) -> dict:
     Returns:
         dict: The created voice data including voice_id
     """
-
-    url = f"{ELEVENLABS_API_BASE_URL}/v1/voices/add"
-
-    # Set up headers with API key
-    headers = {
-        "xi-api-key": ELEVENLABS_API_KEY,
-    }
-
     # Prepare the multipart form data
     # The ElevenLabs API expects 'files' to be an array of files
     # We need to provide a filename with .webm extension for proper processing
@@ -172,59 +271,56 @@ def create_elevenlabs_voice(file_data: bytes, name: str) -> dict:
     }
 
     try:
-        # Make the API request
-        response = requests.post(url, headers=headers, files=files, data=data)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        response = await _request(
+            "POST",
+            "/v1/voices/add",
+            idempotent=False,
+            files=files,
+            data=data,
+            timeout=ELEVENLABS_UPLOAD_TIMEOUT_SECONDS,
+        )
 
         # Parse and return the response
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         # Log the error and re-raise
-        logger.error(f"Error creating ElevenLabs voice: {str(e)}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Response content: {e.response.text}")
+        _log_http_error("Error creating ElevenLabs voice", e)
         raise
 
 
-def load_memory_into_agent(agent_id: str, memory: str):
-    """
-    Load a memory into an ElevenLabs agent
-    """
-    url = f"{ELEVENLABS_API_BASE_URL}/v1/convai/agents/{agent_id}"
-
-    INSTRUCT = SYSTEM_PROMPT + "/n" + memory
+def build_agent_prompt(memory: str) -> str:
+    """Build the agent prompt from the system prompt and a memory"""
+    return SYSTEM_PROMPT + "/n" + memory
 
-    # Set up headers with API key
-    headers = {
-        "Accept": "application/json",
-        "xi-api-key": ELEVENLABS_API_KEY,
-    }
 
-    PATCH_AGENT_PAYLOAD["conversation_config"]["agent"]["prompt"]["prompt"] = INSTRUCT
+async def load_memory_into_agent(agent_id: str, memory: str):
+    """
+    Load a memory into an ElevenLabs agent
 
-    # Make the API request
-    response = requests.patch(url, headers=headers, json=PATCH_AGENT_PAYLOAD)
-    response.raise_for_status()  # Raise an exception for HTTP errors
+    Only the prompt is sent, the rest of the agent configuration is left
+    as it is.
+    """
+    response = await _request(
+        "PATCH",
+        f"/v1/convai/agents/{agent_id}",
+        json=load_memory_payload(build_agent_prompt(memory)),
+        headers={"Accept": "application/json"},
+    )
 
     # Parse and return the response
     return response.json()
 
 
-def load_tools_into_agent(agent_id: str):
+async def load_tools_into_agent(agent_id: str):
     """
     Load tools into an ElevenLabs agent
     """
-    url = f"{ELEVENLABS_API_BASE_URL}/v1/convai/agents/{agent_id}"
-
-    # Set up headers with API key
-    headers = {
-        "Accept": "application/json",
-        "xi-api-key": ELEVENLABS_API_KEY,
-    }
-
-    # Make the API request
-    response = requests.patch(url, headers=headers, json=PATCH_AGENT_PAYLOAD)
-    response.raise_for_status()  # Raise an exception for HTTP errors
+    response = await _request(
+        "PATCH",
+        f"/v1/convai/agents/{agent_id}",
+        json=PATCH_AGENT_PAYLOAD,
+        headers={"Accept": "application/json"},
+    )
 
     # Parse and return the response
     return response.json()
@@ -1,12 +1,48 @@
+from sqlalchemy import inspect, text
 from service.database import engine
 from service import models
 
+# Columns added to existing tables after their creation, create_all() only
+# creates missing tables
+ADDED_COLUMNS = {
+    "agents": {"prompt_hash": "VARCHAR"},
+    "memories": {"embedding": "BLOB", "embedding_model": "VARCHAR"},
+    "webhook_jobs": {"user_id": "INTEGER"},
+}
+
+
+def migrate_columns():
+    """
+    Add columns that are in the models but missing from existing tables.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, column_type in columns.items():
+                if name not in existing:
+                    connection.execute(
+                        text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                    )
+                    print(f"Added column {table}.{name}.")
+
+
+def migrate_indexes():
+    """
+    Create indexes that are in the models but missing from existing tables.
+    """
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 
 def init_database():
     """
     Initialize the database by creating all tables defined in models.
     """
     models.Base.metadata.create_all(bind=engine)
+    migrate_columns()
+    migrate_indexes()
     print("Database tables created successfully.")
 
 
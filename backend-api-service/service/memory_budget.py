@@ -0,0 +1,51 @@
+import math
+import re
+from typing import Dict, Tuple
+from config import MEMORY_SECTIONS, MEMORY_SECTION_TOKEN_BUDGETS
+from service.memory_sections import parse_sections
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a text without a tokenizer
+
+    Punctuation marks count as one token and words as one token per six
+    characters, which is close to what BPE tokenizers produce for prose.
+    """
+    return sum(
+        math.ceil(len(token) / 6) if token[0].isalnum() or token[0] == "_" else 1
+        for token in TOKEN_PATTERN.findall(text)
+    )
+
+
+def sections_over_budget(memory: str) -> Dict[str, Tuple[int, int]]:
+    """Return the (tokens, budget) of every memory section over its budget"""
+    _, bodies = parse_sections(memory or "", list(MEMORY_SECTIONS.values()))
+
+    over = {}
+    for key, header in MEMORY_SECTIONS.items():
+        tokens = estimate_tokens(bodies.get(header, ""))
+        budget = MEMORY_SECTION_TOKEN_BUDGETS[key]
+        if tokens > budget:
+            over[key] = (tokens, budget)
+    return over
+
+
+def split_oldest(body: str, keep_tokens: int) -> Tuple[str, str]:
+    """Split a section into its oldest lines and the newest lines fitting keep_tokens
+
+    New content is appended at the end of a section, so the lines at the
+    top are the oldest ones.
+    """
+    lines = body.splitlines()
+    kept = 0
+    start = len(lines)
+    while start > 0:
+        tokens = estimate_tokens(lines[start - 1])
+        if kept + tokens > keep_tokens:
+            break
+        kept += tokens
+        start -= 1
+
+    return "\n".join(lines[:start]).strip(), "\n".join(lines[start:]).strip()
@@ -1,12 +1,52 @@
 from openai import AsyncOpenAI
-from config import RAG_SERVICE_URL
+from config import (
+    RAG_SERVICE_URL,
+    MEMORY_SECTIONS,
+    MEMORY_UPDATE_MODE,
+    MEMORY_EMBEDDING_MODEL,
+    MEMORY_EMBEDDING_DIMENSIONS,
+    MEMORY_RETRIEVAL_TOP_K,
+    MEMORY_RETRIEVAL_TOKEN_BUDGET,
+    MEMORY_OVERVIEW_TOKEN_BUDGET,
+)
 import aiohttp
 import asyncio
+import json
+import logging
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
 from . import crud
 from . import models
 from datetime import datetime, timedelta
 from enum import StrEnum
-from service.elevenlabs_api import load_memory_into_agent
+from typing import AsyncIterator
+from service.agent_prompt import schedule_agent_prompt_push
+from service.memory_sections import (
+    apply_section_patch,
+    patch_instructions,
+    parse_sections,
+    render_sections,
+)
+from service.memory_budget import sections_over_budget, split_oldest
+from service.memory_summaries import refresh_user_summaries
+from service.memory_retrieval import (
+    pack_embedding,
+    rank_by_similarity,
+    select_within_budget,
+)
+from service.elevenlabs_api import parse_conversation
+from service.clients import get_openai_client, get_http_session
+from service.webhook_jobs import after_job_commit
+
+logger = logging.getLogger(__name__)
+
+# Days fetched per round trip when reading calendar ranges
+CALENDAR_YIELD_PER = 500
+
+# Memories embedded at most per query, older ones are embedded by later queries
+EMBEDDING_BACKFILL_LIMIT = 256
+# Stored with every embedding, the others are computed again
+EMBEDDING_MODEL_KEY = f"{MEMORY_EMBEDDING_MODEL}:{MEMORY_EMBEDDING_DIMENSIONS}"
 
 
 class Mood(StrEnum):
@@ -17,67 +57,136 @@ class Mood(StrEnum):
     A_BIT_SAD = "U+1F614"
 
 
+# Response format of the single call returning mood, summary and memory edits
+CONVERSATION_UPDATE_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "conversation_update",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "mood": {"type": "string", "enum": [mood.value for mood in Mood]},
+                "summary": {"type": "string"},
+                "edits": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "section": {
+                                "type": "string",
+                                "enum": list(MEMORY_SECTIONS),
+                            },
+                            "op": {"type": "string", "enum": ["append", "replace"]},
+                            "text": {"type": "string"},
+                        },
+                        "required": ["section", "op", "text"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["mood", "summary", "edits"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+MEMORY_UPDATE_INSTRUCTIONS = """
+        Given the current memory and the latest conversation, update the memory
+        adding information from the conversation. Bear in mind that you have to time by time update
+        the memory of the user. For example you should iterate over the information that the user give you
+        even if these information might not seem relevant at first. For example, if the user tells you
+        that he is feeling tired, you should update the memory to reflect that. Initially also the long term memory
+        might be affected by the conversation.
+        Also, remember that the structure of memory must not be changed.
+
+        Who are we the diary of (long term memory)
+            To fill, bear in mind that this is the long term memory. It needs to be updated frequently since you don't have a clear understanding of our human friend.
+        How our human friend is doing lately (short term memory)
+            To fill, bear in mind that this is the short term memory. It needs to take into account what has happened lately.
+        What was the topic op the last conversation we had (short term memory)
+            To fill, bear in mind that this is the short term memory. It needs to take into account what was the topic of the last conversation we had.
+"""
+
+
 class MemoryManager:
-    def __init__(self, db):
-        self.client = AsyncOpenAI()
+    def __init__(
+        self,
+        db,
+        client: AsyncOpenAI | None = None,
+        session: aiohttp.ClientSession | None = None,
+    ):
+        # The clients are shared by the whole process, never closed here
+        self.client = client or get_openai_client()
         self.db = db
-        self.session = None
+        self.session = session
 
     async def get_aiohttp_session(self):
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            self.session = get_http_session()
         return self.session
 
-    async def close(self):
-        if self.session and not self.session.closed:
-            await self.session.close()
-            self.session = None
-
     async def update_memory(
         self,
         agent_id: str,
         user_id: str,
         memory: str,
         last_conversation: str,
-        elevenlabs_id: str = None,
     ):
         # Create a prompt that instructs the model to update the memory based
         # on the new conversation
 
-        mood, updated_memory, summary = await asyncio.gather(
-            self.llm_sentiment_analysis_memory(last_conversation),
-            self.llm_update_memory(agent_id, user_id, memory, last_conversation),
-            self.summarize_conversation(last_conversation),
-        )
+        result = None
+        if MEMORY_UPDATE_MODE == "structured":
+            try:
+                result = await self.llm_update_conversation(memory, last_conversation)
+            except Exception as e:
+                logger.warning(
+                    f"Structured memory update failed, using separate calls: {str(e)}"
+                )
 
-        crud.update_user_memory_by_agent_id(self.db, agent_id, updated_memory)
+        if result is None:
+            result = await asyncio.gather(
+                self.llm_sentiment_analysis_memory(last_conversation),
+                self.llm_update_memory(agent_id, user_id, memory, last_conversation),
+                self.summarize_conversation(last_conversation),
+            )
+        mood, updated_memory, summary = result
 
-        crud.add_new_user_memory(self.db, user_id, agent_id, text=summary, mood=mood)
+        crud.update_user_memory_by_agent_id(self.db, agent_id, updated_memory)
 
-        load_memory_into_agent(elevenlabs_id, updated_memory)
+        try:
+            embedding = pack_embedding((await self.embed_texts([summary]))[0])
+        except Exception as e:
+            # Embedded later, when the user's memories are first queried
+            logger.warning(f"Could not embed memory summary: {str(e)}")
+            embedding = None
+
+        crud.add_new_user_memory(
+            self.db,
+            user_id,
+            agent_id,
+            text=summary,
+            mood=mood,
+            embedding=embedding,
+            embedding_model=EMBEDDING_MODEL_KEY if embedding else None,
+        )
 
         return updated_memory
 
     async def llm_update_memory(
         self, agent_id: str, user_id: str, memory: str, text: str
     ) -> str:
-        """Update the memory using the LLM"""
-        system_prompt = """
+        """Update the memory using the LLM
+
+        The model only returns edits for the sections that changed, which are
+        applied locally, so the answer stays short as the memory grows.
+        """
+        system_prompt = f"""
         You are an assistant that updates a user's memory document.
-        Given the current memory and the latest conversation, update the memory
-        adding information from the conversation. Bear in mind that you have to time by time update
-        the memory of the user. For example you should iterate over the information that the user give you
-        even if these information might not seem relevant at first. For example, if the user tells you
-        that he is feeling tired, you should update the memory to reflect that. Initially also the long term memory
-        might be affected by the conversation.
-        Also, remember that the input structure of memory must not be changed. 
-        
-        Who are we the diary of (long term memory)
-            To fill, bear in mind that this is the long term memory. It needs to be updated frequently since you don't have a clear understanding of our human friend.
-        How our human friend is doing lately (short term memory)
-            To fill, bear in mind that this is the short term memory. It needs to take into account what has happened lately.
-        What was the topic op the last conversation we had (short term memory)
-            To fill, bear in mind that this is the short term memory. It needs to take into account what was the topic of the last conversation we had.
+        {MEMORY_UPDATE_INSTRUCTIONS}
+        {patch_instructions(MEMORY_SECTIONS)}
         """
 
         user_prompt = f"""
@@ -87,7 +196,7 @@ class MemoryManager:
         LATEST CONVERSATION:
         {text}
 
-        Please update with relevant information from this conversation.
+        Please return the section edits with relevant information from this conversation.
         """
 
         # Call the OpenAI API with the updated client format
@@ -97,13 +206,140 @@ class MemoryManager:
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
+            response_format={"type": "json_object"},
         )
 
-        # Extract the updated memory from the response
-        updated_memory = response.choices[0].message.content
+        # Apply the section edits from the response
+        patch = response.choices[0].message.content
+        updated_memory = apply_section_patch(memory or "", MEMORY_SECTIONS, patch)
 
         return updated_memory
 
+    async def llm_update_conversation(
+        self, memory: str, text: str
+    ) -> tuple[Mood, str, str]:
+        """Get the mood, the summary and the memory update in one call
+
+        The transcript is sent once instead of three times. Raises if the
+        answer is refused or does not validate, so the caller can fall back
+        to the separate calls.
+        """
+        moods = ", ".join(
+            f"{mood.name.replace('_', ' ').title()}: {mood.value}" for mood in Mood
+        )
+        system_prompt = f"""
+        You are the AI diary of the user. From the latest conversation you
+        produce three things at once:
+
+        "mood": the mood of the user in the conversation, as the Unicode code
+        point of one of these emojis: {moods}.
+
+        "summary": a summary of the conversation that is useful to the user.
+        Must be very short and clear. Refer to the user by their name.
+
+        "edits": the edits to the user's memory document.
+        {MEMORY_UPDATE_INSTRUCTIONS}
+        {patch_instructions(MEMORY_SECTIONS)}
+        """
+
+        user_prompt = f"""
+        CURRENT MEMORY:
+        {memory}
+
+        LATEST CONVERSATION:
+        {text}
+        """
+
+        response = await self.client.chat.completions.create(
+            model="gpt-4o-2024-08-06",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            response_format=CONVERSATION_UPDATE_SCHEMA,
+        )
+
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"Model refused the update: {message.refusal}")
+
+        result = json.loads(message.content)
+        mood = Mood(result["mood"])
+        summary = result["summary"].strip()
+        if not summary:
+            raise ValueError("Empty conversation summary")
+        updated_memory = apply_section_patch(
+            memory or "", MEMORY_SECTIONS, json.dumps({"edits": result["edits"]})
+        )
+
+        return mood, updated_memory, summary
+
+    async def llm_compact_section(self, header: str, text: str, budget: int) -> str:
+        """Summarize the oldest content of a memory section"""
+        system_prompt = f"""
+        You are an assistant that compacts a section of a user's memory document.
+        The section is "{header}". Summarize the following oldest part of it,
+        keeping names, places, dates, preferences and anything the user might
+        bring up again. Drop repetitions and details that were superseded.
+        Answer with the summary only, in at most {budget} tokens.
+        """
+
+        response = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text},
+            ],
+            max_tokens=budget,
+        )
+
+        return response.choices[0].message.content.strip()
+
+    async def compact_memory(self, agent_id: str) -> str | None:
+        """Summarize the oldest content of every memory section over its budget
+
+        Returns the compacted memory, or None if nothing had to be compacted.
+        The caller commits the session.
+        """
+        agent = crud.get_agent_from_id(self.db, agent_id)
+        if not agent or not agent.memory:
+            return None
+
+        over_budget = sections_over_budget(agent.memory)
+        if not over_budget:
+            return None
+
+        headers = list(MEMORY_SECTIONS.values())
+        _, bodies = parse_sections(agent.memory, headers)
+
+        # The newest half of the budget is kept verbatim, the rest is summarized
+        compacted = {}
+        for key, (tokens, budget) in over_budget.items():
+            header = MEMORY_SECTIONS[key]
+            oldest, _ = split_oldest(bodies.get(header, ""), budget // 2)
+            if not oldest:
+                continue
+            summary = await self.llm_compact_section(header, oldest, budget // 2)
+            compacted[header] = (oldest, summary)
+            logger.info(f"Compacted {key} memory of agent {agent_id} ({tokens} tokens)")
+
+        # The memory may have been updated while the LLM was running
+        self.db.refresh(agent)
+        preamble, bodies = parse_sections(agent.memory or "", headers)
+        for header, (oldest, summary) in compacted.items():
+            body = bodies.get(header, "")
+            if not body.startswith(oldest):
+                # The section was rewritten meanwhile, the summary is stale
+                continue
+            bodies[header] = "\n".join(
+                part for part in (summary, body[len(oldest) :].strip()) if part
+            )
+
+        compacted_memory = render_sections(preamble, bodies, headers)
+        crud.update_user_memory_by_agent_id(self.db, agent_id, compacted_memory)
+
+        return compacted_memory
+
     async def llm_sentiment_analysis_memory(self, memory: str) -> Mood | None:
         """Analyze the sentiment of a memory"""
         system_prompt = """
@@ -169,23 +405,143 @@ class MemoryManager:
 
         return response.choices[0].message.content
 
-    async def query_all_user_memories(self, user_id: int, query: str) -> str:
-        """Query all memories of a user and run a query against them using ChatGPT"""
-        # Get all memories for the user
-        memories = (
-            self.db.query(models.Memory).filter(models.Memory.user_id == user_id).all()
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the memory embedding model"""
+        response = await self.client.embeddings.create(
+            model=MEMORY_EMBEDDING_MODEL,
+            input=texts,
+            dimensions=MEMORY_EMBEDDING_DIMENSIONS,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def retrieve_relevant_memories(
+        self, user_id: int, query: str
+    ) -> list[models.Memory]:
+        """Get the memories most relevant to a query, within the token budget
+
+        Only the embeddings are loaded to rank the memories, the texts are
+        loaded for the top matches. Memories without an embedding are
+        embedded in the same request as the query. If embedding fails, the
+        latest memories are used instead.
+        """
+        rows = (
+            self.db.query(
+                models.Memory.id, models.Memory.embedding, models.Memory.embedding_model
+            )
+            .filter(
+                models.Memory.user_id == user_id,
+                models.Memory.text.isnot(None),
+                models.Memory.text != "",
+            )
+            .order_by(models.Memory.id)
+            .all()
+        )
+        if not rows:
+            return []
+
+        # Embeddings of another model or size are computed again
+        blobs = {
+            row.id: row.embedding
+            for row in rows
+            if row.embedding is not None and row.embedding_model == EMBEDDING_MODEL_KEY
+        }
+        # Oldest first, a large backlog is worked off over several queries
+        missing = [row.id for row in rows if row.id not in blobs]
+        if len(missing) > EMBEDDING_BACKFILL_LIMIT:
+            logger.info(
+                f"Embedding {EMBEDDING_BACKFILL_LIMIT} memories of user {user_id}, "
+                f"{len(missing) - EMBEDDING_BACKFILL_LIMIT} left out of this query"
+            )
+            missing = missing[:EMBEDDING_BACKFILL_LIMIT]
+        missing_texts = dict(
+            self.db.query(models.Memory.id, models.Memory.text)
+            .filter(models.Memory.id.in_(missing))
+            .all()
         )
 
+        try:
+            embeddings = await self.embed_texts(
+                [query] + [missing_texts[memory_id] for memory_id in missing]
+            )
+        except Exception as e:
+            logger.warning(f"Could not embed memory query, using latest: {str(e)}")
+            candidates = (
+                self.db.query(models.Memory)
+                .filter(models.Memory.id.in_([row.id for row in rows]))
+                .order_by(models.Memory.created_at.desc())
+                .limit(MEMORY_RETRIEVAL_TOP_K)
+                .all()
+            )
+        else:
+            for memory_id, embedding in zip(missing, embeddings[1:]):
+                blobs[memory_id] = pack_embedding(embedding)
+                self.db.query(models.Memory).filter(
+                    models.Memory.id == memory_id
+                ).update(
+                    {
+                        "embedding": blobs[memory_id],
+                        "embedding_model": EMBEDDING_MODEL_KEY,
+                    },
+                    synchronize_session=False,
+                )
+
+            ids = list(blobs)
+            ranked = rank_by_similarity(
+                embeddings[0],
+                [blobs[memory_id] for memory_id in ids],
+                MEMORY_RETRIEVAL_TOP_K,
+            )
+            top_ids = [ids[position] for position in ranked]
+            by_id = {
+                memory.id: memory
+                for memory in self.db.query(models.Memory).filter(
+                    models.Memory.id.in_(top_ids)
+                )
+            }
+            candidates = [by_id[memory_id] for memory_id in top_ids]
+
+        selected = select_within_budget(
+            [memory.text for memory in candidates], MEMORY_RETRIEVAL_TOKEN_BUDGET
+        )
+        return sorted(
+            (candidates[position] for position in selected),
+            key=lambda memory: memory.created_at,
+        )
+
+    def _memory_overview(self, user_id: int) -> str:
+        """Latest week and month summaries of a user, within the overview budget"""
+        summaries = crud.get_memory_summaries(
+            self.db, user_id, "week", limit=2
+        ) + crud.get_memory_summaries(self.db, user_id, "month", limit=3)
+        selected = select_within_budget(
+            [summary.text for summary in summaries], MEMORY_OVERVIEW_TOKEN_BUDGET
+        )
+        return "\n\n".join(
+            f"{summaries[position].period.title()} of "
+            f"{summaries[position].period_start:%Y-%m-%d}: {summaries[position].text}"
+            for position in selected
+        )
+
+    async def _memory_query_messages(
+        self, user_id: int, query: str, max_tokens: int | None = None
+    ) -> list[dict] | str:
+        """Build the prompt answering a query from a user's relevant memories
+
+        Returns the answer itself instead if the user has no memories.
+        """
+        memories = await self.retrieve_relevant_memories(user_id, query)
         if not memories:
             return "No memories found for this user."
 
-        # Concatenate all memory texts
+        # Concatenate the memory texts, oldest first
         all_memory_text = "\n\n".join(
-            [memory.text for memory in memories if memory.text]
+            f"{memory.created_at:%Y-%m-%d}: {memory.text}" for memory in memories
         )
 
-        if not all_memory_text:
-            return "No memory content found for this user."
+        # Recent week and month summaries give the answer some background
+        overview = self._memory_overview(user_id)
+        if overview:
+            all_memory_text = f"OVERVIEW:\n{overview}\n\n{all_memory_text}"
 
         # Create a prompt for ChatGPT
         system_prompt = """
@@ -193,6 +549,11 @@ class MemoryManager:
         Given a collection of memories and a query, find and summarize the most relevant information.
         Be concise but comprehensive in your response.
         """
+        if max_tokens:
+            system_prompt += f"""
+        Your answer is read aloud. Start with the most relevant fact and keep
+        the whole answer under {max_tokens} tokens.
+        """
 
         user_prompt = f"""
         USER MEMORIES:
@@ -204,18 +565,57 @@ class MemoryManager:
         Please provide the most relevant information from these memories that answers the query.
         """
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    async def query_all_user_memories(self, user_id: int, query: str) -> str:
+        """Query all memories of a user and run a query against them using ChatGPT"""
+        messages = await self._memory_query_messages(user_id, query)
+        if isinstance(messages, str):
+            return messages
+
         # Call the OpenAI API
         response = await self.client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            messages=messages,
         )
 
         # Extract the response
         return response.choices[0].message.content
 
+    async def stream_query_all_user_memories(
+        self, user_id: int, query: str, max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Like query_all_user_memories, but yield the answer as it is generated
+
+        The memories are read and the completion is started before this
+        returns, so errors surface before the first chunk is sent.
+        """
+        messages = await self._memory_query_messages(user_id, query, max_tokens)
+        if isinstance(messages, str):
+            answer = messages
+
+            async def single_chunk():
+                yield answer
+
+            return single_chunk()
+
+        stream = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        async def chunks():
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        return chunks()
+
     async def post_memory_update(self, memory: str):
         """Post the updated memory to the RAG service"""
         uri = f"{RAG_SERVICE_URL}/update_memory"
@@ -223,6 +623,50 @@ class MemoryManager:
         async with session.post(uri, json={"memory": memory}) as response:
             return await response.json()
 
+    def get_memories_by_day(self, user_id: int, start: datetime, end: datetime):
+        """
+        Get the memories of a user between start and end, grouped by day.
+        Returns a list of DailyMemoryItem objects, oldest day first.
+
+        The grouping happens in SQL: window functions join the texts of each
+        day in order and pick the day's latest memory, whose mood is the mood
+        of the day. Only the rows of the range are read, through the
+        (user_id, created_at, mood) index, and results are streamed.
+        """
+        day = func.date(models.Memory.created_at)
+        chronological = (models.Memory.created_at, models.Memory.id)
+        latest_first = (models.Memory.created_at.desc(), models.Memory.id.desc())
+
+        entries = (
+            select(
+                day.label("day"),
+                func.group_concat(func.nullif(models.Memory.text, ""), "\n")
+                .over(partition_by=day, order_by=chronological, rows=(None, None))
+                .label("memory_text"),
+                models.Memory.mood,
+                func.row_number()
+                .over(partition_by=day, order_by=latest_first)
+                .label("position"),
+            )
+            .where(
+                models.Memory.user_id == user_id,
+                models.Memory.created_at >= start,
+                models.Memory.created_at < end,
+            )
+            .subquery()
+        )
+        query = (
+            select(entries.c.day, entries.c.memory_text, entries.c.mood)
+            .where(entries.c.position == 1, entries.c.memory_text.isnot(None))
+            .order_by(entries.c.day)
+            .execution_options(yield_per=CALENDAR_YIELD_PER)
+        )
+
+        return [
+            {"day_timestamp": row.day, "memory_text": row.memory_text, "mood": row.mood}
+            for row in self.db.execute(query)
+        ]
+
     def get_last_month_memories_by_day(self, user_id: int):
         """
         Get all memories from the last month for a user, grouped by day.
@@ -231,44 +675,82 @@ class MemoryManager:
         # Calculate the date one month ago from today
         one_month_ago = datetime.now() - timedelta(days=30)
 
-        # Query memories for this user from the last month
-        memories = (
-            self.db.query(models.Memory)
-            .filter(
-                models.Memory.user_id == user_id,
-                models.Memory.created_at >= one_month_ago,
-            )
-            .order_by(models.Memory.created_at)
-            .all()
+        return self.get_memories_by_day(
+            user_id, one_month_ago, datetime.now() + timedelta(days=1)
         )
 
-        # Group by day
-        memory_by_day = {}
-        mood_by_day = {}  # Track the mood of the last memory for each day
-        for memory in memories:
-            # Format day as ISO format date string (YYYY-MM-DD)
-            day_str = memory.created_at.date().isoformat()
 
-            if day_str not in memory_by_day:
-                memory_by_day[day_str] = []
+async def process_post_call_job(db: Session, payload: dict):
+    """Update an agent's memory from a post-call webhook payload"""
+    data = payload["data"]
+
+    # A job requeued after its lease expired may have finished meanwhile
+    conversation_id = data.get("conversation_id")
+    processed = (
+        crud.get_processed_conversation(db, conversation_id)
+        if conversation_id
+        else None
+    )
+    if processed and processed.status == "done":
+        logger.info(f"Conversation {conversation_id} already processed")
+        return
+
+    db_agent = crud.get_agent_by_elevenlabs_agent_id(db, data["agent_id"])
+    if not db_agent:
+        raise ValueError(f"Agent {data['agent_id']} not found")
+
+    memory_manager = MemoryManager(db)
+    updated_memory = await memory_manager.update_memory(
+        agent_id=db_agent.agent_id,
+        user_id=db_agent.user_id,
+        memory=db_agent.memory,
+        last_conversation=parse_conversation(data["transcript"]),
+    )
+
+    # Committed together with the memory update
+    if processed:
+        processed.status = "done"
+
+    # The agent only gets the memory once it is stored
+    agent_id = db_agent.agent_id
+    after_job_commit(db, lambda: schedule_agent_prompt_push(agent_id, updated_memory))
+
+    # Compaction runs as its own job, once this update is committed
+    if sections_over_budget(updated_memory):
+        crud.create_webhook_job(
+            db, "compact_memory", {"agent_id": agent_id}, user_id=db_agent.user_id
+        )
 
-            # Only add if there's text content
-            if memory.text:
-                memory_by_day[day_str].append(memory.text)
+    # Summaries of past days that got new memories are rebuilt in the background
+    crud.create_webhook_job(
+        db,
+        "summarize_memories",
+        {"user_id": db_agent.user_id},
+        user_id=db_agent.user_id,
+    )
 
-            # Always update mood to keep the last one
-            mood_by_day[day_str] = memory.mood
 
-        # Format the response
-        result = []
-        for day, texts in memory_by_day.items():
-            if texts:  # Only include days with memories
-                result.append(
-                    {
-                        "day_timestamp": day,
-                        "memory_text": "\n".join(texts),
-                        "mood": mood_by_day.get(day),
-                    }
-                )
+async def process_compact_memory_job(db: Session, payload: dict):
+    """Compact an agent's memory outside of the update that grew it"""
+    agent_id = payload["agent_id"]
 
-        return result
+    memory_manager = MemoryManager(db)
+    compacted_memory = await memory_manager.compact_memory(agent_id)
+
+    if compacted_memory is not None:
+        after_job_commit(
+            db, lambda: schedule_agent_prompt_push(agent_id, compacted_memory)
+        )
+
+
+async def process_summarize_memories_job(db: Session, payload: dict):
+    """Build the outdated day, week and month summaries of a user"""
+    remaining = await refresh_user_summaries(
+        db, get_openai_client(), payload["user_id"]
+    )
+
+    # Large backlogs are worked off in several jobs, each committed on its own
+    if remaining:
+        crud.create_webhook_job(
+            db, "summarize_memories", payload, user_id=payload["user_id"]
+        )
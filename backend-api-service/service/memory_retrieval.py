@@ -0,0 +1,57 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from service.memory_budget import estimate_tokens
+
+
+def pack_embedding(embedding: Sequence[float]) -> bytes:
+    """Store an embedding as a normalized float32 blob"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    return vector.astype(np.float32).tobytes()
+
+
+def rank_by_similarity(
+    query_embedding: Sequence[float], blobs: List[bytes], k: int
+) -> List[int]:
+    """
+    Rank stored embeddings against a query by cosine similarity
+
+    The blobs are normalized when stored, so the similarity is a single
+    matrix-vector product.
+
+    Returns the positions of the k most similar blobs, best first
+    """
+    if not blobs or k <= 0:
+        return []
+
+    matrix = np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(blobs), -1)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    scores = matrix @ query
+
+    k = min(k, len(blobs))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])].tolist()
+
+
+def select_within_budget(texts: List[str], token_budget: int) -> List[int]:
+    """
+    Take texts, best first, until the token budget is used up
+
+    The best text is always taken, even if it alone exceeds the budget.
+
+    Returns the positions of the selected texts, in order
+    """
+    selected = []
+    used = 0
+    for position, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if selected and used + tokens > token_budget:
+            continue
+        selected.append(position)
+        used += tokens
+    return selected
@@ -0,0 +1,226 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+from openai import AsyncOpenAI
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from config import MEMORY_SUMMARY_BATCH_LIMIT
+from service import models
+
+logger = logging.getLogger(__name__)
+
+# Answer length of the summary of each period kind
+SUMMARY_MAX_TOKENS = {"day": 150, "week": 250, "month": 400}
+
+
+def period_bounds(period: str, day: date) -> Tuple[date, date]:
+    """First day and the day after the last day of the period containing day"""
+    if period == "day":
+        return day, day + timedelta(days=1)
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == "month":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    raise ValueError(f"Unknown summary period: {period}")
+
+
+def _period_label(period: str, start: date) -> str:
+    if period == "day":
+        return start.strftime("%A %d %B %Y")
+    if period == "week":
+        return f"the week of {start.strftime('%d %B %Y')}"
+    return start.strftime("%B %Y")
+
+
+async def summarize_period(
+    client: AsyncOpenAI, period: str, start: date, texts: List[str]
+) -> str:
+    """Summarize the diary entries, or lower level summaries, of a period"""
+    if len(texts) == 1:
+        return texts[0]
+
+    system_prompt = f"""
+        You are the AI diary of the user. The following are the diary entries
+        of {_period_label(period, start)}, oldest first. Summarize them into
+        one entry for that {period}. Keep names, places, events, moods and
+        anything the user might bring up again, drop repetitions. Refer to
+        the user by their name. Answer with the summary only.
+        """
+
+    response = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "\n\n".join(texts)},
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS[period],
+    )
+
+    return response.choices[0].message.content.strip()
+
+
+def _save_summary(
+    db: Session,
+    existing: models.MemorySummary | None,
+    user_id: int,
+    period: str,
+    start: date,
+    text: str,
+    fingerprint: str,
+) -> models.MemorySummary:
+    summary = existing or models.MemorySummary(
+        user_id=user_id,
+        period=period,
+        period_start=start,
+        period_end=period_bounds(period, start)[1],
+    )
+    summary.text = text
+    summary.source_fingerprint = fingerprint
+    summary.updated_at = datetime.utcnow()
+    db.add(summary)
+    db.flush()
+    return summary
+
+
+async def refresh_user_summaries(
+    db: Session,
+    client: AsyncOpenAI,
+    user_id: int,
+    today: date | None = None,
+    limit: int = MEMORY_SUMMARY_BATCH_LIMIT,
+) -> int:
+    """
+    Build the missing or outdated summaries of a user's closed periods
+
+    Day summaries are built from the memories of the day, week and month
+    summaries from the day summaries they contain. A summary is outdated
+    when the rows it was built from changed, which is tracked with a
+    fingerprint of their count and latest ID or update. Periods that are
+    still running are left to the raw memories. At most `limit` summaries
+    are built per call, the caller commits.
+
+    Memories are only added to the running day and summaries are built
+    oldest first, so everything before the newest summary of each kind is
+    up to date and only the periods from there on are scanned. A week or
+    month is only built once all of its day summaries are.
+
+    Returns:
+        int: The number of outdated summaries left for a next call
+    """
+    today = today or datetime.utcnow().date()
+    budget = limit
+    remaining = 0
+
+    newest: Dict[str, date] = dict(
+        db.query(
+            models.MemorySummary.period, func.max(models.MemorySummary.period_start)
+        )
+        .filter(models.MemorySummary.user_id == user_id)
+        .group_by(models.MemorySummary.period)
+        .all()
+    )
+    # The newest day is checked again, parents need the days they contain
+    days_from = newest.get("day", date.min)
+    summaries_from = min(newest.get(period, date.min) for period in SUMMARY_MAX_TOKENS)
+
+    existing: Dict[Tuple[str, date], models.MemorySummary] = {
+        (summary.period, summary.period_start): summary
+        for summary in db.query(models.MemorySummary).filter(
+            models.MemorySummary.user_id == user_id,
+            models.MemorySummary.period_start >= summaries_from,
+        )
+    }
+
+    # Days, from the memories of each closed day
+    memory_day = func.date(models.Memory.created_at)
+    scan_from = datetime.combine(days_from, datetime.min.time())
+    closed_before = datetime.combine(today, datetime.min.time())
+    day_sources = (
+        db.query(memory_day, func.count(models.Memory.id), func.max(models.Memory.id))
+        .filter(
+            models.Memory.user_id == user_id,
+            models.Memory.text.isnot(None),
+            models.Memory.text != "",
+            models.Memory.created_at >= scan_from,
+            models.Memory.created_at < closed_before,
+        )
+        .group_by(memory_day)
+        .order_by(memory_day)
+        .all()
+    )
+    # Days whose summary is missing or outdated after this call
+    pending_days: List[date] = []
+    for day, count, max_id in day_sources:
+        day = date.fromisoformat(day)
+        fingerprint = f"{count}:{max_id}"
+        summary = existing.get(("day", day))
+        if summary and summary.source_fingerprint == fingerprint:
+            continue
+        if budget <= 0:
+            pending_days.append(day)
+            remaining += 1
+            continue
+
+        texts = [
+            text
+            for (text,) in db.query(models.Memory.text)
+            .filter(
+                models.Memory.user_id == user_id,
+                memory_day == day.isoformat(),
+                models.Memory.text.isnot(None),
+                models.Memory.text != "",
+            )
+            .order_by(models.Memory.created_at)
+        ]
+        text = await summarize_period(client, "day", day, texts)
+        existing[("day", day)] = _save_summary(
+            db, summary, user_id, "day", day, text, fingerprint
+        )
+        budget -= 1
+
+    # Weeks and months, from the day summaries of each closed period
+    day_summaries = sorted(
+        (summary for (period, _), summary in existing.items() if period == "day"),
+        key=lambda summary: summary.period_start,
+    )
+    for period in ("week", "month"):
+        groups = defaultdict(list)
+        for summary in day_summaries:
+            groups[period_bounds(period, summary.period_start)].append(summary)
+
+        for (start, end), days in groups.items():
+            if end > today or start < newest.get(period, date.min):
+                continue
+            if any(start <= day < end for day in pending_days):
+                # Built once its days are, from their final summaries
+                remaining += 1
+                continue
+            fingerprint = f"{len(days)}:" + max(
+                summary.updated_at.isoformat() for summary in days
+            )
+            summary = existing.get((period, start))
+            if summary and summary.source_fingerprint == fingerprint:
+                continue
+            if budget <= 0:
+                remaining += 1
+                continue
+
+            text = await summarize_period(
+                client, period, start, [summary.text for summary in days]
+            )
+            existing[(period, start)] = _save_summary(
+                db, summary, user_id, period, start, text, fingerprint
+            )
+            budget -= 1
+
+    built = limit - budget
+    if built:
+        logger.info(
+            f"Built {built} memory summaries of user {user_id}, {remaining} left"
+        )
+    return remaining
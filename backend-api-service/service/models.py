@@ -1,4 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    Text,
+    DateTime,
+    LargeBinary,
+    Date,
+    Index,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from service.database import Base
@@ -62,6 +73,8 @@ class Agent(Base):
     elevenlabs_agent_id = Column(String, nullable=True, index=True)
     voice_id = Column(String, nullable=True)
     memory = Column(Text, nullable=True)
+    # Hash of the prompt last pushed to ElevenLabs
+    prompt_hash = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
     # Relationship: Agent belongs to User
@@ -89,6 +102,11 @@ class Document(Base):
 
 class Memory(Base):
     __tablename__ = "memories"
+    # Serves the per-user date range scans of the calendar, mood included so
+    # the latest mood of a day is read from the index
+    __table_args__ = (
+        Index("ix_memories_user_id_created_at", "user_id", "created_at", "mood"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     memory_id = Column(String, unique=True, index=True)
@@ -96,6 +114,10 @@ class Memory(Base):
     agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
     text = Column(Text, nullable=True)
     mood = Column(String, nullable=True)
+    # Normalized float32 embedding of the text, used to retrieve the memory
+    embedding = Column(LargeBinary, nullable=True)
+    # "<model>:<dimensions>" the embedding was computed with
+    embedding_model = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -104,3 +126,52 @@ class Memory(Base):
 
     # Relationship: Memory belongs to Agent (optional)
     agent = relationship("Agent", backref="memories")
+
+
+class WebhookJob(Base):
+    __tablename__ = "webhook_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON string of the job input
+    # The user the job works for, only they can see its status
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    # queued, running, done or failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    next_run_at = Column(DateTime, nullable=False, index=True)
+    locked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class ProcessedConversation(Base):
+    __tablename__ = "processed_conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # One row per ElevenLabs conversation, redeliveries are dropped
+    conversation_id = Column(String, unique=True, index=True, nullable=False)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    job_id = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="in_progress")  # or "done"
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class MemorySummary(Base):
+    __tablename__ = "memory_summaries"
+    __table_args__ = (UniqueConstraint("user_id", "period", "period_start"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    period = Column(String, nullable=False)  # day, week or month
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)  # Exclusive
+    text = Column(Text, nullable=False)
+    # Identifies the rows the summary was built from, it is rebuilt when
+    # they change
+    source_fingerprint = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_PASSWORD,
+    SIGNED_URL_CACHE_TTL_SECONDS,
+    SIGNED_URL_REFRESH_AHEAD_SECONDS,
+)
+from service.elevenlabs_api import get_signed_url
+
+logger = logging.getLogger(__name__)
+
+
+class SignedUrlCache:
+    """
+    Cache of signed conversation URLs per ElevenLabs agent
+
+    URLs are kept in process and, when Redis is configured, in Redis so
+    every worker shares them and picks up the URLs refreshed by the others.
+    A URL younger than the TTL minus the refresh margin is served as is, an
+    older one is still served while a fresh one is fetched in the
+    background, and an expired one is fetched inline.
+    Concurrent fetches for the same agent share one request.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = SIGNED_URL_CACHE_TTL_SECONDS,
+        refresh_ahead_seconds: int = SIGNED_URL_REFRESH_AHEAD_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._redis = None
+
+    async def start(self):
+        """Connect to Redis if it is configured"""
+        if not REDIS_HOST or self._redis is not None:
+            return
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            logger.warning("redis is not installed, signed URLs cached in process")
+            return
+
+        self._redis = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            password=REDIS_PASSWORD,
+            decode_responses=True,
+        )
+
+    async def close(self):
+        """Cancel pending refreshes and close the Redis connection"""
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _key(self, agent_id: str) -> str:
+        return f"elevenlabs:signed_url:{agent_id}"
+
+    async def _lookup(self, agent_id: str) -> Optional[Tuple[str, float]]:
+        """
+        Find a cached URL and when it was fetched
+
+        Redis is checked first, so a URL refreshed by another worker replaces
+        this process's older one. The in-process entry is used when Redis is
+        not configured, unavailable or has lost the URL.
+        """
+        entry = self._entries.get(agent_id)
+        if self._redis is None:
+            return entry
+
+        try:
+            stored = await self._redis.get(self._key(agent_id))
+        except Exception as e:
+            logger.warning(f"Signed URL cache unavailable: {str(e)}")
+            return entry
+        if stored is None:
+            return entry
+
+        stored = json.loads(stored)
+        if entry is None or stored["fetched_at"] > entry[1]:
+            entry = (stored["url"], stored["fetched_at"])
+            self._entries[agent_id] = entry
+        return entry
+
+    async def _fetch(self, agent_id: str) -> str:
+        """Get a new URL from ElevenLabs and store it in both tiers"""
+        signed_url = await get_signed_url(agent_id)
+        fetched_at = time.time()
+        self._entries[agent_id] = (signed_url, fetched_at)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._key(agent_id),
+                    json.dumps({"url": signed_url, "fetched_at": fetched_at}),
+                    ex=self.ttl_seconds,
+                )
+            except Exception as e:
+                logger.warning(f"Could not write signed URL to cache: {str(e)}")
+        return signed_url
+
+    def _start_fetch(self, agent_id: str) -> asyncio.Task:
+        """Fetch a URL, joining a fetch already running for the agent"""
+        task = self._inflight.get(agent_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(agent_id))
+            self._inflight[agent_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(agent_id, None))
+        return task
+
+    def _log_refresh_error(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error refreshing signed URL: {str(task.exception())}")
+
+    async def get(self, agent_id: str) -> str:
+        """
+        Get a signed URL for an agent
+
+        Args:
+            agent_id: The ElevenLabs agent ID
+
+        Returns:
+            str: A signed URL that is valid for at least the refresh margin
+        """
+        entry = await self._lookup(agent_id)
+        if entry is not None:
+            signed_url, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl_seconds:
+                if age >= self.ttl_seconds - self.refresh_ahead_seconds:
+                    self._start_fetch(agent_id).add_done_callback(
+                        self._log_refresh_error
+                    )
+                return signed_url
+            self._entries.pop(agent_id, None)
+
+        # shield() so one cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(self._start_fetch(agent_id))
+
+
+signed_url_cache = SignedUrlCache()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import sys
 import os
@@ -13,4 +14,4 @@ from service.elevenlabs_api import load_tools_into_agent
 json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "some.json")
 data = json.load(open(json_path))
 
-load_tools_into_agent("uk6PZ0r2DczJXvs5SXO9")
+asyncio.run(load_tools_into_agent("uk6PZ0r2DczJXvs5SXO9"))
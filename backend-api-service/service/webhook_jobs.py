@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from config import (
+    WEBHOOK_JOB_WORKERS,
+    WEBHOOK_JOB_MAX_ATTEMPTS,
+    WEBHOOK_JOB_LEASE_SECONDS,
+)
+from service import models
+from service.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JobHandler = Callable[[Session, dict], Awaitable[None]]
+
+# Session info key of the callbacks to run once a job's changes are committed
+AFTER_COMMIT = "after_job_commit"
+
+
+def after_job_commit(db: Session, callback: Callable[[], None]):
+    """
+    Run a callback once the running job's changes are committed
+
+    Used for side effects outside of the database, so they don't happen for
+    a job that fails and is rolled back. Callbacks are dropped if it fails.
+    """
+    db.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+class WebhookJobQueue:
+    """
+    Bounded pool of workers processing the jobs in the webhook_jobs table
+
+    Webhooks only store their payload as a job and return. Workers claim
+    queued jobs with a conditional UPDATE, so each job runs once even with
+    several app processes. A handler's database changes are committed in
+    the same transaction that marks its job done. Failed jobs are retried
+    with exponential backoff until they run out of attempts. A running job
+    renews its lease, and jobs whose lease expired because their process
+    died are requeued by a check running every `recover_seconds`.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        workers: int = WEBHOOK_JOB_WORKERS,
+        max_attempts: int = WEBHOOK_JOB_MAX_ATTEMPTS,
+        lease_seconds: int = WEBHOOK_JOB_LEASE_SECONDS,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        poll_seconds: float = 1.0,
+        recover_seconds: Optional[float] = None,
+    ):
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_seconds = poll_seconds
+        self.recover_seconds = recover_seconds or lease_seconds / 2
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        """Requeue jobs lost by a crashed process and start the workers"""
+        db = SessionLocal()
+        try:
+            self._recover_expired(db)
+        finally:
+            db.close()
+
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_periodically()))
+        logger.info(f"Started {self.workers} webhook job workers")
+
+    async def close(self, timeout: float = 30):
+        """Let the workers finish their current job, then stop them"""
+        self._stopping.set()
+        self._wakeup.set()
+        if not self._tasks:
+            return
+
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def notify(self):
+        """Wake the workers, call it once new jobs are committed"""
+        self._wakeup.set()
+
+    def _recover_expired(self, db: Session):
+        """Requeue running jobs whose lease expired"""
+        expired_before = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        recovered = (
+            db.query(models.WebhookJob)
+            .filter(
+                models.WebhookJob.status == RUNNING,
+                models.WebhookJob.locked_at < expired_before,
+            )
+            .update(
+                {"status": QUEUED, "locked_at": None},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if recovered:
+            logger.warning(f"Requeued {recovered} webhook jobs with expired leases")
+
+    async def _recover_periodically(self):
+        """Requeue jobs with expired leases until the queue is closed"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.recover_seconds
+                )
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            db = SessionLocal()
+            try:
+                self._recover_expired(db)
+            except Exception as e:
+                logger.error(f"Webhook job recovery error: {str(e)}")
+            finally:
+                db.close()
+
+    async def _keep_lease(self, job_row_id: int, attempt: int):
+        """Renew the lease of a running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            # A separate session, the handler's changes must not be committed
+            db = SessionLocal()
+            try:
+                db.query(models.WebhookJob).filter(
+                    models.WebhookJob.id == job_row_id,
+                    models.WebhookJob.status == RUNNING,
+                    models.WebhookJob.attempts == attempt,
+                ).update(
+                    {"locked_at": datetime.utcnow()}, synchronize_session=False
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Error renewing lease of webhook job: {str(e)}")
+            finally:
+                db.close()
+
+    def _claim(self, db: Session) -> Optional[models.WebhookJob]:
+        """Take the next due job, or None if there is none"""
+        while True:
+            now = datetime.utcnow()
+            candidate = (
+                db.query(models.WebhookJob.id)
+                .filter(
+                    models.WebhookJob.status == QUEUED,
+                    models.WebhookJob.next_run_at <= now,
+                )
+                .order_by(models.WebhookJob.next_run_at)
+                .first()
+            )
+            if candidate is None:
+                return None
+
+            # Only one worker can move the job out of the queued state
+            claimed = (
+                db.query(models.WebhookJob)
+                .filter(
+                    models.WebhookJob.id == candidate.id,
+                    models.WebhookJob.status == QUEUED,
+                )
+                .update(
+                    {
+                        "status": RUNNING,
+                        "locked_at": now,
+                        "attempts": models.WebhookJob.attempts + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if claimed:
+                return db.get(models.WebhookJob, candidate.id)
+
+    async def _worker(self):
+        while not self._stopping.is_set():
+            db = SessionLocal()
+            try:
+                job = self._claim(db)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), timeout=self.poll_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self._process(db, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook job worker error: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+            finally:
+                db.close()
+
+    async def _process(self, db: Session, job: models.WebhookJob):
+        """Run a claimed job and record its outcome"""
+        job_row_id = job.id
+        keep_lease = asyncio.create_task(self._keep_lease(job_row_id, job.attempts))
+        try:
+            try:
+                handler = self.handlers[job.kind]
+                await handler(db, json.loads(job.payload))
+            finally:
+                keep_lease.cancel()
+
+            job.status = DONE
+            job.error = None
+            job.locked_at = None
+            db.commit()
+            logger.info(f"Webhook job {job.job_id} done")
+
+            for callback in db.info.pop(AFTER_COMMIT, []):
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Webhook job {job.job_id} callback error: {str(e)}")
+
+            # The handler may have queued follow-up jobs
+            await self.notify()
+        except asyncio.CancelledError:
+            # Shutting down, give the job back without using up an attempt
+            db.info.pop(AFTER_COMMIT, None)
+            db.rollback()
+            job = db.get(models.WebhookJob, job_row_id)
+            job.status = QUEUED
+            job.attempts -= 1
+            job.locked_at = None
+            db.commit()
+            raise
+        except Exception as e:
+            db.info.pop(AFTER_COMMIT, None)
+            db.rollback()
+            job = db.get(models.WebhookJob, job_row_id)
+            job.error = str(e)
+            job.locked_at = None
+
+            if job.attempts >= self.max_attempts:
+                job.status = FAILED
+                logger.error(
+                    f"Webhook job {job.job_id} failed after {job.attempts} "
+                    f"attempts: {str(e)}"
+                )
+            else:
+                delay = min(
+                    self.backoff_base * 2 ** (job.attempts - 1), self.backoff_max
+                )
+                delay *= random.uniform(0.5, 1.0)
+                job.status = QUEUED
+                job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning(
+                    f"Webhook job {job.job_id} attempt {job.attempts} failed, "
+                    f"retrying in {delay:.1f}s: {str(e)}"
+                )
+            db.commit()
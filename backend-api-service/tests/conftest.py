@@ -0,0 +1,70 @@
+import os
+
+# config refuses to load without these, the tests never call the services
+for name in ("ELEVENLABS_WEBHOOK_SECRET", "ELEVENLABS_API_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(name, "testing")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from service import init_db, models
+from service.database import get_db
+
+
+@pytest.fixture
+def session_factory():
+    """Sessions on a fresh in-memory database with every table created"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(user_id="user-1", name="Anna")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The FastAPI app, imported without touching the app's own database"""
+    engine = init_db.engine
+    init_db.engine = create_engine("sqlite://")
+    try:
+        import main
+    finally:
+        init_db.engine = engine
+    return main.app
+
+
+@pytest.fixture
+def api(app, session_factory):
+    """Client of the app, without its lifespan, on the test database"""
+
+    def get_test_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
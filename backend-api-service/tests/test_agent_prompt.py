@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from service import agent_prompt, models
+from service.agent_prompt import (
+    flush_agent_prompt_pushes,
+    hash_prompt,
+    schedule_agent_prompt_push,
+)
+from service.elevenlabs_api import build_agent_prompt
+
+
+@pytest.fixture
+def pushed(session_factory, monkeypatch):
+    """Record the pushes instead of calling ElevenLabs"""
+    pushes = []
+
+    async def load_memory_into_agent(elevenlabs_agent_id, memory):
+        await asyncio.sleep(0.01)
+        pushes.append((elevenlabs_agent_id, memory))
+
+    monkeypatch.setattr(agent_prompt, "SessionLocal", session_factory)
+    monkeypatch.setattr(agent_prompt, "load_memory_into_agent", load_memory_into_agent)
+    monkeypatch.setattr(agent_prompt, "AGENT_PROMPT_DEBOUNCE_SECONDS", 0.05)
+    return pushes
+
+
+@pytest.fixture
+def agent(db, user):
+    agent = models.Agent(
+        agent_id="agent-1", user_id=user.id, elevenlabs_agent_id="el-1"
+    )
+    db.add(agent)
+    db.commit()
+    return agent
+
+
+def test_pushes_within_the_quiet_period_are_merged(db, agent, pushed):
+    async def scenario():
+        schedule_agent_prompt_push("agent-1", "first")
+        await asyncio.sleep(0.01)
+        schedule_agent_prompt_push("agent-1", "second")
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+
+    assert pushed == [("el-1", "second")]
+    db.refresh(agent)
+    assert agent.prompt_hash == hash_prompt(build_agent_prompt("second"))
+
+
+def test_waiting_pushes_are_flushed_at_shutdown(agent, pushed, monkeypatch):
+    monkeypatch.setattr(agent_prompt, "AGENT_PROMPT_DEBOUNCE_SECONDS", 60)
+
+    async def scenario():
+        schedule_agent_prompt_push("agent-1", "latest")
+        await asyncio.sleep(0)
+        await flush_agent_prompt_pushes()
+
+    asyncio.run(scenario())
+
+    assert pushed == [("el-1", "latest")]
+    assert agent_prompt._pending_pushes == {}
+    assert agent_prompt._push_tasks == {}
+
+
+def test_push_interrupted_by_shutdown_is_flushed(agent, pushed, monkeypatch):
+    started = []
+
+    async def slow_load_memory_into_agent(elevenlabs_agent_id, memory):
+        started.append(memory)
+        await asyncio.sleep(0.01 if len(started) > 1 else 60)
+        pushed.append((elevenlabs_agent_id, memory))
+
+    monkeypatch.setattr(
+        agent_prompt, "load_memory_into_agent", slow_load_memory_into_agent
+    )
+
+    async def scenario():
+        schedule_agent_prompt_push("agent-1", "latest")
+        # Past the quiet period, in the middle of the push
+        await asyncio.sleep(0.1)
+        await flush_agent_prompt_pushes()
+
+    asyncio.run(scenario())
+
+    assert pushed == [("el-1", "latest")]
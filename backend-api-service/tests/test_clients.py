@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from config import HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT_SECONDS, OPENAI_TIMEOUT_SECONDS
+from service import clients
+from service.clients import (
+    close_clients,
+    get_http_session,
+    get_openai_client,
+    start_clients,
+)
+from service.memory_manager import MemoryManager
+
+
+@pytest.fixture(autouse=True)
+def no_clients(monkeypatch):
+    """Every test starts without shared clients"""
+    monkeypatch.setattr(clients, "_openai_client", None)
+    monkeypatch.setattr(clients, "_http_session", None)
+
+
+def test_clients_are_shared_until_closed():
+    async def scenario():
+        await start_clients()
+        openai_client, session = get_openai_client(), get_http_session()
+        shared = get_openai_client() is openai_client
+        shared = shared and get_http_session() is session
+        await close_clients()
+        return openai_client, session, shared
+
+    openai_client, session, shared = asyncio.run(scenario())
+
+    assert shared
+    assert session.closed
+    assert openai_client.is_closed()
+    assert (clients._openai_client, clients._http_session) == (None, None)
+
+
+def test_clients_are_configured_with_limits_and_timeouts():
+    async def scenario():
+        await start_clients()
+        openai_client, session = get_openai_client(), get_http_session()
+        settings = (
+            openai_client.timeout,
+            session.connector.limit,
+            session.timeout.total,
+        )
+        await close_clients()
+        return settings
+
+    assert asyncio.run(scenario()) == (
+        OPENAI_TIMEOUT_SECONDS,
+        HTTP_MAX_CONNECTIONS,
+        HTTP_TIMEOUT_SECONDS,
+    )
+
+
+def test_memory_managers_use_the_shared_clients(db):
+    async def scenario():
+        await start_clients()
+        first, second = MemoryManager(db), MemoryManager(db)
+        sessions = [
+            await first.get_aiohttp_session(),
+            await second.get_aiohttp_session(),
+        ]
+        shared = first.client is second.client is get_openai_client()
+        shared = shared and sessions[0] is sessions[1] is get_http_session()
+        await close_clients()
+        return shared
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from service import elevenlabs_api
+from service.elevenlabs_api import (
+    RETRY_BACKOFF_MAX_SECONDS,
+    build_agent_prompt,
+    load_memory_into_agent,
+)
+
+
+@pytest.fixture
+def elevenlabs(monkeypatch):
+    """Serve the queued responses to the shared client, recording the requests"""
+    responses = []
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(elevenlabs_api, "RETRY_BACKOFF_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(elevenlabs_api, "ELEVENLABS_MAX_RETRIES", 2)
+    monkeypatch.setattr(
+        elevenlabs_api,
+        "_client",
+        httpx.AsyncClient(
+            base_url=elevenlabs_api.ELEVENLABS_API_BASE_URL,
+            transport=httpx.MockTransport(handler),
+        ),
+    )
+    return responses, requests
+
+
+def request(method, path="/v1/test", **kwargs):
+    return asyncio.run(elevenlabs_api._request(method, path, **kwargs))
+
+
+def test_server_errors_are_retried(elevenlabs):
+    responses, requests = elevenlabs
+    responses += [httpx.Response(503), httpx.Response(200, json={"ok": True})]
+
+    assert request("GET").json() == {"ok": True}
+    assert len(requests) == 2
+
+
+def test_retries_give_up_after_the_last_attempt(elevenlabs):
+    responses, requests = elevenlabs
+    responses += [httpx.Response(502)] * 3
+
+    with pytest.raises(httpx.HTTPStatusError):
+        request("GET")
+    assert len(requests) == 3
+
+
+def test_non_idempotent_requests_are_only_retried_when_never_processed(elevenlabs):
+    responses, requests = elevenlabs
+    responses += [
+        httpx.Response(429),
+        httpx.ConnectError("refused"),
+        httpx.Response(500),
+    ]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        request("POST", idempotent=False)
+    assert len(requests) == 3
+    assert responses == []
+
+
+def test_non_idempotent_requests_are_not_retried_after_a_read_error(elevenlabs):
+    responses, requests = elevenlabs
+    responses += [httpx.ReadError("reset"), httpx.Response(200)]
+
+    with pytest.raises(httpx.ReadError):
+        request("POST", idempotent=False)
+    assert len(requests) == 1
+
+
+def test_retry_after_is_honoured_and_capped():
+    def too_many(retry_after):
+        return httpx.Response(429, headers={"Retry-After": retry_after})
+
+    assert elevenlabs_api._retry_delay(0, too_many("2")) == 2.0
+    assert elevenlabs_api._retry_delay(0, too_many("600")) == RETRY_BACKOFF_MAX_SECONDS
+    assert 0 <= elevenlabs_api._retry_delay(10, None) <= RETRY_BACKOFF_MAX_SECONDS
+
+
+def test_concurrent_memory_loads_send_their_own_prompt(elevenlabs):
+    responses, requests = elevenlabs
+    responses += [httpx.Response(200, json={}), httpx.Response(200, json={})]
+
+    async def scenario():
+        await asyncio.gather(
+            load_memory_into_agent("agent-1", "memory one"),
+            load_memory_into_agent("agent-2", "memory two"),
+        )
+
+    asyncio.run(scenario())
+
+    def prompt_of(request):
+        config = json.loads(request.content)["conversation_config"]
+        return config["agent"]["prompt"]["prompt"]
+
+    sent = {request.url.path: prompt_of(request) for request in requests}
+    assert sent == {
+        "/v1/convai/agents/agent-1": build_agent_prompt("memory one"),
+        "/v1/convai/agents/agent-2": build_agent_prompt("memory two"),
+    }
@@ -0,0 +1,92 @@
+import asyncio
+
+from config import MEMORY_SECTIONS, MEMORY_SECTION_TOKEN_BUDGETS
+from service import models
+from service.memory_budget import estimate_tokens, sections_over_budget, split_oldest
+from service.memory_manager import MemoryManager
+from service.memory_sections import parse_sections, render_sections
+
+HEADERS = list(MEMORY_SECTIONS.values())
+
+
+def memory_of(**bodies):
+    return render_sections(
+        "", {MEMORY_SECTIONS[key]: body for key, body in bodies.items()}, HEADERS
+    )
+
+
+def lines_of(tokens, prefix="line"):
+    """Lines of four tokens each, adding up to about `tokens` tokens"""
+    return "\n".join(f"{prefix} {n} is here" for n in range(tokens // 4))
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Anna went to Paris.") == 5
+    # Long words count one token per six characters
+    assert estimate_tokens("internationalization") == 4
+
+
+def test_only_sections_over_their_budget_are_reported():
+    budget = MEMORY_SECTION_TOKEN_BUDGETS["short_term"]
+    memory = memory_of(long_term="Anna likes tea.", short_term=lines_of(budget + 40))
+
+    over = sections_over_budget(memory)
+
+    assert list(over) == ["short_term"]
+    tokens, reported_budget = over["short_term"]
+    assert tokens > budget == reported_budget
+
+
+def test_split_oldest_keeps_the_newest_lines_within_the_budget():
+    body = "oldest line\nmiddle line\nnewest line"
+
+    assert split_oldest(body, 3) == ("oldest line\nmiddle line", "newest line")
+    assert split_oldest(body, 100) == ("", body)
+    assert split_oldest(body, 0) == (body, "")
+
+
+def test_compaction_summarizes_the_oldest_lines_of_full_sections(db, user):
+    budget = MEMORY_SECTION_TOKEN_BUDGETS["short_term"]
+    long_term = "Anna likes tea."
+    db.add(
+        models.Agent(
+            agent_id="agent-1",
+            user_id=user.id,
+            memory=memory_of(
+                long_term=long_term, short_term=lines_of(budget + 40, "day")
+            ),
+        )
+    )
+    db.commit()
+    requests = []
+
+    class SummarizingManager(MemoryManager):
+        async def llm_compact_section(self, header, content, token_budget):
+            requests.append((header, token_budget))
+            return "summary of the older days"
+
+    compacted = asyncio.run(
+        SummarizingManager(db, client=object()).compact_memory("agent-1")
+    )
+
+    _, bodies = parse_sections(compacted, HEADERS)
+    short_term = bodies[MEMORY_SECTIONS["short_term"]]
+    assert requests == [(MEMORY_SECTIONS["short_term"], budget // 2)]
+    assert short_term.startswith("summary of the older days\nday ")
+    assert estimate_tokens(short_term) <= budget
+    assert bodies[MEMORY_SECTIONS["long_term"]] == long_term
+    assert sections_over_budget(compacted) == {}
+
+
+def test_memory_within_budget_is_left_alone(db, user):
+    db.add(
+        models.Agent(
+            agent_id="agent-1", user_id=user.id, memory=memory_of(long_term="tea")
+        )
+    )
+    db.commit()
+
+    manager = MemoryManager(db, client=object())
+
+    assert asyncio.run(manager.compact_memory("agent-1")) is None
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from service import models
+from service.memory_manager import MemoryManager
+
+
+def add_memory(db, user, created_at, text, mood=None):
+    db.add(models.Memory(user_id=user.id, text=text, mood=mood, created_at=created_at))
+    db.commit()
+
+
+def memories_by_day(db, user, start, end):
+    # The calendar never calls OpenAI, any client will do
+    return MemoryManager(db, client=object()).get_memories_by_day(user.id, start, end)
+
+
+def test_memories_are_grouped_by_day_with_the_latest_mood(db, user):
+    add_memory(db, user, datetime(2024, 5, 1, 9), "breakfast", "happy")
+    add_memory(db, user, datetime(2024, 5, 1, 20), "dinner", "tired")
+    add_memory(db, user, datetime(2024, 5, 3, 12), "lunch", "calm")
+
+    days = memories_by_day(db, user, datetime(2024, 5, 1), datetime(2024, 5, 4))
+
+    assert days == [
+        {
+            "day_timestamp": "2024-05-01",
+            "memory_text": "breakfast\ndinner",
+            "mood": "tired",
+        },
+        {"day_timestamp": "2024-05-03", "memory_text": "lunch", "mood": "calm"},
+    ]
+
+
+def test_texts_are_joined_in_time_order_not_insertion_order(db, user):
+    add_memory(db, user, datetime(2024, 5, 1, 20), "evening", "calm")
+    add_memory(db, user, datetime(2024, 5, 1, 8), "morning", "happy")
+
+    (day,) = memories_by_day(db, user, datetime(2024, 5, 1), datetime(2024, 5, 2))
+
+    assert day["memory_text"] == "morning\nevening"
+    assert day["mood"] == "calm"
+
+
+def test_range_end_is_exclusive(db, user):
+    add_memory(db, user, datetime(2024, 4, 30, 23, 59), "before", "sad")
+    add_memory(db, user, datetime(2024, 5, 1), "first", "happy")
+    add_memory(db, user, datetime(2024, 5, 2), "after", "sad")
+
+    days = memories_by_day(db, user, datetime(2024, 5, 1), datetime(2024, 5, 2))
+
+    assert [day["memory_text"] for day in days] == ["first"]
+
+
+def test_empty_texts_are_skipped_and_textless_days_dropped(db, user):
+    add_memory(db, user, datetime(2024, 5, 1, 9), "", "happy")
+    add_memory(db, user, datetime(2024, 5, 1, 10), "walk", "calm")
+    add_memory(db, user, datetime(2024, 5, 2, 9), None, "sad")
+
+    days = memories_by_day(db, user, datetime(2024, 5, 1), datetime(2024, 5, 3))
+
+    assert days == [
+        {"day_timestamp": "2024-05-01", "memory_text": "walk", "mood": "calm"},
+    ]
+
+
+def test_other_users_memories_are_left_out(db, user):
+    other = models.User(user_id="user-2")
+    db.add(other)
+    db.commit()
+    add_memory(db, other, datetime(2024, 5, 1, 9), "not mine", "sad")
+
+    assert memories_by_day(db, user, datetime(2024, 5, 1), datetime(2024, 5, 2)) == []
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from config import MEMORY_EMBEDDING_DIMENSIONS
+from service import memory_manager, models
+from service.memory_budget import estimate_tokens
+from service.memory_manager import EMBEDDING_MODEL_KEY, MemoryManager
+from service.memory_retrieval import (
+    pack_embedding,
+    rank_by_similarity,
+    select_within_budget,
+)
+
+
+def unit(*values):
+    vector = np.zeros(MEMORY_EMBEDDING_DIMENSIONS, dtype=np.float32)
+    vector[: len(values)] = values
+    return vector.tolist()
+
+
+class FakeEmbeddingManager(MemoryManager):
+    """Embeds every text as the same vector and records the requests"""
+
+    def __init__(self, db):
+        super().__init__(db, client=object())
+        self.requests = []
+
+    async def embed_texts(self, texts):
+        self.requests.append(texts)
+        return [unit(1.0) for _ in texts]
+
+
+def add_memory(db, user, text, **columns):
+    memory = models.Memory(
+        user_id=user.id, text=text, created_at=datetime(2024, 5, 1), **columns
+    )
+    db.add(memory)
+    db.commit()
+    return memory
+
+
+def test_rank_by_similarity_returns_the_best_k_first():
+    blobs = [
+        pack_embedding(unit(0.0, 1.0)),
+        pack_embedding(unit(1.0, 0.0)),
+        pack_embedding(unit(1.0, 1.0)),
+    ]
+
+    assert rank_by_similarity(unit(1.0, 0.2), blobs, 2) == [1, 2]
+    assert rank_by_similarity(unit(1.0, 0.2), blobs, 10) == [1, 2, 0]
+    assert rank_by_similarity(unit(1.0), [], 3) == []
+    assert rank_by_similarity(unit(1.0), blobs, 0) == []
+
+
+def test_select_within_budget_skips_texts_over_the_remaining_budget():
+    texts = ["one two three", "four five six seven", "eight"]
+    budget = estimate_tokens(texts[0]) + estimate_tokens(texts[2])
+
+    assert select_within_budget(texts, budget) == [0, 2]
+
+
+def test_select_within_budget_always_takes_the_best_text():
+    assert select_within_budget(["far too long for the budget", "ok"], 1) == [0]
+
+
+def test_embeddings_of_another_model_are_computed_again(db, user):
+    current = add_memory(
+        db,
+        user,
+        "current",
+        embedding=pack_embedding(unit(1.0)),
+        embedding_model=EMBEDDING_MODEL_KEY,
+    )
+    # Same size, so only the stored model name tells them apart
+    stale = add_memory(
+        db,
+        user,
+        "stale",
+        embedding=pack_embedding(unit(0.0, 1.0)),
+        embedding_model="old-model:512",
+    )
+    manager = FakeEmbeddingManager(db)
+
+    memories = asyncio.run(manager.retrieve_relevant_memories(user.id, "query"))
+
+    assert manager.requests == [["query", "stale"]]
+    assert {memory.id for memory in memories} == {current.id, stale.id}
+    db.refresh(stale)
+    assert stale.embedding_model == EMBEDDING_MODEL_KEY
+    assert stale.embedding == pack_embedding(unit(1.0))
+
+
+def test_backfill_starts_with_the_oldest_memories(db, user, monkeypatch):
+    monkeypatch.setattr(memory_manager, "EMBEDDING_BACKFILL_LIMIT", 2)
+    for text in ["first", "second", "third"]:
+        add_memory(db, user, text)
+    manager = FakeEmbeddingManager(db)
+
+    asyncio.run(manager.retrieve_relevant_memories(user.id, "query"))
+    asyncio.run(manager.retrieve_relevant_memories(user.id, "query"))
+
+    assert manager.requests == [["query", "first", "second"], ["query", "third"]]
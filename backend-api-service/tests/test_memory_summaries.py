@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from service import models
+from service.memory_summaries import refresh_user_summaries
+
+
+class FakeChatClient:
+    """Summarizes by joining the texts, recording every request"""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages, **kwargs):
+        self.requests.append(messages[1]["content"])
+        text = " + ".join(messages[1]["content"].split("\n\n"))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))]
+        )
+
+
+def add_memory(db, user, created_at, text):
+    db.add(models.Memory(user_id=user.id, text=text, created_at=created_at))
+    db.commit()
+
+
+def refresh(db, user, client, today, limit=10):
+    remaining = asyncio.run(
+        refresh_user_summaries(db, client, user.id, today=today, limit=limit)
+    )
+    db.commit()
+    return remaining
+
+
+def summaries(db, user):
+    return {
+        (summary.period, summary.period_start): summary.text
+        for summary in db.query(models.MemorySummary).filter(
+            models.MemorySummary.user_id == user.id
+        )
+    }
+
+
+def test_days_weeks_and_months_are_built_from_closed_periods(db, user):
+    # Monday and Tuesday of the week of 2024-04-29, which spans two months
+    add_memory(db, user, datetime(2024, 4, 29, 9), "walk")
+    add_memory(db, user, datetime(2024, 4, 29, 20), "film")
+    add_memory(db, user, datetime(2024, 4, 30, 12), "lunch")
+    add_memory(db, user, datetime(2024, 5, 8, 12), "still running")
+
+    remaining = refresh(db, user, FakeChatClient(), today=date(2024, 5, 8))
+
+    assert remaining == 0
+    assert summaries(db, user) == {
+        ("day", date(2024, 4, 29)): "walk + film",
+        ("day", date(2024, 4, 30)): "lunch",
+        ("week", date(2024, 4, 29)): "walk + film + lunch",
+        ("month", date(2024, 4, 1)): "walk + film + lunch",
+    }
+
+
+def test_up_to_date_summaries_are_not_built_again(db, user):
+    add_memory(db, user, datetime(2024, 4, 29, 9), "walk")
+    add_memory(db, user, datetime(2024, 4, 29, 20), "film")
+    client = FakeChatClient()
+    refresh(db, user, client, today=date(2024, 5, 8))
+    built = len(client.requests)
+
+    add_memory(db, user, datetime(2024, 5, 8, 9), "swim")
+    add_memory(db, user, datetime(2024, 5, 8, 10), "read")
+    remaining = refresh(db, user, client, today=date(2024, 5, 9))
+
+    # Only the new day, its week and month are still running
+    assert remaining == 0
+    assert client.requests[built:] == ["swim\n\nread"]
+    assert summaries(db, user)[("day", date(2024, 5, 8))] == "swim + read"
+
+
+def test_parents_wait_for_their_days(db, user):
+    add_memory(db, user, datetime(2024, 4, 29, 9), "walk")
+    add_memory(db, user, datetime(2024, 4, 30, 9), "swim")
+    client = FakeChatClient()
+
+    # One day built, the other day and its week and month are left
+    assert refresh(db, user, client, today=date(2024, 5, 8), limit=1) == 3
+    assert set(summaries(db, user)) == {("day", date(2024, 4, 29))}
+
+    assert refresh(db, user, client, today=date(2024, 5, 8), limit=1) == 2
+    assert refresh(db, user, client, today=date(2024, 5, 8), limit=1) == 1
+    assert refresh(db, user, client, today=date(2024, 5, 8), limit=1) == 0
+    assert summaries(db, user)[("week", date(2024, 4, 29))] == "walk + swim"
+    assert summaries(db, user)[("month", date(2024, 4, 1))] == "walk + swim"
+
+
+def test_days_before_the_newest_summary_are_not_scanned_again(db, user):
+    add_memory(db, user, datetime(2024, 4, 29, 9), "walk")
+    add_memory(db, user, datetime(2024, 4, 30, 9), "swim")
+    client = FakeChatClient()
+    refresh(db, user, client, today=date(2024, 5, 1))
+
+    # Memories are never added to a closed day, so this one is not seen
+    add_memory(db, user, datetime(2024, 4, 29, 21), "backdated")
+    add_memory(db, user, datetime(2024, 5, 1, 9), "read")
+    refresh(db, user, client, today=date(2024, 5, 2))
+
+    assert summaries(db, user)[("day", date(2024, 4, 29))] == "walk"
+    assert summaries(db, user)[("day", date(2024, 5, 1))] == "read"
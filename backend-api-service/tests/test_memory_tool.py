@@ -0,0 +1,119 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+
+from config import MEMORY_EMBEDDING_DIMENSIONS, MEMORY_TOOL_MAX_TOKENS
+from service import models
+from service.database import get_db
+from service.memory_manager import MemoryManager
+
+
+class FakeOpenAI:
+    """Streams or returns a fixed answer, recording the completion requests"""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.embeddings = SimpleNamespace(create=self.embed)
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if self.error:
+            raise self.error
+        if not kwargs.get("stream"):
+            message = SimpleNamespace(content="".join(self.chunks))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        async def stream():
+            for text in self.chunks + [None]:
+                delta = SimpleNamespace(content=text)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+        return stream()
+
+    async def embed(self, input, **kwargs):
+        vector = [1.0] + [0.0] * (MEMORY_EMBEDDING_DIMENSIONS - 1)
+        data = [SimpleNamespace(index=i, embedding=vector) for i in range(len(input))]
+        return SimpleNamespace(data=data)
+
+
+@pytest.fixture
+def agent(db, user):
+    agent = models.Agent(
+        agent_id="agent-1", user_id=user.id, elevenlabs_agent_id="el-1"
+    )
+    db.add(agent)
+    db.add(
+        models.Memory(
+            user_id=user.id, text="Anna went to Paris.", created_at=datetime(2024, 5, 1)
+        )
+    )
+    db.commit()
+    return agent
+
+
+@pytest.fixture
+def openai(app, api):
+    """Have the endpoints answer with a fake OpenAI client"""
+    import main
+
+    client = FakeOpenAI(["Anna ", "went ", "to Paris."])
+
+    def get_memory_manager(db=Depends(get_db)):
+        return MemoryManager(db, client=client)
+
+    app.dependency_overrides[main.get_memory_manager] = get_memory_manager
+    return client
+
+
+def ask(api, **request):
+    return api.post(
+        "/memory/get", json={"agent_id": "el-1", "text": "Paris?", **request}
+    )
+
+
+def test_answer_is_streamed_as_plain_text(api, agent, openai):
+    response = ask(api)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == "Anna went to Paris."
+    [request] = openai.requests
+    assert (request["stream"], request["max_tokens"]) == (True, MEMORY_TOOL_MAX_TOKENS)
+    assert "Anna went to Paris." in request["messages"][1]["content"]
+
+
+def test_callers_can_still_get_json(api, agent, openai):
+    response = ask(api, stream=False)
+
+    assert response.json() == {"text": "Anna went to Paris."}
+    assert "stream" not in openai.requests[0]
+
+
+def test_user_without_memories_gets_a_fixed_answer(api, db, agent, openai):
+    db.query(models.Memory).delete()
+    db.commit()
+
+    response = ask(api)
+
+    assert response.text == "No memories found for this user."
+    assert openai.requests == []
+
+
+def test_completion_errors_are_reported_before_streaming(app, api, agent, openai):
+    openai.error = RuntimeError("OpenAI unavailable")
+
+    response = TestClient(app, raise_server_exceptions=False).post(
+        "/memory/get", json={"agent_id": "el-1", "text": "Paris?"}
+    )
+
+    assert response.status_code == 500
+
+
+def test_unknown_agent_is_not_found(api, agent, openai):
+    assert ask(api, agent_id="unknown").status_code == 404
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from config import MEMORY_SECTIONS
+from service import memory_manager, models
+from service.memory_manager import CONVERSATION_UPDATE_SCHEMA, MemoryManager, Mood
+from service.memory_sections import parse_sections
+
+
+def long_term_of(memory):
+    _, bodies = parse_sections(memory, list(MEMORY_SECTIONS.values()))
+    return bodies[MEMORY_SECTIONS["long_term"]]
+
+
+class FakeOpenAI:
+    """Answers each kind of memory request, recording which were made"""
+
+    def __init__(self, structured):
+        self.structured = structured
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.embeddings = SimpleNamespace(create=self.embed)
+
+    async def create(self, messages, response_format=None, **kwargs):
+        if response_format == CONVERSATION_UPDATE_SCHEMA:
+            self.calls.append("structured")
+            answer = self.structured
+        elif response_format == {"type": "json_object"}:
+            self.calls.append("memory")
+            answer = json.dumps(
+                {"edits": [{"section": "long_term", "op": "append", "text": "Tea."}]}
+            )
+        elif "determine the mood" in messages[0]["content"]:
+            self.calls.append("mood")
+            answer = Mood.STRESS.value
+        else:
+            self.calls.append("summary")
+            answer = "Anna talked about tea."
+
+        refusal = answer if answer == "refused" else None
+        message = SimpleNamespace(content=answer, refusal=refusal)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def embed(self, **kwargs):
+        raise RuntimeError("embeddings offline")
+
+
+def structured_answer(**overrides):
+    answer = {
+        "mood": Mood.JOY.value,
+        "summary": "Anna went to Paris.",
+        "edits": [{"section": "long_term", "op": "append", "text": "Paris."}],
+    }
+    return json.dumps({**answer, **overrides})
+
+
+@pytest.fixture
+def agent(db, user):
+    agent = models.Agent(agent_id="agent-1", user_id=user.id, memory="")
+    db.add(agent)
+    db.commit()
+    return agent
+
+
+def update(db, agent, client):
+    manager = MemoryManager(db, client=client)
+    memory = asyncio.run(
+        manager.update_memory(agent.agent_id, agent.user_id, agent.memory, "hi")
+    )
+    db.commit()
+    return memory
+
+
+def test_one_structured_call_updates_mood_summary_and_memory(db, agent):
+    client = FakeOpenAI(structured_answer())
+
+    memory = update(db, agent, client)
+
+    assert client.calls == ["structured"]
+    assert long_term_of(memory) == "Paris."
+    db.refresh(agent)
+    assert agent.memory == memory
+    stored = db.query(models.Memory).one()
+    assert (stored.text, stored.mood) == ("Anna went to Paris.", Mood.JOY.value)
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        "refused",
+        structured_answer(mood="U+1F600"),
+        structured_answer(summary="  "),
+        structured_answer(edits=[{"section": "unknown", "op": "append", "text": ""}]),
+    ],
+    ids=["refusal", "unknown mood", "empty summary", "invalid edit"],
+)
+def test_invalid_structured_answers_fall_back_to_separate_calls(db, agent, answer):
+    client = FakeOpenAI(answer)
+
+    memory = update(db, agent, client)
+
+    assert client.calls[0] == "structured"
+    assert sorted(client.calls[1:]) == ["memory", "mood", "summary"]
+    assert long_term_of(memory) == "Tea."
+    stored = db.query(models.Memory).one()
+    assert (stored.text, stored.mood) == ("Anna talked about tea.", Mood.STRESS.value)
+
+
+def test_separate_mode_never_makes_the_structured_call(db, agent, monkeypatch):
+    monkeypatch.setattr(memory_manager, "MEMORY_UPDATE_MODE", "separate")
+    client = FakeOpenAI(structured_answer())
+
+    update(db, agent, client)
+
+    assert sorted(client.calls) == ["memory", "mood", "summary"]
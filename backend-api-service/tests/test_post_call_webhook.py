@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from service import crud, models
+from service.memory_manager import process_post_call_job
+from service.webhook_jobs import FAILED
+
+
+@pytest.fixture
+def agent(db, user):
+    agent = models.Agent(
+        agent_id="agent-1", user_id=user.id, elevenlabs_agent_id="el-1"
+    )
+    db.add(agent)
+    db.commit()
+    return agent
+
+
+def post_call(conversation_id="conv-1"):
+    return {
+        "type": "post_call_transcription",
+        "data": {
+            "agent_id": "el-1",
+            "conversation_id": conversation_id,
+            "transcript": [{"role": "user", "message": "hello"}],
+        },
+    }
+
+
+def jobs(db):
+    db.expire_all()
+    return db.query(models.WebhookJob).filter_by(kind="post_call").all()
+
+
+def test_redelivered_conversation_is_acknowledged_without_a_job(api, db, agent):
+    first = api.post("/webhook/elevenlabs", json=post_call())
+    again = api.post("/webhook/elevenlabs", json=post_call())
+
+    assert first.status_code == again.status_code == 200
+    assert "already received" in again.text
+    [job] = jobs(db)
+    processed = crud.get_processed_conversation(db, "conv-1")
+    assert (processed.job_id, processed.status) == (job.job_id, "in_progress")
+
+
+def test_other_conversations_get_their_own_job(api, db, agent):
+    api.post("/webhook/elevenlabs", json=post_call("conv-1"))
+    api.post("/webhook/elevenlabs", json=post_call("conv-2"))
+
+    assert len(jobs(db)) == 2
+
+
+def test_conversation_whose_job_failed_is_queued_again(api, db, agent):
+    api.post("/webhook/elevenlabs", json=post_call())
+    [failed] = jobs(db)
+    failed.status = FAILED
+    db.commit()
+
+    response = api.post("/webhook/elevenlabs", json=post_call())
+
+    assert "queued as" in response.text
+    retried = [job for job in jobs(db) if job.job_id != failed.job_id]
+    assert len(retried) == 1
+    db.expire_all()
+    assert crud.get_processed_conversation(db, "conv-1").job_id == retried[0].job_id
+
+
+def test_ledger_allows_one_row_per_conversation(db, agent):
+    crud.create_processed_conversation(db, "conv-1", agent.id)
+    db.commit()
+
+    with pytest.raises(IntegrityError):
+        crud.create_processed_conversation(db, "conv-1", agent.id)
+    db.rollback()
+
+
+def test_job_of_a_processed_conversation_does_nothing(db, agent):
+    processed = crud.create_processed_conversation(db, "conv-1", agent.id)
+    processed.status = "done"
+    db.commit()
+
+    # Would need the LLM if it got past the ledger
+    asyncio.run(process_post_call_job(db, post_call()))
+
+    assert db.query(models.WebhookJob).count() == 0
+    assert db.query(models.Memory).count() == 0
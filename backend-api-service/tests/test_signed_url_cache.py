@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+
+from service import signed_url_cache
+from service.signed_url_cache import SignedUrlCache
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Stand in for ElevenLabs, numbering the URLs it hands out"""
+    fetched = []
+
+    async def get_signed_url(agent_id):
+        fetched.append(agent_id)
+        await asyncio.sleep(0.01)
+        return f"wss://{agent_id}/{len(fetched)}"
+
+    monkeypatch.setattr(signed_url_cache, "get_signed_url", get_signed_url)
+    return fetched
+
+
+def test_fresh_url_is_served_from_the_cache(fetches):
+    async def scenario():
+        cache = SignedUrlCache(ttl_seconds=600, refresh_ahead_seconds=120)
+        urls = [await cache.get("agent") for _ in range(3)]
+        await cache.close()
+        return urls
+
+    assert asyncio.run(scenario()) == ["wss://agent/1"] * 3
+    assert fetches == ["agent"]
+
+
+def test_concurrent_misses_share_one_fetch(fetches):
+    async def scenario():
+        cache = SignedUrlCache(ttl_seconds=600, refresh_ahead_seconds=120)
+        return await asyncio.gather(*(cache.get("agent") for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["wss://agent/1"] * 5
+    assert fetches == ["agent"]
+
+
+def test_aging_url_is_served_while_refreshed_ahead(fetches):
+    async def scenario():
+        cache = SignedUrlCache(ttl_seconds=600, refresh_ahead_seconds=120)
+        cache._entries["agent"] = ("wss://agent/old", time.time() - 500)
+        served = await cache.get("agent")
+        await asyncio.sleep(0.05)
+        return served, await cache.get("agent")
+
+    assert asyncio.run(scenario()) == ("wss://agent/old", "wss://agent/1")
+    assert fetches == ["agent"]
+
+
+def test_expired_url_is_fetched_inline(fetches):
+    async def scenario():
+        cache = SignedUrlCache(ttl_seconds=600, refresh_ahead_seconds=120)
+        cache._entries["agent"] = ("wss://agent/old", time.time() - 700)
+        return await cache.get("agent")
+
+    assert asyncio.run(scenario()) == "wss://agent/1"
+
+
+def test_url_refreshed_by_another_worker_is_picked_up(fetches):
+    async def scenario():
+        cache = SignedUrlCache(ttl_seconds=600, refresh_ahead_seconds=120)
+        cache._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = await cache.get("agent")
+        await cache._redis.set(
+            cache._key("agent"),
+            json.dumps({"url": "wss://agent/other", "fetched_at": time.time()}),
+        )
+        second = await cache.get("agent")
+        await cache.close()
+        return first, second
+
+    assert asyncio.run(scenario()) == ("wss://agent/1", "wss://agent/other")
+    assert fetches == ["agent"]
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from service import crud, models
+from service import webhook_jobs
+from service.webhook_jobs import WebhookJobQueue, after_job_commit
+
+
+@pytest.fixture(autouse=True)
+def job_sessions(session_factory, monkeypatch):
+    """Have the workers open their sessions on the test database"""
+    monkeypatch.setattr(webhook_jobs, "SessionLocal", session_factory)
+
+
+def queue_job(db, kind, payload=None):
+    job = crud.create_webhook_job(db, kind, payload or {})
+    db.commit()
+    return job.job_id
+
+
+def run_queue(handlers, seconds=0.3, **options):
+    options = {"workers": 2, "poll_seconds": 0.02, "backoff_base": 0.01, **options}
+
+    async def scenario():
+        queue = WebhookJobQueue(handlers, **options)
+        await queue.start()
+        await asyncio.sleep(seconds)
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def job_of(db, job_id):
+    db.expire_all()
+    return crud.get_webhook_job(db, job_id)
+
+
+def test_job_commits_its_changes_and_is_done(db, user):
+    async def handler(job_db, payload):
+        crud.add_new_user_memory(
+            job_db, payload["user_id"], None, text="from job", mood=None
+        )
+
+    job_id = queue_job(db, "post_call", {"user_id": user.id})
+    run_queue({"post_call": handler})
+
+    job = job_of(db, job_id)
+    assert (job.status, job.attempts, job.locked_at) == ("done", 1, None)
+    assert [memory.text for memory in db.query(models.Memory)] == ["from job"]
+
+
+def test_failed_job_is_rolled_back_retried_then_failed(db, user):
+    calls = []
+
+    async def handler(job_db, payload):
+        calls.append(payload)
+        crud.add_new_user_memory(job_db, user.id, None, text="never stored", mood=None)
+        raise RuntimeError("LLM unavailable")
+
+    job_id = queue_job(db, "post_call")
+    run_queue({"post_call": handler}, seconds=0.5, max_attempts=3)
+
+    job = job_of(db, job_id)
+    assert len(calls) == 3
+    assert (job.status, job.attempts, job.error) == ("failed", 3, "LLM unavailable")
+    assert db.query(models.Memory).count() == 0
+
+
+def test_after_commit_callbacks_only_run_for_committed_jobs(db):
+    pushed = []
+
+    async def succeeds(job_db, payload):
+        after_job_commit(job_db, lambda: pushed.append("succeeded"))
+
+    async def fails(job_db, payload):
+        after_job_commit(job_db, lambda: pushed.append("failed"))
+        raise RuntimeError("rolled back")
+
+    queue_job(db, "succeeds")
+    queue_job(db, "fails")
+    run_queue({"succeeds": succeeds, "fails": fails}, max_attempts=1)
+
+    assert pushed == ["succeeded"]
+
+
+def test_job_with_an_expired_lease_is_requeued_and_run(db):
+    calls = []
+
+    async def handler(job_db, payload):
+        calls.append(payload)
+
+    job_id = queue_job(db, "post_call")
+    # Claimed by a process that died long ago
+    job = job_of(db, job_id)
+    job.status = webhook_jobs.RUNNING
+    job.attempts = 1
+    job.locked_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    run_queue({"post_call": handler}, lease_seconds=60)
+
+    job = job_of(db, job_id)
+    assert len(calls) == 1
+    assert (job.status, job.attempts) == ("done", 2)
+
+
+def test_job_with_a_live_lease_is_left_alone(db):
+    calls = []
+
+    async def handler(job_db, payload):
+        calls.append(payload)
+
+    job_id = queue_job(db, "post_call")
+    job = job_of(db, job_id)
+    job.status = webhook_jobs.RUNNING
+    job.locked_at = datetime.utcnow()
+    db.commit()
+
+    run_queue({"post_call": handler}, lease_seconds=60)
+
+    assert calls == []
+    assert job_of(db, job_id).status == webhook_jobs.RUNNING
+
+
+def test_each_job_runs_once_across_workers(db):
+    calls = []
+
+    async def handler(job_db, payload):
+        calls.append(payload["n"])
+        await asyncio.sleep(0.01)
+
+    for n in range(10):
+        queue_job(db, "post_call", {"n": n})
+    run_queue({"post_call": handler}, seconds=0.5, workers=4)
+
+    assert sorted(calls) == list(range(10))
+
+
+def test_running_job_renews_its_lease(db):
+    calls = []
+
+    async def handler(job_db, payload):
+        calls.append(payload)
+        # Several times the lease, without renewals another worker takes over
+        await asyncio.sleep(0.6)
+
+    job_id = queue_job(db, "post_call")
+    run_queue({"post_call": handler}, seconds=0.8, lease_seconds=0.15)
+
+    job = job_of(db, job_id)
+    assert len(calls) == 1
+    assert (job.status, job.attempts) == ("done", 1)
+
+
+def test_expired_leases_are_checked_on_their_own_interval(monkeypatch):
+    checks = []
+    recover_expired = WebhookJobQueue._recover_expired
+
+    def counting_recover_expired(self, db):
+        checks.append(1)
+        recover_expired(self, db)
+
+    monkeypatch.setattr(WebhookJobQueue, "_recover_expired", counting_recover_expired)
+    run_queue({}, seconds=0.35, recover_seconds=0.1)
+
+    # Once at start and every interval, not on each of the many polls
+    assert 3 <= len(checks) <= 5
@@ -0,0 +1,139 @@
+import asyncio
+from typing import List, Optional, Tuple
+from loguru import logger
+
+from embedder_service.embedder import Embedder
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embed_query calls into batched Embedder calls
+
+    Requests that arrive within `max_wait_ms` of the first queued request,
+    up to `max_batch_size` of them, are embedded together with a single
+    `Embedder.embed_batch` call and the rows are handed back to each caller.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Initialize the batcher
+
+        Args:
+            embedder: The embedder used to compute the batches
+            max_batch_size: Maximum number of texts embedded in one call
+            max_wait_ms: How long to wait for more requests after the first one
+        """
+        self.embedder = embedder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self) -> None:
+        """Start the batching loop on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+            logger.info(
+                f"Started embedding batcher (max_batch_size={self.max_batch_size}, "
+                f"max_wait={self.max_wait * 1000:.1f}ms)"
+            )
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query as part of the next batch
+
+        Args:
+            query: The search query to embed
+
+        Returns:
+            The query embedding vector
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    @staticmethod
+    def _fail(batch: List[Tuple[str, asyncio.Future]], error: Exception) -> None:
+        """Fail the requests of a batch that are still waiting"""
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first request, then gather more until the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        try:
+            while len(batch) < self.max_batch_size:
+                # Take whatever is already queued without waiting
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # The requests taken off the queue are only held here
+            self._fail(batch, RuntimeError("Embedding batcher closed"))
+            raise
+
+        return batch
+
+    async def _run(self) -> None:
+        """Batching loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that were cancelled while waiting don't need a result
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                # Embedding is CPU bound, keep it off the event loop
+                vectors = await loop.run_in_executor(
+                    None, self.embedder.embed_batch, texts
+                )
+            except asyncio.CancelledError:
+                self._fail(batch, RuntimeError("Embedding batcher closed"))
+                raise
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)}: {str(e)}")
+                self._fail(batch, e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector.tolist())
+
+    async def close(self) -> None:
+        """Stop the batching loop and fail any request still waiting"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher closed"))
+            self._queue = None
@@ -0,0 +1,94 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator, List
+
+# A turn starts with a speaker label such as "user:" or "agent:"
+TURN_PATTERN = re.compile(r"^\s*[A-Za-z][\w .-]{0,31}:\s")
+
+
+def iter_turns(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Group transcript lines into speaker turns
+
+    Lines that do not start with a speaker label belong to the current
+    turn. Lines are consumed one at a time, so a transcript can be read
+    from any iterable without holding it in memory.
+
+    Args:
+        lines: The transcript lines
+
+    Yields:
+        One turn at a time, without its trailing newline
+    """
+    turn: List[str] = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if TURN_PATTERN.match(line) and turn:
+            yield "\n".join(turn).strip()
+            turn = []
+        if line.strip() or turn:
+            turn.append(line)
+
+    if turn and "\n".join(turn).strip():
+        yield "\n".join(turn).strip()
+
+
+def _split_long_turn(turn: str, max_chars: int) -> Iterator[str]:
+    """Cut a turn longer than max_chars on whitespace"""
+    piece = ""
+    for word in turn.split():
+        if piece and len(piece) + len(word) + 1 > max_chars:
+            yield piece
+            piece = ""
+        piece = f"{piece} {word}" if piece else word
+    if piece:
+        yield piece
+
+
+def chunk_conversation(
+    conversation: str, max_chars: int = 800, overlap_turns: int = 1
+) -> Iterator[str]:
+    """
+    Split a conversation into passages on turn boundaries
+
+    Turns are added to a passage until the next one would exceed
+    `max_chars`. The last `overlap_turns` turns of a passage are repeated
+    at the start of the next one, so an exchange is not cut in half.
+    A single turn longer than `max_chars` is split on whitespace.
+
+    Args:
+        conversation: The conversation transcript
+        max_chars: Target maximum length of a passage
+        overlap_turns: Turns shared by consecutive passages
+
+    Yields:
+        The passages in order
+    """
+    window: deque = deque()
+    size = 0
+    fresh = False  # Whether the window holds turns not yielded yet
+
+    turns = (
+        piece
+        for turn in iter_turns(conversation.splitlines())
+        for piece in (
+            _split_long_turn(turn, max_chars) if len(turn) > max_chars else [turn]
+        )
+    )
+
+    for turn in turns:
+        if fresh and size + len(turn) + 1 > max_chars:
+            yield "\n".join(window)
+            # Keep the overlap, dropping it too if the new turn would not fit
+            while window and (
+                len(window) > overlap_turns or size + len(turn) + 1 > max_chars
+            ):
+                size -= len(window.popleft()) + 1
+            fresh = False
+
+        window.append(turn)
+        size += len(turn) + 1
+        fresh = True
+
+    if fresh:
+        yield "\n".join(window)
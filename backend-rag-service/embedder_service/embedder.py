@@ -1,23 +1,78 @@
-from typing import List
+import hashlib
+from typing import List, Optional
 import numpy as np
 from loguru import logger
 
+from embedder_service.embedding_cache import EmbeddingCache, content_key
+
+# Increment of the SplitMix64 counter, the golden ratio in 64 bits
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    """Hash uint64 values to well mixed 64-bit values, element-wise"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
 
 class Embedder:
     """Mock text embedding service that uses random embeddings"""
 
-    def __init__(self, vector_size: int = 768):
+    def __init__(self, vector_size: int = 768, cache: Optional[EmbeddingCache] = None):
         """
         Initialize the embedder with a specified vector size
 
         Args:
             vector_size: Size of the embedding vectors to generate
+            cache: Optional cache of previously computed embeddings
         """
         logger.info(
             f"Initializing simple random embedder with dimension: {vector_size}"
         )
         self.vector_size = vector_size
-        self.model_name = "random-embedding-model"
+        # Versioned, cached vectors of the previous generator are not reused
+        self.model_name = "random-embedding-model-v2"
+        self.cache = cache
+
+    def _seed(self, text: str) -> int:
+        """Deterministic seed for a text, stable across processes"""
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little")
+
+    def _compute_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Build the normalized embedding matrix for a list of unique texts
+
+        Every value is a SplitMix64 hash of its text's seed and its position,
+        so the whole matrix is drawn in one vectorized step while each row
+        still depends on its text only, whatever the batch. Each hash gives
+        two 24-bit uniform values, turned into a normal one with the
+        Box-Muller transform, which makes the normalized rows uniform
+        directions.
+
+        Args:
+            texts: Unique texts to embed
+
+        Returns:
+            A (len(texts), vector_size) float32 matrix of unit vectors
+        """
+        seeds = np.array([self._seed(text) for text in texts], dtype=np.uint64)
+        counters = np.arange(self.vector_size, dtype=np.uint64)
+        bits = _splitmix64(seeds[:, None] + counters * _GOLDEN_GAMMA)
+
+        # In (0, 1] for the logarithm and [0, 1) for the angle
+        scale = np.float32(2.0**-24)
+        radius_uniform = ((bits >> np.uint64(40)).astype(np.float32) + 1) * scale
+        angle_uniform = (bits & np.uint64(0xFFFFFF)).astype(np.float32) * scale
+        matrix = np.sqrt(np.float32(-2.0) * np.log(radius_uniform))
+        matrix *= np.cos(np.float32(2.0 * np.pi) * angle_uniform)
+
+        # Normalize all rows to unit length in one step
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix
 
     def embed_text(self, text: str) -> List[float]:
         """
@@ -29,24 +84,52 @@ class Embedder:
         Returns:
             The embedding vector as a list of floats
         """
-        # Use deterministic embedding based on text hash
-        np.random.seed(hash(text) % 2**32)
-        embedding = np.random.randn(self.vector_size).astype(np.float32)
-        # Normalize to unit length
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding.tolist()
+        return self.embed_batch([text])[0].tolist()
 
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts
 
+        Duplicate texts are embedded once and the rows are broadcast back
+        to their original positions. Texts found in the cache are not
+        recomputed.
+
         Args:
             texts: List of texts to embed
 
         Returns:
-            List of embedding vectors
+            A (len(texts), vector_size) float32 matrix, one row per text
         """
-        return [self.embed_text(text) for text in texts]
+        if not texts:
+            return np.empty((0, self.vector_size), dtype=np.float32)
+
+        # Deduplicate while keeping the first-seen order
+        positions = {}
+        inverse = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            inverse[i] = positions.setdefault(text, len(positions))
+
+        unique_texts = list(positions)
+        if self.cache is None:
+            return self._compute_batch(unique_texts)[inverse]
+
+        keys = [content_key(text, self.model_name) for text in unique_texts]
+        cached = self.cache.get_many(keys)
+
+        unique_matrix = np.empty((len(unique_texts), self.vector_size), np.float32)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        for i, key in enumerate(keys):
+            if key in cached:
+                unique_matrix[i] = cached[key]
+
+        if missing:
+            computed = self._compute_batch([unique_texts[i] for i in missing])
+            unique_matrix[missing] = computed
+            self.cache.put_many(
+                {keys[i]: vector for i, vector in zip(missing, computed)}
+            )
+
+        return unique_matrix[inverse]
 
     def embed_query(self, query: str) -> List[float]:
         """
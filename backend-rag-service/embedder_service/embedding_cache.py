@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from loguru import logger
+
+
+def content_key(text: str, model_name: str) -> str:
+    """
+    Stable cache key for a text embedded by a given model
+
+    Unlike the built-in hash(), this is the same in every process.
+    """
+    digest = hashlib.sha256(f"{model_name}\0{text}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed by content hash
+
+    Level 1 is an in-process LRU bounded by memory. Level 2 is an optional
+    Redis instance shared by every worker, storing raw float32 bytes.
+    """
+
+    def __init__(
+        self,
+        vector_size: int,
+        max_bytes: int = 64 * 1024 * 1024,
+        redis_client=None,
+        ttl_seconds: Optional[int] = None,
+        namespace: str = "embedding",
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            vector_size: Size of the cached embedding vectors
+            max_bytes: Memory cap of the in-process LRU
+            redis_client: Optional binary (decode_responses=False) Redis client
+            ttl_seconds: Expiry of entries in the shared tier, None to keep them
+            namespace: Prefix of the Redis keys
+        """
+        self.vector_size = vector_size
+        self.max_bytes = max_bytes
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insert into the LRU and evict the oldest entries over the cap"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up several keys, memory first, then the shared tier
+
+        Args:
+            keys: Content keys to look up
+
+        Returns:
+            Mapping of the keys that were found to their vectors
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+        if missing and self.redis is not None:
+            try:
+                values = self.redis.mget([self._redis_key(k) for k in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache shared tier unavailable: {str(e)}")
+                values = [None] * len(missing)
+
+            with self._lock:
+                for key, value in zip(missing, values):
+                    if value is None:
+                        continue
+                    vector = np.frombuffer(value, dtype=np.float32)
+                    if vector.shape[0] != self.vector_size:
+                        continue
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.shared_hits += 1
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        Store several vectors in both tiers
+
+        Args:
+            vectors: Mapping of content keys to float32 vectors
+        """
+        if not vectors:
+            return
+
+        with self._lock:
+            for key, vector in vectors.items():
+                # Copy so the cached row does not keep the caller's matrix alive
+                self._remember(key, np.array(vector, dtype=np.float32))
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, vector in vectors.items():
+                    pipe.set(
+                        self._redis_key(key),
+                        np.asarray(vector, dtype=np.float32).tobytes(),
+                        ex=self.ttl_seconds,
+                    )
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Could not write to embedding cache: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters and current memory usage"""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,365 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+import redis.asyncio as redis
+
+
+class JobFailedError(Exception):
+    """Exception raised when a job handler reports a failure"""
+
+    pass
+
+
+# Moves due retries from the delayed set back onto the stream atomically, so
+# a crash can't drop a job between the ZREM and the XADD
+MOVE_DUE_RETRIES = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local fields = {}
+    for name, value in pairs(cjson.decode(member)) do
+        table.insert(fields, name)
+        table.insert(fields, tostring(value))
+    end
+    redis.call('XADD', KEYS[2], '*', unpack(fields))
+end
+return #due
+"""
+
+
+class MemoryUpdateQueue:
+    """
+    Durable memory update queue on Redis Streams
+
+    Jobs are appended to a stream read by a consumer group, so every job is
+    delivered to one worker and stays pending until it is acknowledged.
+    Jobs left pending by a crashed worker are claimed by the others, while
+    a running job keeps its claim fresh so it isn't taken over. Failed jobs
+    are retried with exponential backoff through a delayed sorted set and
+    moved to a dead-letter stream after `max_attempts`. The status of each
+    job, including its attempt count, is kept in its own hash, so a job
+    that keeps crashing its worker still runs out of attempts.
+    """
+
+    STREAM = "memory:jobs"
+    GROUP = "memory-workers"
+    DELAYED = "memory:jobs:delayed"
+    DEAD_LETTER = "memory:jobs:dead"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        handler: Callable[[str, str, str], Awaitable[bool]],
+        workers: int = 4,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        claim_idle_ms: int = 60000,
+        status_ttl: int = 86400,
+        block_ms: int = 1000,
+    ):
+        """
+        Initialize the queue
+
+        Args:
+            redis_client: Redis client created with decode_responses=True
+            handler: Coroutine called with (owner_id, conversation, job_id),
+                returning whether the job succeeded
+            workers: Number of concurrent workers in this process
+            max_attempts: Attempts before a job goes to the dead-letter stream
+            backoff_base: Base of the exponential retry delay, in seconds
+            backoff_max: Upper bound of the retry delay, in seconds
+            claim_idle_ms: Idle time after which another worker's job is
+                claimed, running jobs refresh their claim well within it
+            status_ttl: Seconds a finished job's status is kept
+            block_ms: How long a worker waits for new jobs before checking
+                whether it should stop
+        """
+        self.redis = redis_client
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_idle_ms = claim_idle_ms
+        self.status_ttl = status_ttl
+        self.block_ms = block_ms
+
+        self._consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self._move_due_retries = self.redis.register_script(MOVE_DUE_RETRIES)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"memory:job:{job_id}"
+
+    def _queue_status(self, pipe, job_id: str, expire: bool = False, **fields) -> None:
+        """Add a status hash update of a job to a pipeline"""
+        fields["updated_at"] = datetime.now().isoformat()
+        pipe.hset(self._job_key(job_id), mapping=fields)
+        if expire:
+            pipe.expire(self._job_key(job_id), self.status_ttl)
+
+    async def _set_status(self, job_id: str, expire: bool = False, **fields) -> None:
+        """Update the status hash of a job"""
+        pipe = self.redis.pipeline(transaction=False)
+        self._queue_status(pipe, job_id, expire, **fields)
+        await pipe.execute()
+
+    async def enqueue(self, owner_id: str, conversation: str) -> str:
+        """
+        Add a memory update job
+
+        Args:
+            owner_id: The user's ID
+            conversation: The latest conversation
+
+        Returns:
+            The job ID
+        """
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(
+            self._job_key(job_id),
+            mapping={
+                "job_id": job_id,
+                "owner_id": owner_id,
+                "status": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+        pipe.xadd(
+            self.STREAM,
+            {
+                "job_id": job_id,
+                "owner_id": owner_id,
+                "conversation": conversation,
+                "attempts": 0,
+            },
+        )
+        await pipe.execute()
+
+        logger.info(f"Queued memory update job {job_id} for owner {owner_id}")
+        return job_id
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            The job status or None if unknown
+        """
+        status = await self.redis.hgetall(self._job_key(job_id))
+        if not status:
+            return None
+        status["attempts"] = int(status.get("attempts", 0))
+        return status
+
+    async def start(self) -> None:
+        """Create the consumer group and start the workers"""
+        try:
+            await self.redis.xgroup_create(
+                self.STREAM, self.GROUP, id="0", mkstream=True
+            )
+        except redis.ResponseError as e:
+            # The group survives restarts
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self._consumer_prefix}-{i}"))
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._schedule_retries()))
+        logger.info(f"Started {self.workers} memory update workers")
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """
+        Stop the workers, letting running jobs finish
+
+        Args:
+            timeout: Seconds to wait before cancelling the workers, jobs
+                interrupted this way are claimed again after a restart
+        """
+        self._stopping.set()
+        if not self._tasks:
+            return
+
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, consumer: str) -> None:
+        """Read and process jobs until the queue is closed"""
+        while not self._stopping.is_set():
+            try:
+                # Jobs abandoned by a crashed worker come first
+                _, messages, *_ = await self.redis.xautoclaim(
+                    self.STREAM,
+                    self.GROUP,
+                    consumer,
+                    min_idle_time=self.claim_idle_ms,
+                    start_id="0-0",
+                    count=1,
+                )
+                if not messages:
+                    response = await self.redis.xreadgroup(
+                        self.GROUP,
+                        consumer,
+                        {self.STREAM: ">"},
+                        count=1,
+                        block=self.block_ms,
+                    )
+                    messages = response[0][1] if response else []
+
+                for message_id, fields in messages:
+                    await self._process(consumer, message_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Memory update worker {consumer} error: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _acknowledge(self, message_id: str) -> None:
+        """Remove a handled message from the stream"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.xack(self.STREAM, self.GROUP, message_id)
+        pipe.xdel(self.STREAM, message_id)
+        await pipe.execute()
+
+    async def _process(
+        self, consumer: str, message_id: str, fields: Dict[str, str]
+    ) -> None:
+        """
+        Run one job and record its outcome
+
+        A worker cancelled mid-job leaves the message pending, so it is
+        claimed again instead of being lost.
+        """
+        job_id = fields["job_id"]
+        # Counted on every delivery, including claims of abandoned jobs
+        attempts = await self.redis.hincrby(self._job_key(job_id), "attempts", 1)
+        if attempts > self.max_attempts:
+            # The previous attempt never finished, its worker died with it
+            await self._retry_or_dead_letter(
+                message_id,
+                dict(fields, attempts=attempts - 1),
+                JobFailedError("Memory update job was abandoned by its worker"),
+            )
+            return
+
+        await self._set_status(job_id, status="running")
+        keep_claim = asyncio.create_task(self._keep_claim(consumer, message_id))
+        try:
+            success = await self.handler(
+                fields["owner_id"], fields["conversation"], job_id
+            )
+            if not success:
+                raise JobFailedError("Memory update handler reported a failure")
+        except asyncio.CancelledError:
+            # Shutting down, the job is claimed again without using up an attempt
+            await self.redis.hincrby(self._job_key(job_id), "attempts", -1)
+            raise
+        except Exception as e:
+            await self._retry_or_dead_letter(
+                message_id, dict(fields, attempts=attempts), e
+            )
+            return
+        finally:
+            keep_claim.cancel()
+
+        await self._set_status(job_id, expire=True, status="done", error="")
+        await self._acknowledge(message_id)
+        logger.info(f"Memory update job {job_id} done")
+
+    async def _keep_claim(self, consumer: str, message_id: str) -> None:
+        """Reset the idle time of a running job's message until cancelled"""
+        interval = self.claim_idle_ms / 1000 / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.redis.xclaim(
+                    self.STREAM,
+                    self.GROUP,
+                    consumer,
+                    min_idle_time=0,
+                    message_ids=[message_id],
+                    justid=True,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error refreshing claim of {message_id}: {str(e)}")
+
+    async def _retry_or_dead_letter(
+        self, message_id: str, job: Dict[str, Any], error: Exception
+    ) -> None:
+        """
+        Schedule a failed job for a retry, or dead-letter it
+
+        The message is acknowledged in the same transaction, so the job is
+        never both scheduled and still pending.
+        """
+        job_id = job["job_id"]
+        attempts = job["attempts"]
+
+        pipe = self.redis.pipeline(transaction=True)
+        if attempts >= self.max_attempts:
+            pipe.xadd(self.DEAD_LETTER, dict(job, error=str(error)))
+            self._queue_status(
+                pipe,
+                job_id,
+                expire=True,
+                status="dead",
+                attempts=attempts,
+                error=str(error),
+            )
+        else:
+            delay = min(self.backoff_base**attempts, self.backoff_max)
+            delay *= random.uniform(0.5, 1.0)
+            ready_at = datetime.now().timestamp() + delay
+            pipe.zadd(self.DELAYED, {json.dumps(job): ready_at})
+            self._queue_status(pipe, job_id, status="retrying", error=str(error))
+        pipe.xack(self.STREAM, self.GROUP, message_id)
+        pipe.xdel(self.STREAM, message_id)
+        await pipe.execute()
+
+        if attempts >= self.max_attempts:
+            logger.error(f"Memory update job {job_id} dead-lettered: {str(error)}")
+        else:
+            logger.warning(
+                f"Memory update job {job_id} failed, retrying in {delay:.1f}s: "
+                f"{str(error)}"
+            )
+
+    async def _schedule_retries(self) -> None:
+        """Move retries whose backoff has elapsed back onto the stream"""
+        while not self._stopping.is_set():
+            try:
+                moved = await self._move_due_retries(
+                    keys=[self.DELAYED, self.STREAM],
+                    args=[datetime.now().timestamp(), 100],
+                )
+                if not moved:
+                    await asyncio.sleep(0.5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error scheduling memory update retries: {str(e)}")
+                await asyncio.sleep(1)
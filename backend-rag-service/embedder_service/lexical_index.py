@@ -0,0 +1,234 @@
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+import redis.asyncio as redis
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Words too common to help ranking, kept short on purpose: names, places
+# and dates are what the lexical index is for
+STOPWORDS = frozenset(
+    """a an and are as at be but by for from has have he her his i in is it its
+    me my of on or our she so that the their them they this to was we were
+    what when where which who will with you your""".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS
+    ]
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]], k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion
+
+    Each hit scores sum(1 / (k + rank)) over the lists it appears in, so
+    only ranks matter and BM25 and cosine scores need no calibration.
+
+    Args:
+        result_lists: Ranked hits, each with an "id"
+        k: Damping constant, larger values flatten the rank weights
+
+    Returns:
+        The fused hits, best first, with "score" set to the fused score
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            fused.setdefault(hit["id"], hit)
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1.0 / (k + rank)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [dict(fused[hit_id], score=scores[hit_id]) for hit_id in ranked]
+
+
+class LexicalIndex:
+    """
+    Per-owner BM25 inverted index stored in Redis
+
+    Every owner has a postings hash per term (document -> term frequency),
+    a hash of document lengths, a hash of stored documents and a set of
+    the terms in use. Documents are added incrementally and scoring reads
+    only the postings of the query terms.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        k1: float = 1.2,
+        b: float = 0.75,
+        namespace: str = "lexical",
+    ):
+        """
+        Initialize the index
+
+        Args:
+            redis_client: Redis client created with decode_responses=True
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+            namespace: Prefix of the Redis keys
+        """
+        self.redis = redis_client
+        self.k1 = k1
+        self.b = b
+        self.namespace = namespace
+
+    def _key(self, owner_id: str, name: str) -> str:
+        return f"{self.namespace}:{owner_id}:{name}"
+
+    def _postings_key(self, owner_id: str, term: str) -> str:
+        return self._key(owner_id, f"postings:{term}")
+
+    async def add_documents(
+        self, owner_id: str, documents: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Index documents, replacing any stored under the same IDs
+
+        Args:
+            owner_id: The ID of the owner/user
+            documents: Documents with an "id", a "text" and optional
+                "created_at" and "parent_id"
+        """
+        if not documents:
+            return
+
+        ids = [document["id"] for document in documents]
+        previous = await self.redis.hmget(self._key(owner_id, "docs"), ids)
+
+        pipe = self.redis.pipeline(transaction=True)
+        for document, stored in zip(documents, previous):
+            doc_id = document["id"]
+            if stored is not None:
+                # Take the old version's postings out first
+                old_terms = Counter(tokenize(json.loads(stored)["text"]))
+                for term in old_terms:
+                    pipe.hdel(self._postings_key(owner_id, term), doc_id)
+                pipe.hincrby(
+                    self._key(owner_id, "stats"),
+                    "total_length",
+                    -sum(old_terms.values()),
+                )
+
+            terms = Counter(tokenize(document["text"]))
+            for term, frequency in terms.items():
+                pipe.hset(self._postings_key(owner_id, term), doc_id, frequency)
+            if terms:
+                pipe.sadd(self._key(owner_id, "terms"), *terms)
+
+            length = sum(terms.values())
+            pipe.hset(self._key(owner_id, "lengths"), doc_id, length)
+            pipe.hincrby(self._key(owner_id, "stats"), "total_length", length)
+            pipe.hset(
+                self._key(owner_id, "docs"),
+                doc_id,
+                json.dumps(
+                    {
+                        "text": document["text"],
+                        "created_at": document.get("created_at"),
+                        "parent_id": document.get("parent_id"),
+                    }
+                ),
+            )
+        await pipe.execute()
+
+    async def search(
+        self, owner_id: str, query: str, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank an owner's documents against a query with BM25
+
+        Args:
+            owner_id: The ID of the owner/user
+            query: The search query
+            limit: Maximum number of results to return
+
+        Returns:
+            Hits shaped like vector store results, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hlen(self._key(owner_id, "lengths"))
+        pipe.hget(self._key(owner_id, "stats"), "total_length")
+        for term in terms:
+            pipe.hgetall(self._postings_key(owner_id, term))
+        document_count, total_length, *postings = await pipe.execute()
+
+        if not document_count:
+            return []
+        average_length = max(int(total_length or 0) / document_count, 1.0)
+
+        candidates = sorted({doc_id for posting in postings for doc_id in posting})
+        if not candidates:
+            return []
+        lengths = await self.redis.hmget(self._key(owner_id, "lengths"), candidates)
+        length_of = {
+            doc_id: int(length or 0) for doc_id, length in zip(candidates, lengths)
+        }
+
+        scores: Dict[str, float] = {}
+        for posting in postings:
+            if not posting:
+                continue
+            idf = math.log(
+                1 + (document_count - len(posting) + 0.5) / (len(posting) + 0.5)
+            )
+            for doc_id, frequency in posting.items():
+                frequency = int(frequency)
+                norm = 1 - self.b + self.b * length_of[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * (
+                    frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                )
+
+        top = sorted(scores, key=scores.get, reverse=True)[:limit]
+        stored = await self.redis.hmget(self._key(owner_id, "docs"), top)
+
+        results = []
+        for doc_id, document in zip(top, stored):
+            if document is None:
+                continue
+            document = json.loads(document)
+            results.append(
+                {
+                    "id": doc_id,
+                    "text": document["text"],
+                    "score": scores[doc_id],
+                    "created_at": document.get("created_at"),
+                    "metadata": {"parent_id": document.get("parent_id")},
+                }
+            )
+        return results
+
+    async def delete_by_owner(self, owner_id: str) -> int:
+        """
+        Drop an owner's whole index
+
+        Args:
+            owner_id: The ID of the owner/user
+
+        Returns:
+            The number of documents removed
+        """
+        terms = await self.redis.smembers(self._key(owner_id, "terms"))
+        document_count = await self.redis.hlen(self._key(owner_id, "lengths"))
+
+        keys = [self._postings_key(owner_id, term) for term in terms]
+        keys += [
+            self._key(owner_id, name) for name in ("terms", "lengths", "stats", "docs")
+        ]
+        # Delete in slices so a large vocabulary does not block Redis
+        for start in range(0, len(keys), 500):
+            await self.redis.unlink(*keys[start : start + 500])
+
+        return document_count
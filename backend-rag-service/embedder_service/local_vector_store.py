@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import numpy as np
+from loguru import logger
+
+from embedder_service.vector_store import (
+    BaseVectorStore,
+    format_match,
+    matches_filter,
+    project_payload,
+)
+
+
+class _OwnerIndex:
+    """Vectors and payloads of a single owner"""
+
+    def __init__(self, vector_size: int):
+        # Rows [0, count) are in use, the rest is spare capacity
+        self.matrix = np.empty((0, vector_size), dtype=np.float32)
+        self.count = 0
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self.matrix[: self.count]
+
+
+class LocalVectorStore(BaseVectorStore):
+    """
+    In-process vector store doing exact cosine search with NumPy
+
+    Each owner's vectors live in one contiguous float32 matrix of unit
+    vectors, so a top-k query is a single matrix-vector product followed
+    by argpartition. Data is persisted per owner as a .npy file, loaded
+    memory-mapped, and a JSON file with the ids and payloads.
+
+    Searches and writes run in worker threads: the lock guarding the
+    indexes is held during disk writes, and an owner's first search loads
+    its files, neither of which may stall the event loop.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "documents",
+        vector_size: int = 768,
+        data_dir: Optional[str] = None,
+    ):
+        """
+        Initialize the local vector store
+
+        Args:
+            collection_name: Name of the collection, used as a sub-directory
+            vector_size: Size of the stored vectors
+            data_dir: Root directory of the persisted files
+        """
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+
+        root = data_dir or os.getenv("LOCAL_VECTOR_STORE_DIR", "data/vectors")
+        self.data_dir = Path(root) / collection_name
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        self._owners: Dict[str, _OwnerIndex] = {}
+        self._lock = threading.RLock()
+
+        logger.info(f"Using local vector store at {self.data_dir}")
+
+    def _owner_dir(self, owner_id: str) -> Path:
+        """Directory of an owner's files, named after a hash of the owner id"""
+        return self.data_dir / hashlib.sha1(owner_id.encode("utf-8")).hexdigest()
+
+    def _load(self, owner_id: str) -> _OwnerIndex:
+        """Get an owner's index, loading it from disk the first time"""
+        index = self._owners.get(owner_id)
+        if index is not None:
+            return index
+
+        index = _OwnerIndex(self.vector_size)
+        owner_dir = self._owner_dir(owner_id)
+        vectors_path = owner_dir / "vectors.npy"
+        payloads_path = owner_dir / "payloads.json"
+
+        if vectors_path.exists() and payloads_path.exists():
+            # Read-only memory map, copied on the first write
+            index.matrix = np.load(vectors_path, mmap_mode="r")
+            index.count = index.matrix.shape[0]
+            with open(payloads_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            index.ids = stored["ids"]
+            index.payloads = stored["payloads"]
+
+        self._owners[owner_id] = index
+        return index
+
+    def _persist(self, owner_id: str, index: _OwnerIndex) -> None:
+        """Atomically write an owner's index to disk"""
+        owner_dir = self._owner_dir(owner_id)
+        if index.count == 0:
+            shutil.rmtree(owner_dir, ignore_errors=True)
+            return
+
+        owner_dir.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = owner_dir / "vectors.tmp.npy"
+        tmp_payloads = owner_dir / "payloads.tmp.json"
+
+        np.save(tmp_vectors, index.vectors)
+        with open(tmp_payloads, "w", encoding="utf-8") as f:
+            json.dump({"ids": index.ids, "payloads": index.payloads}, f)
+
+        os.replace(tmp_vectors, owner_dir / "vectors.npy")
+        os.replace(tmp_payloads, owner_dir / "payloads.json")
+
+    def _append(self, index: _OwnerIndex, vectors: np.ndarray) -> None:
+        """Append unit vectors, growing the matrix geometrically"""
+        needed = index.count + vectors.shape[0]
+        if needed > index.matrix.shape[0] or not index.matrix.flags.writeable:
+            capacity = max(needed, 2 * index.matrix.shape[0], 16)
+            matrix = np.empty((capacity, self.vector_size), dtype=np.float32)
+            matrix[: index.count] = index.vectors
+            index.matrix = matrix
+
+        index.matrix[index.count : needed] = vectors
+        index.count = needed
+
+    def _remove(self, index: _OwnerIndex, ids: set) -> int:
+        """Drop the rows with the given ids, returning how many were removed"""
+        keep = [i for i, point_id in enumerate(index.ids) if point_id not in ids]
+        removed = index.count - len(keep)
+        if removed == 0:
+            return 0
+
+        index.matrix = np.ascontiguousarray(index.vectors[keep])
+        index.count = len(keep)
+        index.ids = [index.ids[i] for i in keep]
+        index.payloads = [index.payloads[i] for i in keep]
+        return removed
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        """Scale vectors to unit length so dot products are cosine scores"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _top_k(
+        self,
+        index: _OwnerIndex,
+        query_vector: List[float],
+        limit: int,
+        additional_filter: Optional[Dict[str, Any]] = None,
+    ) -> List[tuple]:
+        """Return (row, score) pairs of the best matches, best first"""
+        if index.count == 0 or limit <= 0:
+            return []
+
+        query = self._normalize(query_vector)
+        scores = index.vectors @ query
+
+        candidates = index.count
+        if additional_filter:
+            # Rows failing the filter can never be selected
+            mask = np.array(
+                [matches_filter(p, additional_filter) for p in index.payloads]
+            )
+            scores = np.where(mask, scores, -np.inf)
+            candidates = int(mask.sum())
+            if candidates == 0:
+                return []
+
+        limit = min(limit, candidates)
+        if limit < index.count:
+            rows = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            rows = np.arange(index.count)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+
+        return [(int(row), float(scores[row])) for row in rows]
+
+    def _search_points(
+        self,
+        query_vector: List[float],
+        owner_id: str,
+        limit: int,
+        threshold: Optional[float] = None,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a filtered search, returning only the requested payload fields"""
+        with self._lock:
+            index = self._load(owner_id)
+            matches = self._top_k(index, query_vector, limit, additional_filter)
+
+            results = []
+            for row, score in matches:
+                if threshold is not None and score < threshold:
+                    break
+                payload = project_payload(index.payloads[row], payload_fields)
+                results.append(format_match(index.ids[row], score, payload))
+
+        return results
+
+    async def store_embeddings(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Store several embeddings, persisting each owner once
+
+        Args:
+            items: Points to store, see BaseVectorStore.store_embeddings
+
+        Returns:
+            The IDs of the stored points
+        """
+        return await asyncio.to_thread(self._store_embeddings, items)
+
+    def _store_embeddings(self, items: List[Dict[str, Any]]) -> List[str]:
+        """Blocking part of store_embeddings"""
+        point_ids = [item.get("id") or str(uuid.uuid4()) for item in items]
+
+        by_owner: Dict[str, List[int]] = {}
+        for position, item in enumerate(items):
+            by_owner.setdefault(item["owner_id"], []).append(position)
+
+        with self._lock:
+            for owner_id, positions in by_owner.items():
+                index = self._load(owner_id)
+                # Replayed points replace the stored ones with the same id
+                self._remove(index, {point_ids[p] for p in positions})
+
+                vectors = self._normalize(
+                    np.stack(
+                        [
+                            np.asarray(items[p]["embedding"], dtype=np.float32)
+                            for p in positions
+                        ]
+                    )
+                )
+                self._append(index, vectors)
+                for p in positions:
+                    item = items[p]
+                    index.ids.append(point_ids[p])
+                    index.payloads.append(
+                        self._build_payload(
+                            item["text"], owner_id, item.get("metadata")
+                        )
+                    )
+                self._persist(owner_id, index)
+
+        return point_ids
+
+    async def query_similar(
+        self,
+        query_vector: List[float],
+        owner_id: str,
+        limit: int = 5,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query for similar vectors of an owner
+
+        Args:
+            query_vector: The vector to compare against
+            owner_id: The ID of the owner/user to filter by
+            limit: The maximum number of results to return
+            additional_filter: Additional filter conditions
+            payload_fields: Payload fields to return, None for all of them
+
+        Returns:
+            List of similar documents with their metadata and scores
+        """
+        return await asyncio.to_thread(
+            self._search_points,
+            query_vector=query_vector,
+            owner_id=owner_id,
+            limit=limit,
+            additional_filter=additional_filter,
+            payload_fields=payload_fields,
+        )
+
+    async def delete_by_ids(self, ids: List[str], owner_id: str) -> int:
+        """
+        Delete points by their IDs, but only if they belong to the owner
+
+        Args:
+            ids: The IDs of the points to delete
+            owner_id: The ID of the owner/user
+
+        Returns:
+            The number of points deleted
+        """
+        return await asyncio.to_thread(self._delete_by_ids, ids, owner_id)
+
+    def _delete_by_ids(self, ids: List[str], owner_id: str) -> int:
+        """Blocking part of delete_by_ids"""
+        with self._lock:
+            index = self._load(owner_id)
+            deleted = self._remove(index, set(ids))
+            if deleted:
+                self._persist(owner_id, index)
+
+        return deleted
+
+    async def delete_by_owner(self, owner_id: str) -> int:
+        """
+        Delete all points for a specific owner
+
+        Args:
+            owner_id: The ID of the owner/user
+
+        Returns:
+            The number of points deleted
+        """
+        return await asyncio.to_thread(self._delete_by_owner, owner_id)
+
+    def _delete_by_owner(self, owner_id: str) -> int:
+        """Blocking part of delete_by_owner"""
+        with self._lock:
+            index = self._load(owner_id)
+            deleted = index.count
+            self._owners.pop(owner_id, None)
+            shutil.rmtree(self._owner_dir(owner_id), ignore_errors=True)
+
+        return deleted
+
+    async def search(
+        self,
+        embedding: List[float],
+        owner_id: str = None,
+        limit: int = 10,
+        threshold: float = 0.0,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for similar vectors of an owner
+
+        Args:
+            embedding: The query embedding
+            owner_id: Owner ID whose vectors are searched
+            limit: Maximum number of results to return
+            threshold: Minimum similarity score (0-1)
+            additional_filter: Additional filter conditions
+            payload_fields: Payload fields to return, None for all of them
+
+        Returns:
+            List of matching documents with similarity scores
+        """
+        if not owner_id:
+            # Every index is partitioned by owner, there is no global scan
+            logger.warning("Local vector store search requires an owner_id")
+            return []
+
+        return await asyncio.to_thread(
+            self._search_points,
+            query_vector=embedding,
+            owner_id=owner_id,
+            limit=limit,
+            threshold=threshold,
+            additional_filter=additional_filter,
+            payload_fields=payload_fields,
+        )
@@ -1,22 +1,93 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import redis
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from embedder_service.embedder import Embedder
-from embedder_service.vector_store import VectorStore
+from embedder_service.batcher import EmbeddingBatcher
+from embedder_service.embedding_cache import EmbeddingCache
+from embedder_service.write_buffer import WriteBuffer
+from embedder_service.job_queue import MemoryUpdateQueue
+from embedder_service.vector_store import create_vector_store
 from embedder_service import schemas
 from embedder_service.auth import validate_service_api_key
 from embedder_service.memory_service import MemoryService
 from loguru import logger
 
+# Shared embedding cache: in-process LRU backed by Redis
+embedding_cache = EmbeddingCache(
+    vector_size=768,
+    max_bytes=int(os.getenv("EMBED_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    redis_client=(
+        redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            password=os.getenv("REDIS_PASSWORD", None),
+        )
+        if os.getenv("EMBED_CACHE_SHARED", "true").lower() == "true"
+        else None
+    ),
+    ttl_seconds=int(os.getenv("EMBED_CACHE_TTL_SECONDS", "0")) or None,
+)
+
 # Initialize the embedder and vector store
-embedder = Embedder()
-vector_store = VectorStore(vector_size=embedder.vector_size)
-memory_service = MemoryService(vector_store, embedder)
+embedder = Embedder(vector_size=embedding_cache.vector_size, cache=embedding_cache)
+vector_store = create_vector_store(vector_size=embedder.vector_size)
+batcher = EmbeddingBatcher(
+    embedder,
+    max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+)
+# Optional bulk write buffer, disabled when VECTOR_WRITE_BUFFER_SIZE is 0
+write_buffer_size = int(os.getenv("VECTOR_WRITE_BUFFER_SIZE", "0"))
+write_buffer = (
+    WriteBuffer(
+        vector_store,
+        max_size=write_buffer_size,
+        flush_interval=float(os.getenv("VECTOR_WRITE_BUFFER_INTERVAL", "1.0")),
+        spill_path=os.getenv("VECTOR_SPILL_PATH", "data/vector_spill.jsonl"),
+    )
+    if write_buffer_size > 0
+    else None
+)
+memory_service = MemoryService(
+    vector_store, embedder, batcher=batcher, write_buffer=write_buffer
+)
+# Memory updates run in background workers fed by a Redis stream
+memory_update_queue = MemoryUpdateQueue(
+    memory_service.redis,
+    handler=lambda owner_id, conversation, job_id: memory_service.update_memory(
+        owner_id=owner_id, conversation=conversation, conversation_id=job_id
+    ),
+    workers=int(os.getenv("MEMORY_JOB_WORKERS", "4")),
+    max_attempts=int(os.getenv("MEMORY_JOB_MAX_ATTEMPTS", "5")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start-up and shutdown hooks"""
+    await vector_store.initialize()
+    if write_buffer:
+        await write_buffer.start()
+    await memory_update_queue.start()
+    yield
+    await memory_update_queue.close()
+    if write_buffer:
+        await write_buffer.close()
+    await batcher.close()
+    await memory_service.close()
+    await vector_store.close()
+
 
 app = FastAPI(
     title="RAG Embedder Service",
     description="Internal service for text embedding and vector search",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS - restrictive since this is an internal service
@@ -40,6 +111,58 @@ async def root():
     }
 
 
+@app.post("/embed/batch", response_model=schemas.EmbedBatchResponse)
+async def embed_batch(
+    request: schemas.EmbedBatchRequest,
+    _: bool = Depends(validate_service_api_key),
+):
+    """
+    Embed a batch of texts in a single call
+    Requires service API key
+    """
+    try:
+        # The embedder may hit the shared cache, keep it off the event loop
+        embeddings = await asyncio.to_thread(embedder.embed_batch, request.texts)
+
+        logger.info(f"Embedded batch of {len(request.texts)} texts")
+
+        return schemas.EmbedBatchResponse(
+            model=embedder.model_name,
+            vector_size=embedder.vector_size,
+            embeddings=embeddings.tolist(),
+        )
+    except Exception as e:
+        logger.error(f"Error embedding batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error embedding batch: {str(e)}",
+        )
+
+
+@app.get("/embed/cache/stats")
+async def embedding_cache_stats(
+    _: bool = Depends(validate_service_api_key),
+):
+    """
+    Embedding cache hit and miss counters
+    Requires service API key
+    """
+    return embedding_cache.stats()
+
+
+@app.get("/memory/query-cache/stats")
+async def query_cache_stats(
+    _: bool = Depends(validate_service_api_key),
+):
+    """
+    Similar-memory query cache hit and miss counters
+    Requires service API key
+    """
+    if not memory_service.query_cache:
+        return {"enabled": False}
+    return dict(memory_service.query_cache.stats(), enabled=True)
+
+
 # When Agent is created.
 @app.post("/memory/create/{owner_id}", response_model=schemas.MemoryCreateResponse)
 async def create_document_memory(
@@ -51,7 +174,7 @@ async def create_document_memory(
     Requires service API key
     """
     try:
-        memory = memory_service.create_base_memory(owner_id)
+        memory = await memory_service.create_base_memory(owner_id)
 
         logger.info(f"Created memory for owner {owner_id}")
 
@@ -70,40 +193,61 @@ async def create_document_memory(
 
 
 # When Agent conversation is completed.
-@app.post("/memory/update/{owner_id}")
+@app.post(
+    "/memory/update/{owner_id}",
+    response_model=schemas.MemoryUpdateJobResponse,
+    status_code=202,
+)
 async def update_memory(
     owner_id: str,
     request: schemas.MemoryUpdateRequest,
     _: bool = Depends(validate_service_api_key),
 ):
     """
-    Update memory with latest conversation
+    Queue a memory update with the latest conversation
     Requires service API key
     """
     try:
-        success = memory_service.update_memory(
-            owner_id=owner_id,
-            conversation=request.conversation,
-        )
-
-        if not success:
+        if not await memory_service.memory_exists(owner_id):
             raise HTTPException(
                 status_code=404,
                 detail=f"Memory not found for owner {owner_id}",
             )
 
-        logger.info(f"Updated memory for owner {owner_id}")
+        job_id = await memory_update_queue.enqueue(
+            owner_id=owner_id,
+            conversation=request.conversation,
+        )
 
-        return {"status": "success", "message": "Memory updated successfully"}
+        return schemas.MemoryUpdateJobResponse(job_id=job_id, status="queued")
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error updating memory: {str(e)}")
+        logger.error(f"Error queueing memory update: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail=f"Error updating memory: {str(e)}",
+            detail=f"Error queueing memory update: {str(e)}",
+        )
+
+
+@app.get("/memory/jobs/{job_id}", response_model=schemas.MemoryJobStatusResponse)
+async def get_memory_job(
+    job_id: str,
+    _: bool = Depends(validate_service_api_key),
+):
+    """
+    Get the progress of a memory update job
+    Requires service API key
+    """
+    status = await memory_update_queue.get_status(job_id)
+    if not status:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Memory update job {job_id} not found",
         )
 
+    return schemas.MemoryJobStatusResponse(**status)
+
 
 # Load memory
 @app.get("/memory/{owner_id}", response_model=schemas.MemoryDocumentResponse)
@@ -116,7 +260,7 @@ async def get_memory(
     Requires service API key
     """
     try:
-        memory_doc = memory_service.get_memory_document(owner_id)
+        memory_doc = await memory_service.get_memory_document(owner_id)
 
         if not memory_doc:
             raise HTTPException(
@@ -130,6 +274,7 @@ async def get_memory(
             id=memory_doc["id"],
             owner_id=memory_doc["owner_id"],
             text=memory_doc["text"],
+            version=memory_doc["version"],
             created_at=memory_doc["created_at"],
             updated_at=memory_doc["updated_at"],
         )
@@ -158,7 +303,7 @@ async def query_memory(
     Requires service API key
     """
     try:
-        results = memory_service.get_more_similar_memories(
+        results = await memory_service.get_more_similar_memories(
             owner_id=owner_id,
             query=request.query,
             limit=5,
@@ -201,7 +346,7 @@ async def delete_documents(
     Requires service API key
     """
     try:
-        deleted = vector_store.delete_by_owner(
+        deleted = await memory_service.delete_by_owner(
             owner_id=owner_id,
         )
 
@@ -0,0 +1,128 @@
+# Used by both the API and the RAG service, which are built and deployed
+# separately. This file exists in both as service/memory_sections.py and
+# embedder_service/memory_sections.py, keep the two copies identical.
+import json
+from typing import Dict, List, Tuple
+
+PATCH_OPERATIONS = ("append", "replace")
+
+
+class SectionPatchError(ValueError):
+    """Exception raised when a section patch from the model cannot be applied"""
+
+    pass
+
+
+def parse_sections(document: str, headers: List[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Split a memory document into its sections
+
+    A line equal to one of the headers starts that section. Text before
+    the first header is kept as the preamble. A document without any
+    header, written before memories had sections, is taken as the body of
+    the first section, so it is patched and compacted like the rest and
+    rewritten with headers on the next update.
+
+    Args:
+        document: The memory document
+        headers: The section headers
+
+    Returns:
+        The preamble and a mapping of header to section body
+    """
+    preamble: List[str] = []
+    bodies: Dict[str, List[str]] = {}
+    current = None
+
+    for line in document.splitlines():
+        if line.strip() in headers:
+            current = line.strip()
+            bodies.setdefault(current, [])
+            continue
+        (bodies[current] if current else preamble).append(line)
+
+    text = "\n".join(preamble).strip()
+    if not bodies and text and headers:
+        return "", {headers[0]: text}
+
+    return text, {header: "\n".join(lines).strip() for header, lines in bodies.items()}
+
+
+def render_sections(preamble: str, sections: Dict[str, str], headers: List[str]) -> str:
+    """
+    Join sections back into a memory document, in header order
+
+    Args:
+        preamble: Text before the first section
+        sections: Mapping of header to section body
+        headers: The section headers
+
+    Returns:
+        The memory document
+    """
+    parts = [preamble] if preamble else []
+    for header in headers:
+        body = sections.get(header, "")
+        parts.append(f"{header}\n{body}" if body else header)
+    return "\n\n".join(parts) + "\n"
+
+
+def patch_instructions(sections: Dict[str, str]) -> str:
+    """
+    Describe the patch format the model has to answer with
+
+    Args:
+        sections: Mapping of section key to header
+
+    Returns:
+        Instructions to include in the system prompt
+    """
+    keys = "\n".join(f'- "{key}": {header}' for key, header in sections.items())
+    return f"""Answer with a JSON object listing ONLY the sections that change:
+{{"edits": [{{"section": "<key>", "op": "append" or "replace", "text": "..."}}]}}
+
+Use "append" to add new lines to a section and "replace" to rewrite a
+section that is outdated. Leave out sections that do not change, and
+return {{"edits": []}} if nothing changes. The section keys are:
+{keys}"""
+
+
+def apply_section_patch(document: str, sections: Dict[str, str], patch: str) -> str:
+    """
+    Apply the model's section edits to a memory document
+
+    Args:
+        document: The current memory document
+        sections: Mapping of section key to header
+        patch: The model's JSON answer
+
+    Returns:
+        The updated memory document
+
+    Raises:
+        SectionPatchError: If the patch is malformed
+    """
+    try:
+        edits = json.loads(patch)["edits"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise SectionPatchError(f"Invalid section patch: {str(e)}")
+    if not isinstance(edits, list):
+        raise SectionPatchError("Invalid section patch: edits must be a list")
+
+    headers = list(sections.values())
+    preamble, bodies = parse_sections(document, headers)
+
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise SectionPatchError(f"Invalid section edit: {edit!r}")
+        header = sections.get(edit.get("section"))
+        operation = edit.get("op", "replace")
+        if header is None or operation not in PATCH_OPERATIONS:
+            raise SectionPatchError(f"Invalid section edit: {edit!r}")
+
+        text = str(edit.get("text", "")).strip()
+        if operation == "append":
+            text = "\n".join(part for part in (bodies.get(header, ""), text) if part)
+        bodies[header] = text
+
+    return render_sections(preamble, bodies, headers)
@@ -1,11 +1,21 @@
+import asyncio
+import json
 import os
+import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 from loguru import logger
-from openai import OpenAI
-import redis
+from openai import AsyncOpenAI
+import redis.asyncio as redis
 
-from embedder_service.vector_store import VectorStore
+from embedder_service.vector_store import BaseVectorStore
+from embedder_service.batcher import EmbeddingBatcher
+from embedder_service.write_buffer import WriteBuffer
+from embedder_service.chunker import chunk_conversation
+from embedder_service.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from embedder_service.query_cache import QueryResultCache
+from embedder_service.memory_store import MemoryDocumentStore
+from embedder_service.memory_sections import apply_section_patch, patch_instructions
 
 
 class MemoryService:
@@ -20,10 +30,19 @@ Who is the person (short term memory)
 What was the topic of your latest conversation
 """
 
+    # Keys the model uses to address the sections of MEMORY_TEMPLATE
+    MEMORY_SECTIONS = {
+        "long_term": "Who is the person (long term memory)",
+        "short_term": "Who is the person (short term memory)",
+        "last_topic": "What was the topic of your latest conversation",
+    }
+
     def __init__(
         self,
-        vector_store: VectorStore,
+        vector_store: BaseVectorStore,
         embedder=None,
+        batcher: Optional[EmbeddingBatcher] = None,
+        write_buffer: Optional[WriteBuffer] = None,
     ):
         """
         Initialize the memory service
@@ -31,10 +50,20 @@ What was the topic of your latest conversation
         Args:
             vector_store: The vector store instance for storing conversation embeddings
             embedder: The embedder service for text embedding
+            batcher: Optional micro-batcher that coalesces concurrent embeddings
+            write_buffer: Optional buffer that writes embeddings in bulk
         """
         # Vector store for conversation embeddings
         self.embeddings_store = vector_store
         self.embedder = embedder  # Store the embedder instance
+        self.batcher = batcher
+        self.write_buffer = write_buffer
+
+        # Conversations are indexed as passages cut on turn boundaries
+        self.chunk_max_chars = int(os.getenv("MEMORY_CHUNK_MAX_CHARS", "800"))
+        self.chunk_overlap_turns = int(os.getenv("MEMORY_CHUNK_OVERLAP_TURNS", "1"))
+        # Passages fetched per requested result, several may share a parent
+        self.passage_overfetch = int(os.getenv("MEMORY_PASSAGE_OVERFETCH", "4"))
 
         # Redis connection for plain text memory documents
         redis_host = os.getenv("REDIS_HOST", "localhost")
@@ -51,16 +80,56 @@ What was the topic of your latest conversation
 
         logger.info(f"Connected to Redis at {redis_host}:{redis_port}")
 
+        # Memory documents, one hash per user updated by compare-and-set
+        self.documents = MemoryDocumentStore(
+            self.redis,
+            compress_min_bytes=int(os.getenv("MEMORY_COMPRESS_MIN_BYTES", "4096")),
+        )
+        self.max_update_conflicts = int(os.getenv("MEMORY_UPDATE_MAX_CONFLICTS", "5"))
+
+        # BM25 index of the passages, fused with vector search at query time
+        self.lexical_index = (
+            LexicalIndex(self.redis)
+            if os.getenv("MEMORY_HYBRID_SEARCH", "true").lower() == "true"
+            else None
+        )
+        self.rrf_k = int(os.getenv("MEMORY_RRF_K", "60"))
+
+        # Cache of similar-memory results, disabled when the TTL is 0
+        query_cache_ttl = int(os.getenv("MEMORY_QUERY_CACHE_TTL_SECONDS", "300"))
+        self.query_cache = (
+            QueryResultCache(self.redis, ttl_seconds=query_cache_ttl)
+            if query_cache_ttl > 0
+            else None
+        )
+        if self.query_cache and self.write_buffer:
+            # Buffered passages only become searchable once flushed
+            self.write_buffer.add_flush_listener(self._invalidate_owners)
+
         # Initialize OpenAI client for memory updates if API key available
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if openai_api_key:
-            self.openai_client = OpenAI(api_key=openai_api_key)
+            self.openai_client = AsyncOpenAI(
+                api_key=openai_api_key,
+                timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")),
+            )
             logger.info("Using OpenAI client for memory updates")
         else:
             self.openai_client = MockOpenAIClient()
             logger.warning("OPENAI_API_KEY not set, using mock client")
 
-    def create_base_memory(self, owner_id: str) -> Dict[str, Any]:
+    async def close(self) -> None:
+        """Close the Redis connection pool"""
+        await self.redis.aclose()
+
+    async def _invalidate_owners(self, owner_ids: Iterable[str]) -> None:
+        """Drop the cached query results of the given users"""
+        if not self.query_cache:
+            return
+        for owner_id in owner_ids:
+            await self.query_cache.invalidate(owner_id)
+
+    async def create_base_memory(self, owner_id: str) -> Dict[str, Any]:
         """
         Create initial memory for a user
 
@@ -70,82 +139,207 @@ What was the topic of your latest conversation
         Returns:
             The created memory entry
         """
-        # Generate timestamp
-        created_at = datetime.now().isoformat()
+        # Create initial memory document, fails if one already exists
+        memory = await self.documents.create(owner_id, self.MEMORY_TEMPLATE)
 
-        # Create Redis key for this user's memory
-        memory_key = f"memory:{owner_id}"
+        logger.info(f"Created memory document for owner {owner_id}")
+
+        return {
+            "id": memory["id"],
+            "owner_id": owner_id,
+            "created_at": memory["created_at"],
+        }
 
-        # Check if memory already exists
-        if self.redis.exists(memory_key):
-            raise ValueError(f"Memory already exists for owner {owner_id}")
+    async def memory_exists(self, owner_id: str) -> bool:
+        """
+        Check whether a user has a memory document
 
-        # Create initial memory document
-        memory_text = self.MEMORY_TEMPLATE
+        Args:
+            owner_id: The user's ID
 
-        # Store in Redis
-        self.redis.set(memory_key, memory_text)
+        Returns:
+            True if the memory document exists
+        """
+        return await self.documents.exists(owner_id)
 
-        # Store metadata
-        metadata_key = f"memory:{owner_id}:metadata"
-        metadata = {"created_at": created_at, "updated_at": created_at}
+    async def _embed_query(self, text: str) -> List[float]:
+        """
+        Embed a text, going through the batcher when one is configured
 
-        # Store metadata as hash
-        self.redis.hset(metadata_key, mapping=metadata)
+        Args:
+            text: The text to embed
 
-        logger.info(f"Created memory document for owner {owner_id}")
+        Returns:
+            The embedding vector
+        """
+        if self.batcher:
+            return await self.batcher.embed_query(text)
+        if self.embedder:
+            return await asyncio.to_thread(self.embedder.embed_query, text)
 
-        return {"id": memory_key, "owner_id": owner_id, "created_at": created_at}
+        # Fallback to direct embedding (though this shouldn't happen)
+        logger.warning("No embedder instance, using default embedding")
+        return [0.0] * self.embeddings_store.vector_size
 
-    def update_memory(self, owner_id: str, conversation: str) -> bool:
+    async def _embed_passages(self, passages: List[str]) -> List[List[float]]:
+        """
+        Embed the passages of a conversation in one batch
+
+        Args:
+            passages: The passages to embed
+
+        Returns:
+            One embedding vector per passage
+        """
+        if self.embedder:
+            matrix = await asyncio.to_thread(self.embedder.embed_batch, passages)
+            return matrix.tolist()
+
+        return list(await asyncio.gather(*(self._embed_query(p) for p in passages)))
+
+    async def _index_conversation(
+        self, owner_id: str, conversation: str, conversation_id: str, created_at: str
+    ) -> int:
+        """
+        Store a conversation as passages pointing back to their parent
+
+        Passage IDs are derived from the conversation ID, so indexing the
+        same conversation again replaces its passages.
+
+        Args:
+            owner_id: The user's ID
+            conversation: The conversation transcript
+            conversation_id: The ID of the parent conversation
+            created_at: Creation time of the conversation
+
+        Returns:
+            The number of passages stored
+        """
+        passages = list(
+            chunk_conversation(
+                conversation,
+                max_chars=self.chunk_max_chars,
+                overlap_turns=self.chunk_overlap_turns,
+            )
+        ) or [conversation]
+        embeddings = await self._embed_passages(passages)
+
+        items = []
+        for chunk_index, (passage, embedding) in enumerate(zip(passages, embeddings)):
+            items.append(
+                {
+                    "id": str(
+                        uuid.uuid5(
+                            uuid.NAMESPACE_URL, f"{conversation_id}:{chunk_index}"
+                        )
+                    ),
+                    "text": passage,
+                    "embedding": embedding,
+                    "owner_id": owner_id,
+                    "metadata": {
+                        "owner_id": owner_id,
+                        "created_at": created_at,
+                        "type": "passage",
+                        "parent_id": conversation_id,
+                        "chunk_index": chunk_index,
+                    },
+                }
+            )
+
+        # Store the passages, in bulk when a write buffer is configured
+        if self.write_buffer:
+            for item in items:
+                await self.write_buffer.add(
+                    text=item["text"],
+                    embedding=item["embedding"],
+                    owner_id=owner_id,
+                    metadata=item["metadata"],
+                    point_id=item["id"],
+                )
+        else:
+            await self.embeddings_store.store_embeddings(items)
+
+        if self.lexical_index:
+            await self.lexical_index.add_documents(
+                owner_id,
+                [
+                    {
+                        "id": item["id"],
+                        "text": item["text"],
+                        "created_at": created_at,
+                        "parent_id": conversation_id,
+                    }
+                    for item in items
+                ],
+            )
+
+        return len(items)
+
+    async def update_memory(
+        self, owner_id: str, conversation: str, conversation_id: Optional[str] = None
+    ) -> bool:
         """
         Update memory with latest conversation
 
+        The conversation is queued on the user's pending list before the
+        LLM call. If another update commits first, the document is read
+        again and everything still pending is merged in one more call.
+
         Args:
             owner_id: The user's ID
             conversation: The latest conversation
+            conversation_id: Optional ID of the stored conversation, so a
+                retried update replaces its passages instead of duplicating them
 
         Returns:
             Success flag
         """
         try:
-            # 1. Store conversation embedding in vector store
+            # 1. Store conversation passages in vector store
             now = datetime.now().isoformat()
-            metadata = {"owner_id": owner_id, "created_at": now, "type": "conversation"}
-
-            # Use the embedder to create an embedding
-            if self.embedder:
-                embedding = self.embedder.embed_query(conversation)
-            else:
-                # Fallback to direct embedding (though this shouldn't happen)
-                logger.warning("No embedder instance, using default embedding")
-                embedding = [0.0] * self.embeddings_store.vector_size
-
-            # Store the embedding
-            self.embeddings_store.store_embedding(
-                text=conversation,
-                embedding=embedding,
+            conversation_id = conversation_id or str(uuid.uuid4())
+            await self._index_conversation(
                 owner_id=owner_id,
-                metadata=metadata,
+                conversation=conversation,
+                conversation_id=conversation_id,
+                created_at=now,
             )
+            await self._invalidate_owners([owner_id])
 
-            # 2. Get current memory document from Redis
-            memory_key = f"memory:{owner_id}"
-            memory_text = self.redis.get(memory_key)
-
-            if not memory_text:
+            # 2. Queue the conversation for the memory document
+            if not await self.documents.exists(owner_id):
                 logger.error(f"Memory document not found for owner {owner_id}")
                 return False
+            await self.documents.add_pending(owner_id, conversation_id, conversation)
 
-            # 3. Update memory with OpenAI
-            updated_memory = self._update_memory_with_ai(memory_text, conversation)
-
-            # 4. Store updated memory in Redis
-            self.redis.set(memory_key, updated_memory)
-
-            # 5. Update metadata
-            metadata_key = f"memory:{owner_id}:metadata"
-            self.redis.hset(metadata_key, "updated_at", now)
+            # 3. Merge what is pending with OpenAI and compare-and-set the result
+            for _ in range(self.max_update_conflicts):
+                memory, pending, consumed = await self.documents.read_with_pending(
+                    owner_id
+                )
+                if memory is None:
+                    logger.error(f"Memory document not found for owner {owner_id}")
+                    return False
+                if not pending:
+                    # A concurrent update already merged this conversation
+                    break
+
+                updated_memory = await self._update_memory_with_ai(
+                    memory["text"],
+                    "\n\n".join(item["text"] for item in pending),
+                )
+                if await self.documents.commit(
+                    owner_id, memory["version"], updated_memory, consumed
+                ):
+                    break
+
+                logger.info(
+                    f"Memory of owner {owner_id} changed during the update, "
+                    f"merging again"
+                )
+            else:
+                logger.error(f"Too many conflicting updates for owner {owner_id}")
+                return False
 
             logger.info(f"Updated memory document for owner {owner_id}")
 
@@ -154,12 +348,37 @@ What was the topic of your latest conversation
             logger.error(f"Error updating memory: {str(e)}")
             return False
 
-    def get_more_similar_memories(
+    async def _vector_search(
+        self, owner_id: str, query: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Embed the query and search the owner's passages
+
+        Unlike search(), query_similar() raises when the vector store is
+        unavailable, so a failed search is never cached as having no hits.
+        """
+        query_embedding = await self._embed_query(query)
+        results = await self.embeddings_store.query_similar(
+            query_vector=query_embedding,
+            owner_id=owner_id,
+            limit=limit,
+            payload_fields=["text", "created_at", "parent_id"],
+        )
+        # Same cut as search() with its default threshold
+        return [result for result in results if result["score"] >= 0.0]
+
+    async def get_more_similar_memories(
         self, owner_id: str, query: str, limit: int = 5
     ) -> List[Dict[str, Any]]:
         """
         Query user memory for relevant information
 
+        The vector and BM25 searches run concurrently and their rankings
+        are merged with reciprocal-rank fusion, so exact names, places and
+        dates are found even when their embedding match is weak. Passages
+        are over-fetched and collapsed to the best passage of each
+        conversation, which is returned under the conversation's ID.
+
         Args:
             owner_id: The user's ID
             query: The search query
@@ -168,40 +387,79 @@ What was the topic of your latest conversation
         Returns:
             List of similar memory results
         """
+        generation = None
+        if self.query_cache:
+            cached, generation = await self.query_cache.get(owner_id, query, limit)
+            if cached is not None:
+                return cached
+
         try:
-            # Create an embedding for the query
-            if self.embedder:
-                query_embedding = self.embedder.embed_query(query)
-            else:
-                # Fallback to direct embedding
-                logger.warning("No embedder instance, using default embedding")
-                query_embedding = [0.0] * self.embeddings_store.vector_size
+            fetch = limit * self.passage_overfetch
 
-            # Search for similar memories
-            results = self.embeddings_store.search(
-                embedding=query_embedding,
-                owner_id=owner_id,
-                limit=limit,
-            )
+            if self.lexical_index:
+                vector_results, lexical_results = await asyncio.gather(
+                    self._vector_search(owner_id, query, fetch),
+                    self.lexical_index.search(owner_id, query, limit=fetch),
+                )
+                results = reciprocal_rank_fusion(
+                    [vector_results, lexical_results], k=self.rrf_k
+                )
+            else:
+                results = await self._vector_search(owner_id, query, fetch)
 
-            # Format results
+            # Keep the best passage per conversation, results are sorted by score
             formatted_results = []
+            seen_parents = set()
             for match in results:
+                # Points stored before chunking are their own parent
+                parent_id = match["metadata"].get("parent_id") or match["id"]
+                if parent_id in seen_parents:
+                    continue
+                seen_parents.add(parent_id)
+
                 formatted_results.append(
                     {
-                        "id": match["id"],
+                        "id": parent_id,
                         "text": match["text"],
                         "score": match["score"],
-                        "created_at": match["metadata"].get("created_at"),
+                        "created_at": match["created_at"],
                     }
                 )
+                if len(formatted_results) >= limit:
+                    break
+
+            if generation is not None:
+                await self.query_cache.set(
+                    owner_id, query, limit, generation, formatted_results
+                )
 
             return formatted_results
         except Exception as e:
             logger.error(f"Error querying memory: {str(e)}")
             return []
 
-    def get_memory_document(self, owner_id: str) -> Optional[Dict[str, Any]]:
+    async def delete_by_owner(self, owner_id: str) -> int:
+        """
+        Delete every stored conversation passage of a user
+
+        Args:
+            owner_id: The user's ID
+
+        Returns:
+            The number of vector store points deleted
+        """
+        if self.write_buffer:
+            # Pending points would otherwise be written after the delete
+            await self.write_buffer.flush()
+
+        deleted = await self.embeddings_store.delete_by_owner(owner_id)
+        if self.lexical_index:
+            await self.lexical_index.delete_by_owner(owner_id)
+        await self._invalidate_owners([owner_id])
+
+        return deleted
+
+    async def get_memory_document(self, owner_id: str) -> Optional[Dict[str, Any]]:
         """
         Get the full memory document for a user
 
@@ -212,31 +470,20 @@ What was the topic of your latest conversation
             Memory document with metadata or None if not found
         """
         try:
-            memory_key = f"memory:{owner_id}"
-            memory_text = self.redis.get(memory_key)
-
-            if not memory_text:
-                return None
-
-            # Get metadata
-            metadata_key = f"memory:{owner_id}:metadata"
-            metadata = self.redis.hgetall(metadata_key) or {}
-
-            return {
-                "id": memory_key,
-                "owner_id": owner_id,
-                "text": memory_text,
-                "created_at": metadata.get("created_at"),
-                "updated_at": metadata.get("updated_at"),
-            }
+            # Text and metadata share one hash, read with a single command
+            return await self.documents.read(owner_id)
         except Exception as e:
             logger.error(f"Error getting memory document: {str(e)}")
             return None
 
-    def _update_memory_with_ai(self, memory_text: str, conversation: str) -> str:
+    async def _update_memory_with_ai(self, memory_text: str, conversation: str) -> str:
         """
         Update memory with latest conversation using OpenAI
 
+        The model only returns edits for the sections that change, which
+        are applied to the document locally, so the completion stays a
+        few lines long however large the document grows.
+
         Args:
             memory_text: Current memory text
             conversation: Latest conversation
@@ -245,23 +492,17 @@ What was the topic of your latest conversation
             Updated memory text
         """
         try:
-            system_prompt = """You are an assistant that updates a user's memory
+            system_prompt = f"""You are an assistant that updates a user's memory
             document based on the latest conversation. The memory document has
             this structure:
 
-            You are the alter ego of **
-
-            Who is the person (long term memory)
-
-            Who is the person (short term memory)
+            {self.MEMORY_TEMPLATE}
+            Review the current memory and the latest conversation. Keep important
+            personal information and preferences in long-term memory. Update the
+            short-term memory and latest conversation topic sections based on the
+            new conversation.
 
-            What was the topic of your latest conversation
-
-            Review the current memory and the latest conversation, and update
-            the memory document accordingly. Keep important personal information
-            and preferences in long-term memory. Update short-term memory and
-            latest conversation topic sections based on the new conversation.
-            Return ONLY the updated memory document with the same structure.
+            {patch_instructions(self.MEMORY_SECTIONS)}
             """
 
             user_prompt = f"""CURRENT MEMORY DOCUMENT:
@@ -270,10 +511,10 @@ What was the topic of your latest conversation
             LATEST CONVERSATION:
             {conversation}
 
-            Please update the memory document based on this conversation.
+            Please return the section edits for this conversation.
             """
 
-            response = self.openai_client.chat.completions.create(
+            response = await self.openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -281,42 +522,52 @@ What was the topic of your latest conversation
                 ],
                 temperature=0.3,
                 max_tokens=1000,
+                response_format={"type": "json_object"},
             )
 
-            updated_memory = response.choices[0].message.content
-            return updated_memory
+            patch = response.choices[0].message.content
+            return apply_section_patch(memory_text, self.MEMORY_SECTIONS, patch)
         except Exception as e:
             logger.error(f"Error updating memory with AI: {str(e)}")
-            # Return original memory if there's an error
-            return memory_text
+            # Fail the update so the job is retried
+            raise
 
 
 class MockOpenAIClient:
     """Mock OpenAI client for development/testing"""
 
-    class ChatCompletions:
-        def create(self, model, messages, temperature, max_tokens):
+    class Completions:
+        async def create(self, model, messages, temperature, max_tokens, **kwargs):
             # Parse content
             conversation = (
                 messages[1]["content"].split("LATEST CONVERSATION:")[1].strip()
             )
 
-            # Simulate updating memory with conversation content
-            updated_memory = f"""You are the alter ego of **
-
-Who is the person (long term memory)
-The person enjoys coding and is working on a voice-based AI system.
-
-Who is the person (short term memory)
-The person was recently working on a memory system for their voice application.
+            # Simulate section edits for the conversation content
+            patch = {
+                "edits": [
+                    {
+                        "section": "short_term",
+                        "op": "replace",
+                        "text": "The person was recently working on a memory "
+                        "system for their voice application.",
+                    },
+                    {
+                        "section": "last_topic",
+                        "op": "replace",
+                        "text": f"{conversation[:50]}...",
+                    },
+                ]
+            }
 
-What was the topic of your latest conversation
-{conversation[:50]}..."""
+            return MockCompletionResponse(json.dumps(patch))
 
-            return MockCompletionResponse(updated_memory)
+    class Chat:
+        def __init__(self, completions):
+            self.completions = completions
 
     def __init__(self):
-        self.chat = self.ChatCompletions()
+        self.chat = self.Chat(self.Completions())
 
 
 class MockCompletionResponse:
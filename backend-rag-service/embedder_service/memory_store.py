@@ -0,0 +1,268 @@
+import base64
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import redis.asyncio as redis
+from loguru import logger
+
+ENCODING_PLAIN = "plain"
+ENCODING_ZLIB = "zlib+base64"
+
+
+class MemoryDocumentStore:
+    """
+    Memory documents kept as one Redis hash per owner
+
+    The hash `memory:{owner_id}` holds the text, its encoding, a version
+    and the timestamps, so a document is read with a single HGETALL.
+    Writes are compare-and-set on the version with WATCH/MULTI. Large
+    texts are stored zlib-compressed.
+
+    Conversations waiting to be merged into a document are queued on the
+    list `memory:{owner_id}:pending`, so an update that loses a race can
+    fold in whatever was queued meanwhile and retry once.
+
+    Documents in the older layout (a string key plus a `:metadata` hash)
+    are migrated the first time they are read.
+    """
+
+    def __init__(self, redis_client: redis.Redis, compress_min_bytes: int = 4096):
+        """
+        Initialize the store
+
+        Args:
+            redis_client: Redis client created with decode_responses=True
+            compress_min_bytes: Texts at least this large are compressed
+        """
+        self.redis = redis_client
+        self.compress_min_bytes = compress_min_bytes
+
+    def key(self, owner_id: str) -> str:
+        return f"memory:{owner_id}"
+
+    def _pending_key(self, owner_id: str) -> str:
+        return f"memory:{owner_id}:pending"
+
+    def _encode(self, text: str) -> Tuple[str, str]:
+        """Return the stored form of a text and its encoding"""
+        raw = text.encode("utf-8")
+        if len(raw) < self.compress_min_bytes:
+            return text, ENCODING_PLAIN
+        packed = base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+        return packed, ENCODING_ZLIB
+
+    def _decode(self, value: str, encoding: Optional[str]) -> str:
+        if encoding == ENCODING_ZLIB:
+            return zlib.decompress(base64.b64decode(value)).decode("utf-8")
+        return value
+
+    def _parse(self, owner_id: str, stored: Dict[str, str]) -> Dict[str, Any]:
+        """Turn a stored hash into a memory document"""
+        return {
+            "id": self.key(owner_id),
+            "owner_id": owner_id,
+            "text": self._decode(stored.get("text", ""), stored.get("encoding")),
+            "version": int(stored.get("version", 0)),
+            "created_at": stored.get("created_at"),
+            "updated_at": stored.get("updated_at"),
+        }
+
+    async def exists(self, owner_id: str) -> bool:
+        """Whether the owner has a memory document, in either layout"""
+        return bool(await self.redis.exists(self.key(owner_id)))
+
+    async def create(self, owner_id: str, text: str) -> Dict[str, Any]:
+        """
+        Create a memory document
+
+        Args:
+            owner_id: The user's ID
+            text: The initial text
+
+        Returns:
+            The created document
+
+        Raises:
+            ValueError: If the owner already has a memory document
+        """
+        key = self.key(owner_id)
+        created_at = datetime.now().isoformat()
+        value, encoding = self._encode(text)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.exists(key):
+                    raise ValueError(f"Memory already exists for owner {owner_id}")
+                pipe.multi()
+                pipe.hset(
+                    key,
+                    mapping={
+                        "text": value,
+                        "encoding": encoding,
+                        "version": 1,
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    },
+                )
+                await pipe.execute()
+            except redis.WatchError:
+                raise ValueError(f"Memory already exists for owner {owner_id}")
+
+        return {
+            "id": key,
+            "owner_id": owner_id,
+            "text": text,
+            "version": 1,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+    async def _migrate_legacy(self, owner_id: str) -> None:
+        """Move a document from the string + metadata layout into one hash"""
+        key = self.key(owner_id)
+        metadata_key = f"memory:{owner_id}:metadata"
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key, metadata_key)
+                if await pipe.type(key) != "string":
+                    return  # Migrated by someone else
+                text = await pipe.get(key)
+                metadata = await pipe.hgetall(metadata_key)
+
+                value, encoding = self._encode(text)
+                now = datetime.now().isoformat()
+                pipe.multi()
+                pipe.delete(key, metadata_key)
+                pipe.hset(
+                    key,
+                    mapping={
+                        "text": value,
+                        "encoding": encoding,
+                        "version": 1,
+                        "created_at": metadata.get("created_at", now),
+                        "updated_at": metadata.get("updated_at", now),
+                    },
+                )
+                await pipe.execute()
+                logger.info(f"Migrated memory document of owner {owner_id}")
+            except redis.WatchError:
+                # Changed while migrating, the caller reads it again
+                pass
+
+    async def _fetch(self, owner_id: str, with_pending: bool) -> Tuple[Dict, List[str]]:
+        """Read the stored hash and optionally the pending list in one trip"""
+        for _ in range(2):
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(self.key(owner_id))
+            if with_pending:
+                pipe.lrange(self._pending_key(owner_id), 0, -1)
+            try:
+                results = await pipe.execute()
+            except redis.ResponseError as e:
+                if "WRONGTYPE" not in str(e):
+                    raise
+                await self._migrate_legacy(owner_id)
+                continue
+            return results[0], (results[1] if with_pending else [])
+
+        raise RuntimeError(f"Could not migrate memory document of owner {owner_id}")
+
+    async def read(self, owner_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a memory document
+
+        Args:
+            owner_id: The user's ID
+
+        Returns:
+            The document with its text, version and timestamps, or None
+        """
+        stored, _ = await self._fetch(owner_id, with_pending=False)
+        return self._parse(owner_id, stored) if stored else None
+
+    async def add_pending(
+        self, owner_id: str, conversation_id: str, conversation: str
+    ) -> None:
+        """
+        Queue a conversation to be merged into the document
+
+        Args:
+            owner_id: The user's ID
+            conversation_id: ID used to drop duplicates of a retried update
+            conversation: The conversation text
+        """
+        await self.redis.rpush(
+            self._pending_key(owner_id),
+            json.dumps({"id": conversation_id, "text": conversation}),
+        )
+
+    async def read_with_pending(
+        self, owner_id: str
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, str]], int]:
+        """
+        Read a document together with the conversations queued for it
+
+        Args:
+            owner_id: The user's ID
+
+        Returns:
+            The document or None, the distinct pending conversations in
+            arrival order, and the number of list entries they came from
+        """
+        stored, raw_pending = await self._fetch(owner_id, with_pending=True)
+
+        pending = []
+        seen = set()
+        for entry in raw_pending:
+            conversation = json.loads(entry)
+            if conversation["id"] in seen:
+                continue
+            seen.add(conversation["id"])
+            pending.append(conversation)
+
+        document = self._parse(owner_id, stored) if stored else None
+        return document, pending, len(raw_pending)
+
+    async def commit(
+        self, owner_id: str, expected_version: int, text: str, consumed: int
+    ) -> bool:
+        """
+        Write a new text if the document is still at the expected version
+
+        Args:
+            owner_id: The user's ID
+            expected_version: The version the new text was derived from
+            text: The new text
+            consumed: Number of pending entries merged into the new text
+
+        Returns:
+            False if the document changed in the meantime
+        """
+        key = self.key(owner_id)
+        value, encoding = self._encode(text)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if int(await pipe.hget(key, "version") or 0) != expected_version:
+                    return False
+                pipe.multi()
+                pipe.hset(
+                    key,
+                    mapping={
+                        "text": value,
+                        "encoding": encoding,
+                        "version": expected_version + 1,
+                        "updated_at": datetime.now().isoformat(),
+                    },
+                )
+                # New conversations are appended, the merged ones are in front
+                pipe.ltrim(self._pending_key(owner_id), consumed, -1)
+                await pipe.execute()
+            except redis.WatchError:
+                return False
+
+        return True
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+import redis.asyncio as redis
+from loguru import logger
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace insensitive form of a query"""
+    return " ".join(query.lower().split())
+
+
+class QueryResultCache:
+    """
+    Per-owner cache of similar-memory search results in Redis
+
+    Entries are keyed by the owner's generation counter and a hash of the
+    normalized query. Bumping the generation when an owner's memories
+    change makes every older entry unreachable at once; those entries
+    then expire through their TTL.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        ttl_seconds: int = 300,
+        namespace: str = "memory:query",
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            redis_client: Redis client created with decode_responses=True
+            ttl_seconds: Expiry of cached results
+            namespace: Prefix of the Redis keys
+        """
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _generation_key(self, owner_id: str) -> str:
+        return f"{self.namespace}:{owner_id}:generation"
+
+    def _entry_key(self, owner_id: str, generation: str, query: str, limit: int) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{owner_id}:{generation}:{limit}:{digest}"
+
+    async def get(
+        self, owner_id: str, query: str, limit: int
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Look up the cached results of a query
+
+        Args:
+            owner_id: The user's ID
+            query: The search query
+            limit: The requested number of results
+
+        Returns:
+            The cached results or None, and the generation to store fresh
+            results under (None if the cache is unavailable)
+        """
+        try:
+            generation = await self.redis.get(self._generation_key(owner_id)) or "0"
+            cached = await self.redis.get(
+                self._entry_key(owner_id, generation, query, limit)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Query result cache unavailable: {str(e)}")
+            return None, None
+
+        if cached is None:
+            self.misses += 1
+            return None, generation
+
+        self.hits += 1
+        return json.loads(cached), generation
+
+    async def set(
+        self,
+        owner_id: str,
+        query: str,
+        limit: int,
+        generation: str,
+        results: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Store the results of a query
+
+        The generation must be the one returned by get() before the search
+        ran, so results computed across an invalidation are never visible.
+
+        Args:
+            owner_id: The user's ID
+            query: The search query
+            limit: The requested number of results
+            generation: The generation returned by get()
+            results: The search results
+        """
+        try:
+            await self.redis.set(
+                self._entry_key(owner_id, generation, query, limit),
+                json.dumps(results),
+                ex=self.ttl_seconds,
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not write to query result cache: {str(e)}")
+
+    async def invalidate(self, owner_id: str) -> None:
+        """
+        Make every cached result of an owner stale
+
+        Args:
+            owner_id: The user's ID
+        """
+        await self.redis.incr(self._generation_key(owner_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters of this process"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
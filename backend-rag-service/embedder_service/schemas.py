@@ -19,6 +19,20 @@ class EmbeddingResponse(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
+class EmbedBatchRequest(BaseModel):
+    """Request for embedding several texts at once"""
+
+    texts: List[str] = Field(..., description="Texts to embed")
+
+
+class EmbedBatchResponse(BaseModel):
+    """Response with one embedding per requested text"""
+
+    model: str
+    vector_size: int
+    embeddings: List[List[float]]
+
+
 class QueryRequest(BaseModel):
     """Request for querying similar documents"""
 
@@ -69,6 +83,25 @@ class MemoryUpdateRequest(BaseModel):
     conversation: str = Field(..., description="Latest conversation text")
 
 
+class MemoryUpdateJobResponse(BaseModel):
+    """Response for a queued memory update"""
+
+    job_id: str
+    status: str
+
+
+class MemoryJobStatusResponse(BaseModel):
+    """Progress of a memory update job"""
+
+    job_id: str
+    owner_id: str
+    status: str = Field(..., description="queued, running, retrying, done or dead")
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
 class MemoryQueryRequest(BaseModel):
     """Request to query user's memory"""
 
@@ -96,5 +129,6 @@ class MemoryDocumentResponse(BaseModel):
     id: str
     owner_id: str
     text: str
+    version: Optional[int] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
@@ -1,9 +1,11 @@
 import os
 import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
 from typing import Dict, Any, List, Optional
 import numpy as np
 from loguru import logger
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http.models import (
     Distance,
     VectorParams,
@@ -11,8 +13,24 @@ from qdrant_client.http.models import (
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
+    Range,
+    PayloadSchemaType,
+    PayloadSelectorInclude,
 )
 
+# Payload fields with an index, so filtered HNSW search stays fast as the
+# number of owners grows. created_at is indexed through its integer
+# timestamp, the datetime schema is not available in qdrant-client 1.7.
+INDEXED_PAYLOAD_FIELDS = {
+    "owner_id": PayloadSchemaType.KEYWORD,
+    "type": PayloadSchemaType.KEYWORD,
+    "parent_id": PayloadSchemaType.KEYWORD,
+    "created_at_ts": PayloadSchemaType.INTEGER,
+}
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
 
 class VectorStoreConnectionError(Exception):
     """Exception raised when there is an error connecting to the vector store"""
@@ -20,8 +38,201 @@ class VectorStoreConnectionError(Exception):
     pass
 
 
-class VectorStore:
-    """Wrapper for Qdrant vector database client"""
+def matches_filter(payload: Dict[str, Any], conditions: Dict[str, Any]) -> bool:
+    """
+    Check a payload against filter conditions
+
+    Conditions map a payload key to either a value (exact match), a list
+    (match any) or a dict of gt/gte/lt/lte bounds (range).
+
+    Args:
+        payload: The stored payload
+        conditions: The filter conditions
+
+    Returns:
+        Whether every condition holds
+    """
+    for key, expected in conditions.items():
+        value = payload.get(key)
+        if isinstance(expected, dict):
+            if value is None:
+                return False
+            bounds = {op: expected[op] for op in RANGE_OPERATORS if op in expected}
+            if "gt" in bounds and not value > bounds["gt"]:
+                return False
+            if "gte" in bounds and not value >= bounds["gte"]:
+                return False
+            if "lt" in bounds and not value < bounds["lt"]:
+                return False
+            if "lte" in bounds and not value <= bounds["lte"]:
+                return False
+        elif isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+
+    return True
+
+
+def project_payload(
+    payload: Dict[str, Any], payload_fields: Optional[List[str]]
+) -> Dict[str, Any]:
+    """Keep only the requested payload fields, None keeps all of them"""
+    if payload_fields is None:
+        return payload
+    return {k: v for k, v in payload.items() if k in payload_fields}
+
+
+def format_match(
+    point_id: Any, score: float, payload: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Shape a search hit the same way for every backend
+
+    Args:
+        point_id: The ID of the point
+        score: The similarity score
+        payload: The (possibly projected) payload
+
+    Returns:
+        The hit with its text, score and remaining payload as metadata
+    """
+    return {
+        "id": str(point_id),
+        "text": payload.get("text", ""),
+        "score": score,
+        "created_at": payload.get("created_at"),
+        "metadata": {k: v for k, v in payload.items() if k not in ["text"]},
+    }
+
+
+class BaseVectorStore(ABC):
+    """Interface shared by the vector store backends"""
+
+    collection_name: str
+    vector_size: int
+
+    async def initialize(self) -> None:
+        """Prepare the backend before the first request"""
+
+    async def close(self) -> None:
+        """Release the backend's connections"""
+
+    def _build_payload(
+        self,
+        text: str,
+        owner_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build the stored payload of a point
+
+        Args:
+            text: The text that was embedded
+            owner_id: The ID of the owner/user
+            metadata: Additional metadata to store
+
+        Returns:
+            The payload, with owner_id, text and created_at_ts set
+        """
+        payload = dict(metadata or {})
+
+        # Add owner_id to metadata to enable filtering by owner
+        payload["owner_id"] = owner_id
+        payload["text"] = text
+
+        # Integer copy of created_at for range filters
+        created_at = payload.get("created_at")
+        try:
+            created_at = datetime.fromisoformat(created_at) if created_at else None
+        except (TypeError, ValueError):
+            created_at = None
+        payload["created_at_ts"] = int((created_at or datetime.now()).timestamp())
+
+        return payload
+
+    async def store_embedding(
+        self,
+        text: str,
+        embedding: List[float],
+        owner_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        point_id: Optional[str] = None,
+    ) -> str:
+        """
+        Store an embedding in the vector database
+
+        Args:
+            text: The text that was embedded
+            embedding: The embedding vector
+            owner_id: The ID of the owner/user
+            metadata: Additional metadata to store
+            point_id: Optional ID, storing it again replaces the point
+
+        Returns:
+            The ID of the stored point
+        """
+        point_ids = await self.store_embeddings(
+            [
+                {
+                    "text": text,
+                    "embedding": embedding,
+                    "owner_id": owner_id,
+                    "metadata": metadata,
+                    "id": point_id,
+                }
+            ]
+        )
+        return point_ids[0]
+
+    @abstractmethod
+    async def store_embeddings(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Store several embeddings at once
+
+        Each item has "text", "embedding", "owner_id", an optional
+        "metadata" dict and an optional "id"; an item stored again with
+        the same id replaces the previous point.
+
+        Returns:
+            The IDs of the stored points, in the order of the items
+        """
+
+    @abstractmethod
+    async def query_similar(
+        self,
+        query_vector: List[float],
+        owner_id: str,
+        limit: int = 5,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Query for similar vectors, filtered by owner_id"""
+
+    @abstractmethod
+    async def delete_by_ids(self, ids: List[str], owner_id: str) -> int:
+        """Delete points by their IDs if they belong to the owner"""
+
+    @abstractmethod
+    async def delete_by_owner(self, owner_id: str) -> int:
+        """Delete all points for a specific owner"""
+
+    @abstractmethod
+    async def search(
+        self,
+        embedding: List[float],
+        owner_id: str = None,
+        limit: int = 10,
+        threshold: float = 0.0,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search for similar vectors in the database"""
+
+
+class VectorStore(BaseVectorStore):
+    """Wrapper for the async Qdrant client"""
 
     def __init__(
         self,
@@ -31,6 +242,7 @@ class VectorStore:
         """Initialize the vector store with connection to Qdrant"""
         self.collection_name = collection_name
         self.vector_size = vector_size
+        self.upsert_batch_size = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
 
         # Connect to Qdrant
         qdrant_host = os.getenv("QDRANT_HOST", "localhost")
@@ -39,27 +251,47 @@ class VectorStore:
         # Use QDRANT_URL for cloud hosted instance, or host/port for local
         qdrant_url = os.getenv("QDRANT_URL")
 
+        # gRPC avoids JSON encoding of the vectors, HTTP stays the default
+        prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+        grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+        transport = "gRPC" if prefer_grpc else "HTTP"
+
         try:
             if qdrant_url:
-                self.client = QdrantClient(url=qdrant_url)
-                logger.info(f"Connected to Qdrant at {qdrant_url}")
+                self.client = AsyncQdrantClient(
+                    url=qdrant_url, prefer_grpc=prefer_grpc, grpc_port=grpc_port
+                )
+                logger.info(f"Connected to Qdrant at {qdrant_url} over {transport}")
             else:
-                self.client = QdrantClient(host=qdrant_host, port=qdrant_port)
-                logger.info(f"Connected to Qdrant at {qdrant_host}:{qdrant_port}")
+                self.client = AsyncQdrantClient(
+                    host=qdrant_host,
+                    port=qdrant_port,
+                    grpc_port=grpc_port,
+                    prefer_grpc=prefer_grpc,
+                )
+                logger.info(
+                    f"Connected to Qdrant at {qdrant_host}:{qdrant_port} "
+                    f"over {transport}"
+                )
         except Exception as e:
             raise VectorStoreConnectionError(f"Could not connect to Qdrant: {str(e)}")
 
-        # Create collection if it doesn't exist
-        self._create_collection_if_not_exists()
-
-    def _create_collection_if_not_exists(self) -> None:
+    async def initialize(self) -> None:
         """Create the collection if it doesn't exist"""
-        collections = self.client.get_collections().collections
+        await self._create_collection_if_not_exists()
+
+    async def close(self) -> None:
+        """Close the Qdrant client"""
+        await self.client.close()
+
+    async def _create_collection_if_not_exists(self) -> None:
+        """Create the collection and its payload indexes if they don't exist"""
+        collections = (await self.client.get_collections()).collections
         collection_names = [c.name for c in collections]
 
         if self.collection_name not in collection_names:
             logger.info(f"Creating collection {self.collection_name}")
-            self.client.create_collection(
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.vector_size,
@@ -67,58 +299,128 @@ class VectorStore:
                 ),
             )
 
-    def store_embedding(
+        # Existing collections get any index they are missing
+        collection = await self.client.get_collection(
+            collection_name=self.collection_name
+        )
+        payload_schema = collection.payload_schema
+        for field_name, field_schema in INDEXED_PAYLOAD_FIELDS.items():
+            if field_name in payload_schema:
+                continue
+            logger.info(f"Creating payload index on {field_name}")
+            await self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+
+    def _build_filter(
         self,
-        text: str,
-        embedding: List[float],
-        owner_id: str,
-        metadata: Optional[Dict[str, Any]] = None,
-    ) -> str:
+        owner_id: Optional[str] = None,
+        additional_filter: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Filter]:
         """
-        Store an embedding in the vector database
+        Translate owner and filter conditions into a Qdrant filter
 
         Args:
-            text: The text that was embedded
-            embedding: The embedding vector
-            owner_id: The ID of the owner/user
-            metadata: Additional metadata to store
+            owner_id: Optional owner ID to filter by
+            additional_filter: Conditions in the format of matches_filter
 
         Returns:
-            The ID of the stored point
+            The Qdrant filter, or None when there is nothing to filter on
         """
-        if metadata is None:
-            metadata = {}
+        filter_conditions = []
+        if owner_id:
+            filter_conditions.append(
+                FieldCondition(key="owner_id", match=MatchValue(value=owner_id))
+            )
 
-        # Add owner_id to metadata to enable filtering by owner
-        metadata["owner_id"] = owner_id
-        metadata["text"] = text
+        for key, expected in (additional_filter or {}).items():
+            if isinstance(expected, dict):
+                bounds = {op: expected[op] for op in RANGE_OPERATORS if op in expected}
+                condition = FieldCondition(key=key, range=Range(**bounds))
+            elif isinstance(expected, (list, tuple, set)):
+                condition = FieldCondition(key=key, match=MatchAny(any=list(expected)))
+            else:
+                condition = FieldCondition(key=key, match=MatchValue(value=expected))
+            filter_conditions.append(condition)
 
-        # Generate a unique ID for this point
-        point_id = str(uuid.uuid4())
+        if not filter_conditions:
+            return None
+        return Filter(must=filter_conditions)
 
-        # Convert embedding to numpy array and ensure correct type
-        vector = np.array(embedding, dtype=np.float32)
+    async def _search_points(
+        self,
+        query_vector: List[float],
+        query_filter: Optional[Filter],
+        limit: int,
+        threshold: Optional[float] = None,
+        payload_fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a filtered search, fetching only the requested payload fields"""
+        with_payload = (
+            PayloadSelectorInclude(include=payload_fields)
+            if payload_fields is not None
+            else True
+        )
 
-        # Store the point
-        self.client.upsert(
+        search_result = await self.client.search(
             collection_name=self.collection_name,
-            points=[
+            query_vector=query_vector,
+            limit=limit,
+            query_filter=query_filter,
+            score_threshold=threshold,
+            with_payload=with_payload,
+        )
+
+        return [
+            format_match(point.id, point.score, point.payload or {})
+            for point in search_result
+        ]
+
+    async def store_embeddings(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Store several embeddings, batching the upserts
+
+        Args:
+            items: Points to store, see BaseVectorStore.store_embeddings
+
+        Returns:
+            The IDs of the stored points
+        """
+        points = []
+        for item in items:
+            embedding = item["embedding"]
+            points.append(
                 PointStruct(
-                    id=point_id,
-                    vector=vector.tolist(),
-                    payload=metadata,
+                    # Generate a unique ID unless the caller fixed one
+                    id=item.get("id") or str(uuid.uuid4()),
+                    vector=(
+                        embedding.tolist()
+                        if isinstance(embedding, np.ndarray)
+                        else list(embedding)
+                    ),
+                    payload=self._build_payload(
+                        item["text"], item["owner_id"], item.get("metadata")
+                    ),
                 )
-            ],
-        )
+            )
 
-        return point_id
+        for start in range(0, len(points), self.upsert_batch_size):
+            await self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[start : start + self.upsert_batch_size],
+            )
 
-    def query_similar(
+        return [str(point.id) for point in points]
+
+    async def query_similar(
         self,
         query_vector: List[float],
         owner_id: str,
         limit: int = 5,
         additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Query for similar vectors, filtered by owner_id
@@ -128,46 +430,19 @@ class VectorStore:
             owner_id: The ID of the owner/user to filter by
             limit: The maximum number of results to return
             additional_filter: Additional filter conditions
+            payload_fields: Payload fields to return, None for all of them
 
         Returns:
             List of similar documents with their metadata and scores
         """
-        # Create filter for owner_id
-        filter_conditions = [
-            FieldCondition(
-                key="owner_id",
-                match=MatchValue(value=owner_id),
-            )
-        ]
-
-        # Add any additional filter conditions
-        # For simplicity, we're not implementing complex filtering here
-
-        # Query the vector database
-        search_result = self.client.search(
-            collection_name=self.collection_name,
+        return await self._search_points(
             query_vector=query_vector,
+            query_filter=self._build_filter(owner_id, additional_filter),
             limit=limit,
-            query_filter=Filter(must=filter_conditions),
+            payload_fields=payload_fields,
         )
 
-        # Format the results
-        results = []
-        for point in search_result:
-            results.append(
-                {
-                    "id": point.id,
-                    "text": point.payload.get("text", ""),
-                    "score": point.score,
-                    "metadata": {
-                        k: v for k, v in point.payload.items() if k not in ["text"]
-                    },
-                }
-            )
-
-        return results
-
-    def delete_by_ids(self, ids: List[str], owner_id: str) -> int:
+    async def delete_by_ids(self, ids: List[str], owner_id: str) -> int:
         """
         Delete points by their IDs, but only if they belong to the owner
 
@@ -179,9 +454,10 @@ class VectorStore:
             The number of points deleted
         """
         # First, check that all points belong to the owner
-        points = self.client.retrieve(
+        points = await self.client.retrieve(
             collection_name=self.collection_name,
             ids=ids,
+            with_payload=PayloadSelectorInclude(include=["owner_id"]),
         )
 
         # Filter out points that don't belong to the owner
@@ -192,14 +468,14 @@ class VectorStore:
 
         # Delete the valid points
         if valid_ids:
-            self.client.delete(
+            await self.client.delete(
                 collection_name=self.collection_name,
-                points_selector=ids,
+                points_selector=valid_ids,
             )
 
         return len(valid_ids)
 
-    def delete_by_owner(self, owner_id: str) -> int:
+    async def delete_by_owner(self, owner_id: str) -> int:
         """
         Delete all points for a specific owner
 
@@ -209,40 +485,32 @@ class VectorStore:
         Returns:
             The number of points deleted
         """
+        owner_filter = self._build_filter(owner_id)
+
         # Count before deletion
-        count_before = self.client.count(
-            collection_name=self.collection_name,
-            count_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="owner_id",
-                        match=MatchValue(value=owner_id),
-                    )
-                ]
-            ),
+        count_before = (
+            await self.client.count(
+                collection_name=self.collection_name,
+                count_filter=owner_filter,
+            )
         ).count
 
         # Delete by filter
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.collection_name,
-            points_selector=Filter(
-                must=[
-                    FieldCondition(
-                        key="owner_id",
-                        match=MatchValue(value=owner_id),
-                    )
-                ]
-            ),
+            points_selector=owner_filter,
         )
 
         return count_before
 
-    def search(
+    async def search(
         self,
         embedding: List[float],
         owner_id: str = None,
         limit: int = 10,
         threshold: float = 0.0,
+        additional_filter: Optional[Dict[str, Any]] = None,
+        payload_fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Search for similar vectors in the database
@@ -252,56 +520,49 @@ class VectorStore:
             owner_id: Optional owner ID to filter results
             limit: Maximum number of results to return
             threshold: Minimum similarity score (0-1)
+            additional_filter: Additional filter conditions
+            payload_fields: Payload fields to return, None for all of them
 
         Returns:
             List of matching documents with similarity scores
         """
         try:
-            # Create filter based on owner_id if provided
-            search_filter = None
-            if owner_id:
-                search_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="metadata.owner_id",
-                            match=MatchValue(value=owner_id),
-                        )
-                    ]
-                )
-
-            # Search in Qdrant
-            results = self.client.search(
-                collection_name=self.collection_name,
+            return await self._search_points(
                 query_vector=embedding,
+                query_filter=self._build_filter(owner_id, additional_filter),
                 limit=limit,
-                score_threshold=threshold,
-                filter=search_filter,
+                threshold=threshold,
+                payload_fields=payload_fields,
             )
+        except Exception as e:
+            logger.error(f"Error searching for vectors: {str(e)}")
+            return []
 
-            # Format results
-            formatted_results = []
-            for res in results:
-                # Extract metadata
-                metadata = res.payload.get("metadata", {})
-
-                # Format the result
-                formatted_result = {
-                    "id": res.id,
-                    "text": res.payload.get("text", ""),
-                    "score": res.score,
-                    "created_at": metadata.get("created_at"),
-                    "owner_id": metadata.get("owner_id"),
-                }
 
-                # Add any other metadata
-                for key, value in metadata.items():
-                    if key not in ["created_at", "owner_id"]:
-                        formatted_result[key] = value
+def create_vector_store(
+    collection_name: str = "documents",
+    vector_size: int = 768,
+) -> BaseVectorStore:
+    """
+    Create the vector store backend selected by VECTOR_STORE_BACKEND
 
-                formatted_results.append(formatted_result)
+    Args:
+        collection_name: Name of the collection
+        vector_size: Size of the stored vectors
 
-            return formatted_results
+    Returns:
+        A Qdrant backed store ("qdrant", default) or an in-process one ("local")
+    """
+    backend = os.getenv("VECTOR_STORE_BACKEND", "qdrant").lower()
 
-        except Exception as e:
-            logger.error(f"Error searching for vectors: {str(e)}")
-            return []
+    if backend == "local":
+        from embedder_service.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore(
+            collection_name=collection_name,
+            vector_size=vector_size,
+        )
+    if backend == "qdrant":
+        return VectorStore(collection_name=collection_name, vector_size=vector_size)
+
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import numpy as np
+from loguru import logger
+
+from embedder_service.vector_store import BaseVectorStore
+
+
+class WriteBuffer:
+    """
+    Buffers vector store writes and flushes them in bulk
+
+    Points are flushed with one store_embeddings call once `max_size` of
+    them are pending or every `flush_interval` seconds. A flush that fails
+    is appended to a local spill file, which is replayed before the next
+    flush, so writes made while the vector store is down are not lost.
+    Point ids are assigned up front, which makes replays idempotent, so
+    spills left half replayed by a crashed process are replayed again on
+    start. Spill lines that can't be read, e.g. torn by a crash, are moved
+    to a `.corrupt` file instead of blocking the replay.
+    """
+
+    def __init__(
+        self,
+        store: BaseVectorStore,
+        max_size: int = 64,
+        flush_interval: float = 1.0,
+        spill_path: str = "data/vector_spill.jsonl",
+    ):
+        """
+        Initialize the write buffer
+
+        Args:
+            store: The vector store the points are written to
+            max_size: Number of pending points that triggers a flush
+            flush_interval: Seconds between time based flushes
+            spill_path: Append-only file holding points that failed to flush
+        """
+        self.store = store
+        self.max_size = max(1, max_size)
+        self.flush_interval = flush_interval
+        self.spill_path = Path(spill_path)
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_listeners: List[Callable[[Set[str]], Awaitable[None]]] = []
+
+    def add_flush_listener(self, listener: Callable[[Set[str]], Awaitable[None]]):
+        """
+        Register a coroutine called with the owner IDs of every stored batch
+
+        Args:
+            listener: Coroutine taking the set of owner IDs that were written
+        """
+        self._flush_listeners.append(listener)
+
+    async def _notify(self, points: List[Dict[str, Any]]) -> None:
+        """Tell the listeners which owners have new points"""
+        owner_ids = {point["owner_id"] for point in points}
+        for listener in self._flush_listeners:
+            try:
+                await listener(owner_ids)
+            except Exception as e:
+                logger.error(f"Error in write buffer flush listener: {str(e)}")
+
+    async def add(
+        self,
+        text: str,
+        embedding: List[float],
+        owner_id: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        point_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queue an embedding for storage
+
+        Args:
+            text: The text that was embedded
+            embedding: The embedding vector
+            owner_id: The ID of the owner/user
+            metadata: Additional metadata to store
+            point_id: Optional ID, a new one is generated when omitted
+
+        Returns:
+            The ID the point will be stored under
+        """
+        point_id = point_id or str(uuid.uuid4())
+        self._pending.append(
+            {
+                "id": point_id,
+                "text": text,
+                "embedding": (
+                    embedding.tolist()
+                    if isinstance(embedding, np.ndarray)
+                    else list(embedding)
+                ),
+                "owner_id": owner_id,
+                "metadata": dict(metadata or {}),
+            }
+        )
+
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+
+        return point_id
+
+    async def flush(self) -> None:
+        """Replay spilled points, then write everything that is pending"""
+        async with self._lock:
+            points, self._pending = self._pending, []
+
+            # A bad spill must not block new writes
+            try:
+                await self._replay_spill()
+            except Exception as e:
+                logger.error(f"Error replaying spilled points: {str(e)}")
+
+            if not points:
+                return
+
+            try:
+                await self.store.store_embeddings(points)
+                logger.info(f"Flushed {len(points)} buffered points")
+                await self._notify(points)
+            except Exception as e:
+                logger.error(
+                    f"Error flushing {len(points)} points, spilling to "
+                    f"{self.spill_path}: {str(e)}"
+                )
+                await asyncio.to_thread(self._spill, points)
+
+    def _spill(self, points: List[Dict[str, Any]]) -> None:
+        """Append points to the spill file"""
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for point in points:
+                f.write(json.dumps(point) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _claim_path(self) -> Path:
+        return self.spill_path.with_name(
+            f"{self.spill_path.name}.replaying-{os.getpid()}"
+        )
+
+    @staticmethod
+    def _append_file(source: Path, target: Path) -> None:
+        """Append a file to another one and remove it"""
+        text = source.read_text(encoding="utf-8")
+        if text and not text.endswith("\n"):
+            # Keep a torn last line from swallowing the next one
+            text += "\n"
+        with open(target, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        source.unlink(missing_ok=True)
+
+    def _adopt_claims(self) -> None:
+        """Take over the claims of processes that stopped mid-replay"""
+        claimed = self._claim_path()
+        for path in self.spill_path.parent.glob(f"{self.spill_path.name}.replaying-*"):
+            if path == claimed:
+                continue
+            try:
+                self._append_file(path, claimed)
+            except FileNotFoundError:
+                # Finished by its process meanwhile
+                continue
+            logger.warning(f"Adopted spilled points of {path.name}")
+
+    def _claim_spill(self) -> Optional[Path]:
+        """Move the spill file aside so other workers don't replay it as well"""
+        claimed = self._claim_path()
+        if claimed.exists():
+            # Left over from a replay that did not finish
+            if self.spill_path.exists():
+                self._append_file(self.spill_path, claimed)
+            return claimed
+
+        try:
+            os.replace(self.spill_path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    def _read_spill(self, claimed: Path) -> List[Dict[str, Any]]:
+        """Read spilled points, quarantining the lines that don't decode"""
+        points = []
+        corrupt = []
+        with open(claimed, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    points.append(json.loads(line))
+                except json.JSONDecodeError:
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+
+        if corrupt:
+            quarantine = self.spill_path.with_name(f"{self.spill_path.name}.corrupt")
+            with open(quarantine, "a", encoding="utf-8") as f:
+                f.writelines(corrupt)
+            logger.error(
+                f"Moved {len(corrupt)} unreadable spilled points to {quarantine}"
+            )
+        return points
+
+    async def _replay_spill(self) -> None:
+        """Write the spilled points to the store"""
+        claimed = await asyncio.to_thread(self._claim_spill)
+        if claimed is None:
+            return
+
+        points = await asyncio.to_thread(self._read_spill, claimed)
+        try:
+            if points:
+                await self.store.store_embeddings(points)
+                logger.info(f"Replayed {len(points)} spilled points")
+                await self._notify(points)
+        except Exception as e:
+            logger.warning(f"Vector store still unavailable, keeping spill: {str(e)}")
+            await asyncio.to_thread(self._spill, points)
+        # The points are either stored or back in the spill file
+        claimed.unlink(missing_ok=True)
+
+    async def _run(self) -> None:
+        """Periodic flush loop"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in periodic flush: {str(e)}")
+
+    async def start(self) -> None:
+        """Start the periodic flush and replay anything spilled earlier"""
+        await asyncio.to_thread(self._adopt_claims)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await self.flush()
+
+    async def close(self) -> None:
+        """Stop the periodic flush and write out what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from embedder_service.batcher import EmbeddingBatcher
+
+
+class FakeEmbedder:
+    """Embeds a text as [len(text), 0] and records the batches it gets"""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 0.0] for text in texts])
+
+
+def test_concurrent_queries_share_one_batch():
+    async def scenario():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch_size=8, max_wait_ms=20)
+        vectors = await asyncio.gather(
+            *(batcher.embed_query("x" * n) for n in range(1, 4))
+        )
+        await batcher.close()
+        return embedder.batches, vectors
+
+    batches, vectors = asyncio.run(scenario())
+
+    assert batches == [["x", "xx", "xxx"]]
+    assert vectors == [[1.0, 0.0], [2.0, 0.0], [3.0, 0.0]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def scenario():
+        embedder = FakeEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch_size=2, max_wait_ms=20)
+        await asyncio.gather(*(batcher.embed_query(str(n)) for n in range(5)))
+        await batcher.close()
+        return embedder.batches
+
+    assert [len(batch) for batch in asyncio.run(scenario())] == [2, 2, 1]
+
+
+def test_embedding_errors_reach_every_caller_of_the_batch():
+    class FailingEmbedder:
+        def embed_batch(self, texts):
+            raise ValueError("model unavailable")
+
+    async def scenario():
+        batcher = EmbeddingBatcher(FailingEmbedder(), max_wait_ms=20)
+        results = await asyncio.gather(
+            batcher.embed_query("a"), batcher.embed_query("b"), return_exceptions=True
+        )
+        await batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert [str(result) for result in results] == ["model unavailable"] * 2
+
+
+def test_close_fails_requests_being_collected():
+    async def scenario():
+        batcher = EmbeddingBatcher(FakeEmbedder(), max_batch_size=8, max_wait_ms=5000)
+        request = asyncio.create_task(batcher.embed_query("waiting"))
+        # The worker took the request off the queue and waits for more
+        await asyncio.sleep(0.05)
+        await batcher.close()
+        return await asyncio.wait_for(request, timeout=1)
+
+    with pytest.raises(RuntimeError, match="Embedding batcher closed"):
+        asyncio.run(scenario())
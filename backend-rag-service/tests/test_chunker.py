@@ -0,0 +1,55 @@
+from embedder_service.chunker import chunk_conversation, iter_turns
+
+
+def test_turns_start_at_speaker_labels_and_keep_continuation_lines():
+    lines = ["user: hi there", "how are you?", "", "agent: fine", "thanks"]
+
+    assert list(iter_turns(lines)) == [
+        "user: hi there\nhow are you?",
+        "agent: fine\nthanks",
+    ]
+
+
+def test_leading_blank_lines_are_dropped():
+    assert list(iter_turns(["", "  ", "user: hello"])) == ["user: hello"]
+
+
+def test_short_conversation_is_one_passage():
+    conversation = "user: hello\nagent: hi"
+
+    assert list(chunk_conversation(conversation, max_chars=800)) == [conversation]
+
+
+def test_passages_stay_within_max_chars_and_overlap_by_one_turn():
+    turns = [f"user: message number {n}" for n in range(6)]
+
+    passages = list(chunk_conversation("\n".join(turns), max_chars=60))
+
+    assert all(len(passage) <= 60 for passage in passages)
+    for previous, passage in zip(passages, passages[1:]):
+        assert passage.splitlines()[0] == previous.splitlines()[-1]
+    # Every turn ends up in some passage, in order
+    seen = [turn for passage in passages for turn in passage.splitlines()]
+    assert list(dict.fromkeys(seen)) == turns
+
+
+def test_no_overlap_when_disabled():
+    turns = [f"user: message number {n}" for n in range(6)]
+
+    passages = list(chunk_conversation("\n".join(turns), max_chars=60, overlap_turns=0))
+
+    assert [turn for passage in passages for turn in passage.splitlines()] == turns
+
+
+def test_long_turn_is_split_on_whitespace():
+    turn = "user: " + " ".join(["word"] * 50)
+
+    passages = list(chunk_conversation(turn, max_chars=40, overlap_turns=0))
+
+    assert len(passages) > 1
+    assert all(len(passage) <= 40 for passage in passages)
+    assert " ".join(passages).split() == turn.split()
+
+
+def test_empty_conversation_has_no_passages():
+    assert list(chunk_conversation("")) == []
@@ -0,0 +1,38 @@
+import numpy as np
+
+from embedder_service.embedder import Embedder
+
+
+def test_rows_depend_on_their_text_only():
+    embedder = Embedder(vector_size=64)
+
+    batch = embedder.embed_batch(["alpha", "beta", "gamma"])
+
+    assert batch.shape == (3, 64)
+    assert batch.dtype == np.float32
+    np.testing.assert_array_equal(embedder.embed_batch(["gamma"])[0], batch[2])
+    np.testing.assert_array_equal(
+        Embedder(vector_size=64).embed_batch(["beta", "alpha"]), batch[[1, 0]]
+    )
+
+
+def test_rows_are_unit_vectors_in_random_directions():
+    embedder = Embedder(vector_size=256)
+
+    batch = embedder.embed_batch([f"text {i}" for i in range(50)])
+
+    np.testing.assert_allclose(np.linalg.norm(batch, axis=1), 1.0, rtol=1e-5)
+    similarities = batch @ batch.T
+    off_diagonal = similarities[~np.eye(50, dtype=bool)]
+    # Random directions in 256 dimensions are close to orthogonal
+    assert np.abs(off_diagonal).max() < 0.35
+    assert abs(batch.mean()) < 0.01
+
+
+def test_duplicate_texts_get_the_same_row():
+    embedder = Embedder(vector_size=32)
+
+    batch = embedder.embed_batch(["same", "other", "same"])
+
+    np.testing.assert_array_equal(batch[0], batch[2])
+    assert not np.array_equal(batch[0], batch[1])
@@ -0,0 +1,78 @@
+import fakeredis
+import numpy as np
+
+from embedder_service.embedder import Embedder
+from embedder_service.embedding_cache import EmbeddingCache, content_key
+
+
+def vector(value, size=4):
+    return np.full(size, value, dtype=np.float32)
+
+
+def test_content_key_depends_on_text_and_model():
+    assert content_key("text", "model") == content_key("text", "model")
+    assert content_key("text", "model") != content_key("text", "other")
+    assert content_key("text", "model") != content_key("other", "model")
+
+
+def test_lru_evicts_the_least_recently_used_entries():
+    # Room for two vectors of 16 bytes
+    cache = EmbeddingCache(vector_size=4, max_bytes=32)
+    cache.put_many({"a": vector(1), "b": vector(2)})
+    cache.get_many(["a"])
+    cache.put_many({"c": vector(3)})
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["bytes"] == 32
+
+
+def test_shared_tier_fills_the_memory_tier_of_another_worker():
+    redis_client = fakeredis.FakeRedis()
+    EmbeddingCache(vector_size=4, redis_client=redis_client).put_many(
+        {"a": vector(1)}
+    )
+    cache = EmbeddingCache(vector_size=4, redis_client=redis_client)
+
+    np.testing.assert_array_equal(cache.get_many(["a"])["a"], vector(1))
+    cache.get_many(["a", "b"])
+
+    stats = cache.stats()
+    assert (stats["shared_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_shared_vectors_of_another_size_are_ignored():
+    redis_client = fakeredis.FakeRedis()
+    EmbeddingCache(vector_size=8, redis_client=redis_client).put_many(
+        {"a": vector(1, size=8)}
+    )
+
+    cache = EmbeddingCache(vector_size=4, redis_client=redis_client)
+
+    assert cache.get_many(["a"]) == {}
+
+
+def test_unavailable_shared_tier_counts_as_misses():
+    class BrokenRedis:
+        def mget(self, keys):
+            raise ConnectionError("down")
+
+        def pipeline(self, transaction=False):
+            raise ConnectionError("down")
+
+    cache = EmbeddingCache(vector_size=4, redis_client=BrokenRedis())
+    cache.put_many({"a": vector(1)})
+
+    assert set(cache.get_many(["a", "b"])) == {"a"}
+    assert cache.stats()["misses"] == 1
+
+
+def test_embedder_only_computes_uncached_texts():
+    cache = EmbeddingCache(vector_size=16)
+    embedder = Embedder(vector_size=16, cache=cache)
+    first = embedder.embed_batch(["a", "b"])
+
+    second = embedder.embed_batch(["b", "c", "a"])
+
+    np.testing.assert_array_equal(second[[2, 0]], first)
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+
+import fakeredis
+
+from embedder_service.job_queue import MemoryUpdateQueue
+
+
+def make_queue(redis_client, handler, **options):
+    options = {"workers": 2, "block_ms": 20, "backoff_base": 0.01, **options}
+    return MemoryUpdateQueue(redis_client, handler, **options)
+
+
+async def wait_for_status(queue, job_id, statuses, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        status = await queue.get_status(job_id)
+        if status and status["status"] in statuses:
+            return status
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Job {job_id} never reached {statuses}")
+
+
+def test_job_runs_once_and_is_removed_from_the_stream():
+    calls = []
+
+    async def handler(owner_id, conversation, job_id):
+        calls.append((owner_id, conversation, job_id))
+        return True
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler)
+        await queue.start()
+        job_id = await queue.enqueue("owner-1", "hello")
+        status = await wait_for_status(queue, job_id, {"done"})
+        await queue.close()
+        return job_id, status, await redis_client.xlen(queue.STREAM)
+
+    job_id, status, stream_length = asyncio.run(scenario())
+
+    assert calls == [("owner-1", "hello", job_id)]
+    assert status["attempts"] == 1
+    assert stream_length == 0
+
+
+def test_failing_job_is_retried_then_dead_lettered():
+    calls = []
+
+    async def handler(owner_id, conversation, job_id):
+        calls.append(job_id)
+        return False
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler, max_attempts=2)
+        await queue.start()
+        job_id = await queue.enqueue("owner-1", "hello")
+        status = await wait_for_status(queue, job_id, {"dead"})
+        await queue.close()
+        dead = await redis_client.xrange(queue.DEAD_LETTER)
+        return status, dead
+
+    status, dead = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert status["attempts"] == 2
+    assert [fields["owner_id"] for _, fields in dead] == ["owner-1"]
+
+
+def test_job_abandoned_on_its_last_attempt_is_dead_lettered_when_claimed():
+    calls = []
+
+    async def handler(owner_id, conversation, job_id):
+        calls.append(job_id)
+        return True
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler, max_attempts=2, claim_idle_ms=50)
+        await redis_client.xgroup_create(
+            queue.STREAM, queue.GROUP, id="0", mkstream=True
+        )
+        job_id = await queue.enqueue("owner-1", "hello")
+
+        # A worker took the job on its last attempt and died with it
+        await redis_client.hset(queue._job_key(job_id), "attempts", 2)
+        await redis_client.xreadgroup(
+            queue.GROUP, "crashed-worker", {queue.STREAM: ">"}, count=1
+        )
+        await asyncio.sleep(0.1)
+
+        await queue.start()
+        status = await wait_for_status(queue, job_id, {"dead", "done"})
+        await queue.close()
+        return status
+
+    status = asyncio.run(scenario())
+
+    assert calls == []
+    assert status["status"] == "dead"
+    assert status["attempts"] == 2
+
+
+def test_claims_of_abandoned_jobs_count_as_attempts():
+    calls = []
+
+    async def handler(owner_id, conversation, job_id):
+        calls.append(job_id)
+        return True
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler, claim_idle_ms=50)
+        await redis_client.xgroup_create(
+            queue.STREAM, queue.GROUP, id="0", mkstream=True
+        )
+        job_id = await queue.enqueue("owner-1", "hello")
+        await queue._set_status(job_id, status="running", attempts=1)
+        await redis_client.xreadgroup(
+            queue.GROUP, "crashed-worker", {queue.STREAM: ">"}, count=1
+        )
+        await asyncio.sleep(0.1)
+
+        await queue.start()
+        status = await wait_for_status(queue, job_id, {"done"})
+        await queue.close()
+        return status
+
+    status = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert status["attempts"] == 2
+
+
+def test_running_job_keeps_its_claim_past_the_idle_time():
+    calls = []
+
+    async def handler(owner_id, conversation, job_id):
+        calls.append(job_id)
+        await asyncio.sleep(0.5)
+        return True
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler, claim_idle_ms=150)
+        await queue.start()
+        job_id = await queue.enqueue("owner-1", "hello")
+        status = await wait_for_status(queue, job_id, {"done"})
+        await queue.close()
+        return status
+
+    status = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert status["attempts"] == 1
+
+
+def test_unknown_job_has_no_status():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, None)
+        return await queue.get_status("missing")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_failed_attempt_is_acknowledged_and_scheduled_together():
+    async def handler(owner_id, conversation, job_id):
+        return False
+
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, handler, workers=1, backoff_base=100)
+        await queue.start()
+        job_id = await queue.enqueue("owner-1", "hello")
+        await wait_for_status(queue, job_id, {"retrying"})
+        await queue.close()
+        pending = await redis_client.xpending(queue.STREAM, queue.GROUP)
+        return pending["pending"], await redis_client.zcard(queue.DELAYED)
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_due_retries_are_moved_back_onto_the_stream_with_their_fields():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = make_queue(redis_client, None)
+        job = {"job_id": "j", "owner_id": "o", "conversation": "c", "attempts": 2}
+        later = dict(job, job_id="k")
+        await redis_client.zadd(queue.DELAYED, {json.dumps(job): 0})
+        await redis_client.zadd(queue.DELAYED, {json.dumps(later): 1e12})
+        moved = await queue._move_due_retries(
+            keys=[queue.DELAYED, queue.STREAM], args=[1000, 100]
+        )
+        return (
+            moved,
+            await redis_client.xrange(queue.STREAM),
+            await redis_client.zcard(queue.DELAYED),
+        )
+
+    moved, stream, delayed = asyncio.run(scenario())
+
+    assert moved == 1
+    assert [fields for _, fields in stream] == [
+        {"job_id": "j", "owner_id": "o", "conversation": "c", "attempts": "2"}
+    ]
+    assert delayed == 1
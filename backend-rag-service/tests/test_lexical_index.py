@@ -0,0 +1,115 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from embedder_service.lexical_index import (
+    LexicalIndex,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+DOCUMENTS = [
+    {"id": "paris", "text": "We talked about the trip to Paris in May"},
+    {"id": "garden", "text": "Anna planted tomatoes in the garden"},
+    {"id": "garden-again", "text": "The garden, the garden and more garden work"},
+]
+
+
+def search(documents, query, owner_id="owner-1", **kwargs):
+    async def scenario():
+        index = LexicalIndex(fakeredis.FakeAsyncRedis(decode_responses=True))
+        await index.add_documents("owner-1", documents)
+        return await index.search(owner_id, query, **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("The Trip to PARIS, in May!") == ["trip", "paris", "may"]
+
+
+def test_search_ranks_by_bm25():
+    hits = search(DOCUMENTS, "garden")
+
+    assert [hit["id"] for hit in hits] == ["garden-again", "garden"]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+
+
+def test_rare_terms_outweigh_common_ones():
+    hits = search(DOCUMENTS, "garden tomatoes")
+
+    assert hits[0]["id"] == "garden"
+
+
+def test_search_is_scoped_to_the_owner():
+    assert search(DOCUMENTS, "garden", owner_id="owner-2") == []
+
+
+def test_query_of_only_stopwords_finds_nothing():
+    assert search(DOCUMENTS, "the and of") == []
+
+
+def test_hits_carry_the_stored_fields():
+    documents = [
+        {
+            "id": "chunk-1",
+            "text": "Paris trip",
+            "created_at": "2024-05-01T10:00:00",
+            "parent_id": "conversation-1",
+        }
+    ]
+
+    (hit,) = search(documents, "paris")
+
+    assert hit["text"] == "Paris trip"
+    assert hit["created_at"] == "2024-05-01T10:00:00"
+    assert hit["metadata"] == {"parent_id": "conversation-1"}
+
+
+def test_readding_a_document_replaces_its_postings():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        index = LexicalIndex(redis_client)
+        await index.add_documents("owner-1", [{"id": "doc", "text": "paris trip"}])
+        await index.add_documents("owner-1", [{"id": "doc", "text": "rome trip"}])
+        total_length = await redis_client.hget(
+            index._key("owner-1", "stats"), "total_length"
+        )
+        return (
+            await index.search("owner-1", "paris"),
+            await index.search("owner-1", "rome"),
+            int(total_length),
+        )
+
+    paris, rome, total_length = asyncio.run(scenario())
+
+    assert paris == []
+    assert [hit["id"] for hit in rome] == ["doc"]
+    assert total_length == 2
+
+
+def test_delete_by_owner_removes_every_key():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        index = LexicalIndex(redis_client)
+        await index.add_documents("owner-1", DOCUMENTS)
+        await index.add_documents("owner-2", DOCUMENTS[:1])
+        removed = await index.delete_by_owner("owner-1")
+        return removed, sorted(await redis_client.keys("lexical:*"))
+
+    removed, keys = asyncio.run(scenario())
+
+    assert removed == 3
+    assert keys and all(key.startswith("lexical:owner-2:") for key in keys)
+
+
+def test_rrf_rewards_hits_found_by_both_lists():
+    vector_hits = [{"id": "a", "text": "A"}, {"id": "b", "text": "B"}]
+    lexical_hits = [{"id": "b", "text": "B"}, {"id": "c", "text": "C"}]
+
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=60)
+
+    assert [hit["id"] for hit in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1]["score"] == pytest.approx(1 / 61)
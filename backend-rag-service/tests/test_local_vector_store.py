@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+from embedder_service.local_vector_store import LocalVectorStore
+
+
+def point(point_id, embedding, owner_id="owner-1", **metadata):
+    return {
+        "id": point_id,
+        "text": f"text of {point_id}",
+        "embedding": embedding,
+        "owner_id": owner_id,
+        "metadata": metadata,
+    }
+
+
+def test_search_does_not_block_the_event_loop_while_the_store_is_locked(tmp_path):
+    store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+
+    async def scenario():
+        await store.store_embeddings([point("a", [1.0, 0.0])])
+        locked = threading.Event()
+
+        def hold_lock():
+            # Stands in for a long bulk write of another owner
+            with store._lock:
+                locked.set()
+                time.sleep(0.3)
+
+        writer = asyncio.create_task(asyncio.to_thread(hold_lock))
+        await asyncio.to_thread(locked.wait)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        hits = await store.search([1.0, 0.0], owner_id="owner-1")
+        ticking.cancel()
+        await writer
+        return hits, ticks
+
+    hits, ticks = asyncio.run(scenario())
+
+    assert [hit["id"] for hit in hits] == ["a"]
+    assert ticks >= 5
+
+
+def test_search_returns_the_top_k_of_the_owner_best_first(tmp_path):
+    store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+
+    async def scenario():
+        await store.store_embeddings(
+            [
+                point("east", [1.0, 0.0]),
+                point("north", [0.0, 1.0]),
+                point("north-east", [1.0, 1.0]),
+                point("west", [-1.0, 0.0]),
+                point("other", [1.0, 0.0], owner_id="owner-2"),
+            ]
+        )
+        top_two = await store.search([1.0, 0.1], owner_id="owner-1", limit=2)
+        above = await store.search([1.0, 0.1], owner_id="owner-1", threshold=0.5)
+        return top_two, above
+
+    top_two, above = asyncio.run(scenario())
+
+    assert [hit["id"] for hit in top_two] == ["east", "north-east"]
+    assert top_two[0]["score"] > top_two[1]["score"]
+    assert [hit["id"] for hit in above] == ["east", "north-east"]
+
+
+def test_filters_and_payload_fields_are_applied(tmp_path):
+    store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+
+    async def scenario():
+        await store.store_embeddings(
+            [
+                point("doc", [1.0, 0.0], type="document"),
+                point("memory", [1.0, 0.1], type="memory"),
+                point("fact", [0.9, 0.1], type="fact"),
+            ]
+        )
+        return await store.query_similar(
+            [1.0, 0.0],
+            owner_id="owner-1",
+            additional_filter={"type": ["memory", "fact"]},
+            payload_fields=["text", "type"],
+        )
+
+    hits = asyncio.run(scenario())
+
+    assert [hit["id"] for hit in hits] == ["memory", "fact"]
+    assert hits[0]["metadata"] == {"type": "memory"}
+
+
+def test_persisted_vectors_are_memory_mapped_and_copied_on_write(tmp_path):
+    async def write():
+        store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+        await store.store_embeddings([point("a", [1.0, 0.0]), point("b", [0.0, 1.0])])
+
+    async def reload():
+        store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+        hits = await store.search([0.0, 1.0], owner_id="owner-1")
+        mapped = not store._owners["owner-1"].matrix.flags.writeable
+        # The same id replaces the stored point
+        await store.store_embeddings([point("a", [0.0, 1.0])])
+        writable = store._owners["owner-1"].matrix.flags.writeable
+        return hits, mapped, writable
+
+    async def after_write():
+        store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+        return await store.search([0.0, 1.0], owner_id="owner-1", threshold=0.9)
+
+    asyncio.run(write())
+    hits, mapped, writable = asyncio.run(reload())
+    replaced = asyncio.run(after_write())
+
+    assert [hit["id"] for hit in hits] == ["b", "a"]
+    assert mapped and writable
+    assert sorted(hit["id"] for hit in replaced) == ["a", "b"]
+
+
+def test_deletes_only_touch_the_owners_points(tmp_path):
+    store = LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+
+    async def scenario():
+        await store.store_embeddings(
+            [
+                point("a", [1.0, 0.0]),
+                point("b", [0.0, 1.0]),
+                point("c", [1.0, 0.0], owner_id="owner-2"),
+            ]
+        )
+        deleted = await store.delete_by_ids(["a", "c"], owner_id="owner-1")
+        remaining = await store.search([1.0, 0.0], owner_id="owner-1")
+        dropped = await store.delete_by_owner("owner-2")
+        other = await store.search([1.0, 0.0], owner_id="owner-2")
+        return deleted, remaining, dropped, other
+
+    deleted, remaining, dropped, other = asyncio.run(scenario())
+
+    assert deleted == 1
+    assert [hit["id"] for hit in remaining] == ["b"]
+    assert (dropped, other) == (1, [])
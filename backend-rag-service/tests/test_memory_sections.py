@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from embedder_service.memory_sections import (
+    SectionPatchError,
+    apply_section_patch,
+    parse_sections,
+)
+
+SECTIONS = {"long_term": "Long term", "last_topic": "Last topic"}
+HEADERS = list(SECTIONS.values())
+
+
+def patch(*edits):
+    return json.dumps({"edits": list(edits)})
+
+
+def test_document_is_split_on_header_lines():
+    document = "Intro\n\nLong term\nlikes tea\n\nLast topic\nthe garden\n"
+
+    assert parse_sections(document, HEADERS) == (
+        "Intro",
+        {"Long term": "likes tea", "Last topic": "the garden"},
+    )
+
+
+def test_document_without_headers_becomes_the_first_section():
+    assert parse_sections("free form memory", HEADERS) == (
+        "",
+        {"Long term": "free form memory"},
+    )
+
+
+def test_append_and_replace_touch_only_their_section():
+    document = "Long term\nlikes tea\n\nLast topic\nthe garden\n"
+
+    updated = apply_section_patch(
+        document,
+        SECTIONS,
+        patch(
+            {"section": "long_term", "op": "append", "text": "has a cat"},
+            {"section": "last_topic", "op": "replace", "text": "the trip"},
+        ),
+    )
+
+    assert updated == "Long term\nlikes tea\nhas a cat\n\nLast topic\nthe trip\n"
+
+
+def test_legacy_document_is_kept_and_gets_headers_on_its_first_patch():
+    updated = apply_section_patch(
+        "likes tea",
+        SECTIONS,
+        patch({"section": "last_topic", "op": "replace", "text": "the trip"}),
+    )
+
+    assert updated == "Long term\nlikes tea\n\nLast topic\nthe trip\n"
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        "not json",
+        json.dumps({"changes": []}),
+        json.dumps({"edits": {"section": "long_term"}}),
+        patch({"section": "unknown", "op": "append", "text": "x"}),
+        patch({"section": "long_term", "op": "delete"}),
+    ],
+)
+def test_malformed_patches_are_rejected(answer):
+    with pytest.raises(SectionPatchError):
+        apply_section_patch("", SECTIONS, answer)
@@ -0,0 +1,122 @@
+import asyncio
+
+import fakeredis
+
+from embedder_service.lexical_index import LexicalIndex
+from embedder_service.local_vector_store import LocalVectorStore
+from embedder_service.memory_service import MemoryService
+from embedder_service.memory_store import MemoryDocumentStore
+from embedder_service.query_cache import QueryResultCache
+
+
+class FakeEmbedder:
+    """Embeds every text on the same axis, so every passage matches"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+class FlakyStore(LocalVectorStore):
+    """Local store failing like Qdrant while `down` is set"""
+
+    down = False
+
+    async def search(self, *args, **kwargs):
+        # search() logs errors and answers with no hits
+        if self.down:
+            return []
+        return await super().search(*args, **kwargs)
+
+    async def query_similar(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError("vector store down")
+        return await super().query_similar(*args, **kwargs)
+
+
+def make_service(tmp_path, store=None):
+    store = store or LocalVectorStore(vector_size=2, data_dir=str(tmp_path))
+    service = MemoryService(store, embedder=FakeEmbedder())
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    service.redis = redis_client
+    service.documents = MemoryDocumentStore(redis_client)
+    service.lexical_index = LexicalIndex(redis_client)
+    service.query_cache = QueryResultCache(redis_client, ttl_seconds=300)
+    return service
+
+
+async def store_passages(service, owner_id, passages):
+    await service.embeddings_store.store_embeddings(
+        [
+            {
+                "id": passage_id,
+                "text": text,
+                "embedding": [1.0, 0.0],
+                "owner_id": owner_id,
+                "metadata": {"parent_id": parent_id},
+            }
+            for passage_id, parent_id, text in passages
+        ]
+    )
+    await service.lexical_index.add_documents(
+        owner_id,
+        [
+            {"id": passage_id, "text": text, "parent_id": parent_id}
+            for passage_id, parent_id, text in passages
+        ],
+    )
+
+
+def test_passages_are_collapsed_to_one_hit_per_conversation(tmp_path):
+    service = make_service(tmp_path)
+
+    async def scenario():
+        await store_passages(
+            service,
+            "owner-1",
+            [
+                ("p1", "conversation-1", "trip to Paris"),
+                ("p2", "conversation-1", "back from Paris"),
+                ("p3", "conversation-2", "garden work"),
+            ],
+        )
+        return await service.get_more_similar_memories("owner-1", "Paris", limit=5)
+
+    hits = asyncio.run(scenario())
+
+    assert [hit["id"] for hit in hits] == ["conversation-1", "conversation-2"]
+
+
+def test_results_are_cached_until_the_owner_changes(tmp_path):
+    service = make_service(tmp_path)
+
+    async def scenario():
+        await store_passages(service, "owner-1", [("p1", "c1", "trip to Paris")])
+        first = await service.get_more_similar_memories("owner-1", "Paris")
+        second = await service.get_more_similar_memories("owner-1", "paris ")
+        await service._invalidate_owners(["owner-1"])
+        await service.get_more_similar_memories("owner-1", "Paris")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == second
+    assert (service.query_cache.hits, service.query_cache.misses) == (1, 2)
+
+
+def test_failed_search_is_not_cached(tmp_path):
+    store = FlakyStore(vector_size=2, data_dir=str(tmp_path))
+    service = make_service(tmp_path, store)
+
+    async def scenario():
+        await store_passages(service, "owner-1", [("p1", "c1", "trip to Paris")])
+        store.down = True
+        during_outage = await service.get_more_similar_memories("owner-1", "Paris")
+        store.down = False
+        after_recovery = await service.get_more_similar_memories("owner-1", "Paris")
+        return during_outage, after_recovery
+
+    during_outage, after_recovery = asyncio.run(scenario())
+
+    assert during_outage == []
+    assert [hit["id"] for hit in after_recovery] == ["c1"]
+    assert service.query_cache.hits == 0
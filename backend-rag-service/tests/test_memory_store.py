@@ -0,0 +1,117 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from embedder_service.memory_store import ENCODING_ZLIB, MemoryDocumentStore
+
+
+def run(scenario, **options):
+    """Run a scenario coroutine function against a store on a fresh fakeredis"""
+
+    async def main():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        store = MemoryDocumentStore(redis_client, **options)
+        return await scenario(store, redis_client)
+
+    return asyncio.run(main())
+
+
+def test_created_document_is_read_back_at_version_one():
+    async def scenario(store, redis_client):
+        await store.create("owner-1", "memory text")
+        return await store.read("owner-1")
+
+    document = run(scenario)
+
+    assert document["text"] == "memory text"
+    assert document["version"] == 1
+    assert document["created_at"] == document["updated_at"]
+
+
+def test_unknown_owner_has_no_document():
+    async def scenario(store, redis_client):
+        return await store.exists("owner-1"), await store.read("owner-1")
+
+    assert run(scenario) == (False, None)
+
+
+def test_second_create_is_rejected():
+    async def scenario(store, redis_client):
+        await store.create("owner-1", "first")
+        await store.create("owner-1", "second")
+
+    with pytest.raises(ValueError, match="already exists"):
+        run(scenario)
+
+
+def test_large_texts_are_stored_compressed():
+    text = "a long memory line\n" * 100
+
+    async def scenario(store, redis_client):
+        await store.create("owner-1", text)
+        stored = await redis_client.hgetall(store.key("owner-1"))
+        return stored, await store.read("owner-1")
+
+    stored, document = run(scenario, compress_min_bytes=256)
+
+    assert stored["encoding"] == ENCODING_ZLIB
+    assert len(stored["text"]) < len(text)
+    assert document["text"] == text
+
+
+def test_commit_is_rejected_for_a_stale_version():
+    async def scenario(store, redis_client):
+        await store.create("owner-1", "v1")
+        first = await store.commit("owner-1", 1, "v2", consumed=0)
+        stale = await store.commit("owner-1", 1, "v2 from a lost race", consumed=0)
+        return first, stale, await store.read("owner-1")
+
+    first, stale, document = run(scenario)
+
+    assert (first, stale) == (True, False)
+    assert document["text"] == "v2"
+    assert document["version"] == 2
+
+
+def test_pending_conversations_are_deduplicated_and_trimmed_on_commit():
+    async def scenario(store, redis_client):
+        await store.create("owner-1", "v1")
+        await store.add_pending("owner-1", "conversation-1", "hello")
+        await store.add_pending("owner-1", "conversation-1", "hello")
+        document, pending, consumed = await store.read_with_pending("owner-1")
+
+        # Arrives while the update is running, it must survive the commit
+        await store.add_pending("owner-1", "conversation-2", "later")
+        await store.commit("owner-1", document["version"], "v2", consumed)
+        return pending, consumed, await store.read_with_pending("owner-1")
+
+    pending, consumed, (document, left, _) = run(scenario)
+
+    assert pending == [{"id": "conversation-1", "text": "hello"}]
+    assert consumed == 2
+    assert document["text"] == "v2"
+    assert left == [{"id": "conversation-2", "text": "later"}]
+
+
+def test_legacy_string_document_is_migrated_on_read():
+    async def scenario(store, redis_client):
+        await redis_client.set("memory:owner-1", "old memory")
+        await redis_client.hset(
+            "memory:owner-1:metadata",
+            mapping={"created_at": "2024-01-01T00:00:00", "updated_at": "2024-02-01"},
+        )
+        document = await store.read("owner-1")
+        return (
+            document,
+            await redis_client.type("memory:owner-1"),
+            await redis_client.exists("memory:owner-1:metadata"),
+        )
+
+    document, key_type, metadata_left = run(scenario)
+
+    assert document["text"] == "old memory"
+    assert document["version"] == 1
+    assert document["created_at"] == "2024-01-01T00:00:00"
+    assert key_type == "hash"
+    assert metadata_left == 0
@@ -0,0 +1,125 @@
+import asyncio
+import uuid
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import FieldCondition, MatchAny, MatchValue, Range
+
+from embedder_service.local_vector_store import LocalVectorStore
+from embedder_service.vector_store import (
+    INDEXED_PAYLOAD_FIELDS,
+    VectorStore,
+    matches_filter,
+)
+
+IDS = {name: str(uuid.uuid5(uuid.NAMESPACE_URL, name)) for name in "abcd"}
+
+POINTS = [
+    ("a", [1.0, 0.0], "owner-1", "memory", "2024-05-01T10:00:00"),
+    ("b", [0.9, 0.1], "owner-1", "document", "2024-05-02T10:00:00"),
+    ("c", [0.8, 0.2], "owner-1", "memory", "2024-06-01T10:00:00"),
+    ("d", [1.0, 0.0], "owner-2", "memory", "2024-05-01T10:00:00"),
+]
+
+
+def items():
+    return [
+        {
+            "id": IDS[name],
+            "text": f"text of {name}",
+            "embedding": embedding,
+            "owner_id": owner_id,
+            "metadata": {"type": kind, "created_at": created_at},
+        }
+        for name, embedding, owner_id, kind, created_at in POINTS
+    ]
+
+
+def qdrant_store():
+    store = VectorStore(collection_name="test", vector_size=2)
+    store.client = AsyncQdrantClient(location=":memory:")
+    return store
+
+
+def test_matches_filter_supports_values_lists_and_ranges():
+    payload = {"type": "memory", "created_at_ts": 100}
+
+    assert matches_filter(payload, {"type": "memory"})
+    assert matches_filter(payload, {"type": ["fact", "memory"]})
+    assert matches_filter(payload, {"created_at_ts": {"gte": 100, "lt": 200}})
+    assert not matches_filter(payload, {"created_at_ts": {"gt": 100}})
+    assert not matches_filter(payload, {"type": "fact"})
+    assert not matches_filter(payload, {"parent_id": {"gte": 0}})
+
+
+def test_filter_conditions_become_qdrant_conditions():
+    store = qdrant_store()
+
+    query_filter = store._build_filter(
+        "owner-1",
+        {"type": ["memory", "fact"], "created_at_ts": {"gte": 10, "lt": 20}},
+    )
+
+    assert query_filter.must == [
+        FieldCondition(key="owner_id", match=MatchValue(value="owner-1")),
+        FieldCondition(key="type", match=MatchAny(any=["memory", "fact"])),
+        FieldCondition(key="created_at_ts", range=Range(gte=10, lt=20)),
+    ]
+    assert store._build_filter() is None
+
+
+def test_initialize_indexes_the_filtered_payload_fields():
+    store = qdrant_store()
+    indexed = []
+    create_payload_index = store.client.create_payload_index
+
+    async def record_index(**kwargs):
+        indexed.append(kwargs["field_name"])
+        return await create_payload_index(**kwargs)
+
+    store.client.create_payload_index = record_index
+    asyncio.run(store.initialize())
+
+    assert indexed == list(INDEXED_PAYLOAD_FIELDS)
+
+
+def test_qdrant_and_local_stores_apply_the_same_filters(tmp_path):
+    may = {"gte": 1714521600, "lt": 1717200000}
+
+    async def run(store):
+        await store.initialize()
+        await store.store_embeddings(items())
+        return await store.query_similar(
+            [1.0, 0.0],
+            owner_id="owner-1",
+            additional_filter={"type": "memory", "created_at_ts": may},
+            payload_fields=["text", "type"],
+        )
+
+    qdrant_hits = asyncio.run(run(qdrant_store()))
+    local_hits = asyncio.run(
+        run(LocalVectorStore(vector_size=2, data_dir=str(tmp_path)))
+    )
+
+    assert [hit["id"] for hit in qdrant_hits] == [IDS["a"]]
+    assert [hit["id"] for hit in local_hits] == [IDS["a"]]
+    assert qdrant_hits[0]["metadata"] == local_hits[0]["metadata"] == {
+        "type": "memory"
+    }
+
+
+def test_search_and_deletes_are_scoped_to_the_owner():
+    store = qdrant_store()
+
+    async def scenario():
+        await store.initialize()
+        await store.store_embeddings(items())
+        deleted = await store.delete_by_ids([IDS["a"], IDS["d"]], "owner-1")
+        hits = await store.search([1.0, 0.0], owner_id="owner-1", threshold=0.5)
+        dropped = await store.delete_by_owner("owner-2")
+        return deleted, hits, dropped
+
+    deleted, hits, dropped = asyncio.run(scenario())
+
+    assert deleted == 1
+    assert [hit["id"] for hit in hits] == [IDS["b"], IDS["c"]]
+    assert dropped == 1
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+from embedder_service.write_buffer import WriteBuffer
+
+
+class FakeStore:
+    """Records stored batches, failing while `down` is set"""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+
+    async def store_embeddings(self, points):
+        if self.down:
+            raise ConnectionError("vector store down")
+        self.batches.append([point["id"] for point in points])
+
+
+def spilled_ids(spill_path):
+    return [json.loads(line)["id"] for line in spill_path.read_text().splitlines()]
+
+
+def make_buffer(tmp_path, store, max_size=2):
+    return WriteBuffer(
+        store,
+        max_size=max_size,
+        flush_interval=3600,
+        spill_path=str(tmp_path / "spill.jsonl"),
+    )
+
+
+def test_add_flushes_once_max_size_points_are_pending(tmp_path):
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store)
+
+    async def scenario():
+        first = await buffer.add("a", [0.1], "owner-1")
+        assert store.batches == []
+        second = await buffer.add("b", [0.2], "owner-1", point_id="fixed-id")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert second == "fixed-id"
+    assert store.batches == [[first, "fixed-id"]]
+
+
+def test_failed_flush_is_spilled_and_replayed_before_new_points(tmp_path):
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store, max_size=10)
+    flushed_owners = []
+
+    async def listener(owner_ids):
+        flushed_owners.append(owner_ids)
+
+    buffer.add_flush_listener(listener)
+    spill_path = tmp_path / "spill.jsonl"
+
+    async def scenario():
+        store.down = True
+        await buffer.add("a", [0.1], "owner-1", point_id="a")
+        await buffer.flush()
+        spilled = spilled_ids(spill_path)
+
+        store.down = False
+        await buffer.add("b", [0.2], "owner-2", point_id="b")
+        await buffer.flush()
+        return spilled
+
+    spilled = asyncio.run(scenario())
+
+    assert spilled == ["a"]
+    assert store.batches == [["a"], ["b"]]
+    assert flushed_owners == [{"owner-1"}, {"owner-2"}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_replay_keeps_the_spill_while_the_store_is_down(tmp_path):
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store, max_size=10)
+    spill_path = tmp_path / "spill.jsonl"
+
+    async def scenario():
+        store.down = True
+        await buffer.add("a", [0.1], "owner-1", point_id="a")
+        await buffer.flush()
+        await buffer.add("b", [0.2], "owner-1", point_id="b")
+        await buffer.flush()
+
+    asyncio.run(scenario())
+
+    assert spilled_ids(spill_path) == ["a", "b"]
+    assert store.batches == []
+
+
+def test_spill_left_by_a_previous_process_is_replayed_on_start(tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    spill_path.write_text(
+        json.dumps(
+            {
+                "id": "old",
+                "text": "t",
+                "embedding": [0.1],
+                "owner_id": "owner-1",
+                "metadata": {},
+            }
+        )
+        + "\n"
+    )
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store)
+
+    async def scenario():
+        await buffer.start()
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+    assert store.batches == [["old"]]
+    assert not spill_path.exists()
+
+
+def test_close_writes_out_pending_points(tmp_path):
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store, max_size=10)
+
+    async def scenario():
+        await buffer.start()
+        await buffer.add("a", [0.1], "owner-1", point_id="a")
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+    assert store.batches == [["a"]]
+
+
+def test_torn_spill_line_is_quarantined_and_does_not_block_writes(tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    good = {"id": "good", "text": "t", "embedding": [0.1], "owner_id": "o"}
+    spill_path.write_text(json.dumps(dict(good, metadata={})) + '\n{"id": "torn", "te')
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store, max_size=10)
+
+    async def scenario():
+        await buffer.add("a", [0.1], "owner-1", point_id="a")
+        await buffer.flush()
+
+    asyncio.run(scenario())
+
+    assert store.batches == [["good"], ["a"]]
+    assert (tmp_path / "spill.jsonl.corrupt").read_text() == '{"id": "torn", "te\n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["spill.jsonl.corrupt"]
+
+
+def test_claim_left_by_a_crashed_process_is_replayed_on_start(tmp_path):
+    orphan = tmp_path / "spill.jsonl.replaying-999999"
+    point = {"id": "orphan", "text": "t", "embedding": [0.1], "owner_id": "o"}
+    orphan.write_text(json.dumps(dict(point, metadata={})) + "\n")
+    store = FakeStore()
+    buffer = make_buffer(tmp_path, store)
+
+    async def scenario():
+        await buffer.start()
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+    assert store.batches == [["orphan"]]
+    assert list(tmp_path.iterdir()) == []